@@ -51,10 +51,12 @@ DROP TABLE IF EXISTS `leaderboard`;
 /*!40101 SET character_set_client = utf8 */;
 CREATE TABLE `leaderboard` (
   `id` int(11) NOT NULL AUTO_INCREMENT,
-  `name` varchar(255) DEFAULT NULL,
+  `name` varchar(255) NOT NULL,
   `score` int(11) DEFAULT NULL,
   `kills` int(11) DEFAULT NULL,
-  PRIMARY KEY (`id`)
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_leaderboard_name` (`name`),
+  KEY `idx_leaderboard_score_kills` (`score`,`kills`)
 ) ENGINE=InnoDB AUTO_INCREMENT=9 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -1,86 +1,777 @@
+import abc
 import math
 import random
 import json
 import os
 import sys
+import time
+STARTUP_STARTED = time.perf_counter()  # taken before pygame is imported so the report includes it
+import queue
+import collections
+import sqlite3
+import struct
 import hashlib
-import mysql.connector
+import threading
+import contextlib
+import mmap
+import numpy as np
 import pygame
 from pygame.math import Vector2
 
-# MySQL connection
-def get_db_connection():
-    """Establishes and returns a MySQL database connection."""
+GAME_DIR = os.path.dirname(os.path.abspath(__file__))  # assets and the SQLite file live next to the script
+
+# ---------------- Startup timing ----------------
+phase_timings = []  # (phase, ms) in completion order
+startup_reported = False
+
+@contextlib.contextmanager
+def timed_phase(name):
+    """Times a startup or lazy-loading phase; phases finishing after the startup report are printed on their own."""
+    start = time.perf_counter()
     try:
-        return mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='',
-            database='war_game'
-        )
-    except mysql.connector.Error as e:
-        print(f"Database connection failed: {e}. Running without database features.")
-        return None
-    except Exception as e:
-        print(f"An unexpected error occurred during database connection: {e}. Running without database features.")
+        yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        phase_timings.append((name, elapsed))
+        if startup_reported:
+            print(f"Loaded {name} in {elapsed:.0f} ms")
+
+def report_startup():
+    """Prints how long each phase took up to the first menu frame."""
+    global startup_reported
+    total = (time.perf_counter() - STARTUP_STARTED) * 1000
+    phases = ", ".join(f"{name} {ms:.0f} ms" for name, ms in phase_timings)
+    print(f"Startup: first menu frame after {total:.0f} ms ({phases})")
+    startup_reported = True
+
+# ---------------- Storage backends ----------------
+# "sqlite" (embedded file next to the game, default for single-player installs) or "mysql"
+STORAGE_BACKEND = os.environ.get("WARIO_STORAGE", "sqlite").lower()
+SQLITE_PATH = os.path.join(GAME_DIR, "war_game.db")
+SQLITE_BUSY_TIMEOUT = 5.0  # seconds a connection waits on a locked database
+
+# MySQL connection
+DB_CONFIG = {
+    "host": 'localhost',
+    "user": 'root',
+    "password": '',
+    "database": 'war_game'
+}
+DB_POOL_SIZE = 4  # Max open connections kept by the pool
+DB_CHECKOUT_TIMEOUT = 2.0  # seconds to wait for a free connection
+DB_HEALTH_CHECK_IDLE = 5.0  # seconds idle before a pooled connection is pinged on checkout
+DB_RETRY_INTERVAL = 5.0  # seconds to wait before retrying after a failed connect
+
+
+class QueryStats:
+    """Per-statement call counts and latency, shared by every backend."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = {}
+
+    def record(self, sql, elapsed):
+        key = " ".join(sql.split())
+        with self._lock:
+            entry = self.queries.setdefault(key, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+            entry["calls"] += 1
+            entry["total_ms"] += elapsed * 1000
+            entry["max_ms"] = max(entry["max_ms"], elapsed * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            return {sql: dict(q, avg_ms=q["total_ms"] / q["calls"]) for sql, q in self.queries.items()}
+
+
+query_stats = QueryStats()
+
+class PooledCursor:
+    """Cursor proxy that reuses prepared statements and records per-call latency."""
+    def __init__(self, conn):
+        self._conn = conn
+        self._rows = []
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def execute(self, sql, params=None):
+        prepared = params is not None
+        cursor = self._conn._statement_cursor(sql, prepared)
+        start = time.perf_counter()
+        try:
+            cursor.execute(sql, params)
+            # Read the whole result so the cached cursor can be reused right away
+            self._rows = cursor.fetchall() if cursor.with_rows else []
+            self.rowcount = cursor.rowcount
+            self.lastrowid = cursor.lastrowid
+        finally:
+            query_stats.record(sql, time.perf_counter() - start)
+            self._conn._pending = True
+            if not prepared:
+                cursor.close()
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        self._rows = []
+
+
+class PooledConnection:
+    """A connection checked out of the pool; close() hands it back instead of disconnecting."""
+    def __init__(self, pool, raw, statements):
+        self._pool = pool
+        self._raw = raw
+        self._statements = statements
+        self._pending = False
+
+    def _statement_cursor(self, sql, prepared):
+        if not prepared:
+            return self._raw.cursor()
+        cursor = self._statements.get(sql)
+        if cursor is None:
+            cursor = self._raw.cursor(prepared=True)
+            self._statements[sql] = cursor
+        return cursor
+
+    def cursor(self):
+        return PooledCursor(self)
+
+    def commit(self):
+        self._raw.commit()
+        self._pending = False
+
+    def rollback(self):
+        self._raw.rollback()
+        self._pending = False
+
+    def close(self):
+        if self._raw is None:
+            return
+        if self._pending:
+            # Never hand out a connection with an open transaction or a stale read snapshot
+            try:
+                self._raw.rollback()
+            except Exception:
+                self._pool.discard(self._raw)
+                self._raw = None
+                return
+        self._pool.release(self._raw, self._statements)
+        self._raw = None
+
+
+class ConnectionPool:
+    """Keeps a bounded set of open MySQL connections for reuse across helpers."""
+    def __init__(self, driver, size=DB_POOL_SIZE, **config):
+        self.driver = driver
+        self.size = size
+        self.config = config
+        self._idle = []  # (raw connection, prepared statement cache, last used time)
+        self._open = 0
+        self._cond = threading.Condition()
+        self._retry_at = 0.0
+        self.stats = {"checkouts": 0, "connects": 0, "reconnects": 0, "timeouts": 0}
+
+    def acquire(self):
+        """Returns a healthy PooledConnection, or None if the database is unreachable."""
+        deadline = time.monotonic() + DB_CHECKOUT_TIMEOUT
+        with self._cond:
+            while not self._idle and self._open >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    return None
+                self._cond.wait(remaining)
+            entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                self._open += 1
+            self.stats["checkouts"] += 1
+
+        if entry is not None:
+            raw, statements, last_used = entry
+            if time.monotonic() - last_used < DB_HEALTH_CHECK_IDLE or self._is_alive(raw):
+                return PooledConnection(self, raw, statements)
+            self.stats["reconnects"] += 1
+            self._close_raw(raw)
+
+        raw = self._connect()
+        if raw is None:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            return None
+        return PooledConnection(self, raw, {})
+
+    def release(self, raw, statements):
+        with self._cond:
+            self._idle.append((raw, statements, time.monotonic()))
+            self._cond.notify()
+
+    def discard(self, raw):
+        self._close_raw(raw)
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def close_all(self):
+        """Closes every idle connection (used on shutdown)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for raw, _, _ in idle:
+            self._close_raw(raw)
+
+    def snapshot(self):
+        """Returns a copy of the pool counters."""
+        with self._cond:
+            return dict(self.stats, pool_size=self.size, open=self._open, idle=len(self._idle))
+
+    def _connect(self):
+        if time.monotonic() < self._retry_at:
+            return None
+        try:
+            raw = self.driver.connect(**self.config)
+            self.stats["connects"] += 1
+            return raw
+        except self.driver.Error as e:
+            print(f"Database connection failed: {e}. Running without database features.")
+        except Exception as e:
+            print(f"An unexpected error occurred during database connection: {e}. Running without database features.")
+        self._retry_at = time.monotonic() + DB_RETRY_INTERVAL
         return None
 
-def create_tables():
-    """Creates necessary tables in the database if they don't exist."""
-    conn = get_db_connection()
-    if conn:
+    @staticmethod
+    def _is_alive(raw):
+        try:
+            return raw.is_connected()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_raw(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+
+class SQLiteCursor:
+    """Cursor proxy that accepts the %s placeholders used by the helpers and records latency."""
+    def __init__(self, conn):
+        self._conn = conn
+        self._cursor = conn._raw.cursor()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def execute(self, sql, params=None):
+        start = time.perf_counter()
+        try:
+            self._cursor.execute(sql.replace("%s", "?"), params or ())
+        finally:
+            query_stats.record(sql, time.perf_counter() - start)
+            self._conn._pending = True
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Handle on the calling thread's SQLite connection; close() keeps it open for reuse."""
+    def __init__(self, raw):
+        self._raw = raw
+        self._pending = False
+
+    def cursor(self):
+        return SQLiteCursor(self)
+
+    def commit(self):
+        self._raw.commit()
+        self._pending = False
+
+    def rollback(self):
+        self._raw.rollback()
+        self._pending = False
+
+    def close(self):
+        if self._raw is not None and self._pending:
+            self._raw.rollback()
+        self._raw = None
+
+
+# Schema shared by every backend. {pk} and {json} are replaced with the engine's column types,
+# and each step runs once per database, tracked in the schema_version table.
+def migrate_base_tables(storage, cursor):
+    """Creates users, user_data, leaderboard and admins."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+        id {pk},
+        username VARCHAR(255) UNIQUE NOT NULL,
+        password VARCHAR(255) NOT NULL
+        )
+    '''.format(**storage.types))
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_data (
+            user_id INT PRIMARY KEY,
+            coins INT DEFAULT 0,
+            unlocked {json},
+            upgrades {json},
+            score INT DEFAULT 0,
+            kills INT DEFAULT 0,
+            weapon VARCHAR(50) DEFAULT 'pistol',
+            ammo {json},
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    '''.format(**storage.types))
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS leaderboard (
+            id {pk},
+            name VARCHAR(255) NOT NULL,
+            score INT,
+            kills INT
+        )
+    '''.format(**storage.types))
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS admins (
+            id {pk},
+            username VARCHAR(255) UNIQUE NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            permissions {json} DEFAULT '{{}}'
+        )
+    '''.format(**storage.types))
+
+def migrate_leaderboard(storage, cursor):
+    """Adds the unique name key and (score, kills) index to leaderboards created by older versions."""
+    if storage.has_index(cursor, "leaderboard", "uq_leaderboard_name"):
+        return
+    # Keep only each name's best row so the unique key can be added
+    cursor.execute(storage.sql["leaderboard_dedupe"])
+    cursor.execute("DELETE FROM leaderboard WHERE name IS NULL")
+    if storage.sql.get("leaderboard_name_not_null"):
+        cursor.execute(storage.sql["leaderboard_name_not_null"])
+    cursor.execute("CREATE UNIQUE INDEX uq_leaderboard_name ON leaderboard (name)")
+    cursor.execute("CREATE INDEX idx_leaderboard_score_kills ON leaderboard (score, kills)")
+
+def migrate_user_data_encoding(storage, cursor):
+    """Adds the compact binary unlocked/ammo columns; JSON rows are converted as they are read."""
+    cursor.execute("ALTER TABLE user_data ADD COLUMN unlocked_bin {blob}".format(**storage.types))
+    cursor.execute("ALTER TABLE user_data ADD COLUMN ammo_bin {blob}".format(**storage.types))
+
+# One aggregate pass over every table feeding game_stats; used to seed and repair the row
+GAME_STATS_RECOMPUTE_SQL = """
+    SELECT (SELECT COUNT(*) FROM users),
+           COUNT(CASE WHEN score > 0 THEN 1 END),
+           COALESCE(SUM(score), 0),
+           COALESCE(SUM(kills), 0),
+           (SELECT COUNT(*) FROM leaderboard)
+    FROM user_data
+"""
+
+# Triggers that keep game_stats current: (event, table, SET expressions). NEW/OLD are the changed row.
+GAME_STATS_TRIGGERS = [
+    ("INSERT", "users", "total_users = total_users + 1"),
+    ("DELETE", "users", "total_users = total_users - 1"),
+    ("INSERT", "user_data", "active_users = active_users + (COALESCE(NEW.score, 0) > 0), "
+                            "total_score = total_score + COALESCE(NEW.score, 0), "
+                            "total_kills = total_kills + COALESCE(NEW.kills, 0)"),
+    ("UPDATE", "user_data", "active_users = active_users + (COALESCE(NEW.score, 0) > 0) - (COALESCE(OLD.score, 0) > 0), "
+                            "total_score = total_score + COALESCE(NEW.score, 0) - COALESCE(OLD.score, 0), "
+                            "total_kills = total_kills + COALESCE(NEW.kills, 0) - COALESCE(OLD.kills, 0)"),
+    ("DELETE", "user_data", "active_users = active_users - (COALESCE(OLD.score, 0) > 0), "
+                            "total_score = total_score - COALESCE(OLD.score, 0), "
+                            "total_kills = total_kills - COALESCE(OLD.kills, 0)"),
+    ("INSERT", "leaderboard", "leaderboard_count = leaderboard_count + 1"),
+    ("DELETE", "leaderboard", "leaderboard_count = leaderboard_count - 1"),
+]
+
+def migrate_game_stats(storage, cursor):
+    """Adds the materialized game_stats row, seeds it and installs the triggers that maintain it."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS game_stats (
+            id INT PRIMARY KEY,
+            total_users BIGINT NOT NULL DEFAULT 0,
+            active_users BIGINT NOT NULL DEFAULT 0,
+            total_score BIGINT NOT NULL DEFAULT 0,
+            total_kills BIGINT NOT NULL DEFAULT 0,
+            leaderboard_count BIGINT NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute("DELETE FROM game_stats")
+    cursor.execute("INSERT INTO game_stats (id, total_users, active_users, total_score, total_kills, leaderboard_count) "
+                   "SELECT 1, s.* FROM (" + GAME_STATS_RECOMPUTE_SQL + ") s")
+    for event, table, assignments in GAME_STATS_TRIGGERS:
+        cursor.execute(storage.trigger_sql(f"trg_game_stats_{table}_{event.lower()}", event, table,
+                                           f"UPDATE game_stats SET {assignments} WHERE id = 1"))
+
+SCHEMA_MIGRATIONS = [migrate_base_tables, migrate_leaderboard, migrate_user_data_encoding, migrate_game_stats]
+
+
+class StorageBackend(abc.ABC):
+    """Interface the DB helpers program against: connections, dialect SQL and schema migration.
+
+    Subclasses set Error, types (DDL column types) and sql (statements that differ per engine)
+    and implement connect(), has_index(), upsert_clause() and trigger_sql().
+    """
+    name = None
+    Error = Exception
+    types = {}
+    sql = {}
+
+    @abc.abstractmethod
+    def connect(self):
+        """Returns a connection with cursor()/commit()/rollback()/close(), or None."""
+
+    @abc.abstractmethod
+    def has_index(self, cursor, table, index):
+        """Returns True if `table` already has an index named `index`."""
+
+    @abc.abstractmethod
+    def upsert_clause(self, key, columns):
+        """Returns the clause that turns an INSERT into an update of `columns` when `key` exists."""
+
+    @abc.abstractmethod
+    def trigger_sql(self, name, event, table, body):
+        """Returns a CREATE TRIGGER running the single statement `body` after each row `event`."""
+
+    def migrate(self):
+        """Brings the schema up to date, running each step in SCHEMA_MIGRATIONS once. Returns success."""
+        conn = self.connect()
+        if not conn:
+            return False
+        cursor = None
         try:
             cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(255) UNIQUE NOT NULL,
-                password VARCHAR(255) NOT NULL
-                )
-            ''')
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS user_data (
-                    user_id INT PRIMARY KEY,
-                    coins INT DEFAULT 0,
-                    unlocked JSON,
-                    upgrades JSON,
-                    score INT DEFAULT 0,
-                    kills INT DEFAULT 0,
-                    weapon VARCHAR(50) DEFAULT 'pistol',
-                    ammo JSON,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS leaderboard (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    name VARCHAR(255),
-                    score INT,
-                    kills INT
-                )
-            ''')
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS admins (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    username VARCHAR(255) UNIQUE NOT NULL,
-                    password VARCHAR(255) NOT NULL,
-                    permissions JSON DEFAULT '{}'
-                )
-            ''')
-            conn.commit()
-            cursor.close()
+            cursor.execute("CREATE TABLE IF NOT EXISTS schema_version (version INT NOT NULL)")
+            cursor.execute("SELECT MAX(version) FROM schema_version")
+            version = cursor.fetchone()[0] or 0
+            for step, migration in enumerate(SCHEMA_MIGRATIONS[version:], version + 1):
+                migration(self, cursor)
+                cursor.execute("INSERT INTO schema_version (version) VALUES (%s)", (step,))
+                conn.commit()
+            return True
+        finally:
+            if cursor: cursor.close()
             conn.close()
-        except mysql.connector.Error as e:
-            print(f"Error creating tables: {e}. Running without database features.")
-        except Exception as e:
-            print(f"An unexpected error occurred during table creation: {e}. Running without database features.")
-    else:
-        print("No database connection to create tables.")
+
+    def snapshot(self):
+        return {"backend": self.name}
+
+    def close(self):
+        pass
+
+
+class MySQLStorage(StorageBackend):
+    """MySQL server storage behind the connection pool."""
+    name = "mysql"
+    types = {"pk": "INT AUTO_INCREMENT PRIMARY KEY", "json": "JSON", "blob": "BLOB"}
+    sql = {
+        # kills is assigned first so both conditions compare against the stored row
+        "leaderboard_upsert": """
+            INSERT INTO leaderboard (name, score, kills) VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+            kills = IF((VALUES(score), VALUES(kills)) > (score, kills), VALUES(kills), kills),
+            score = IF(VALUES(score) > score, VALUES(score), score)
+        """,
+        "leaderboard_trim": """
+            DELETE l FROM leaderboard l
+            JOIN (SELECT score, kills FROM leaderboard ORDER BY score DESC, kills DESC LIMIT 1 OFFSET %s) cutoff
+            ON (l.score, l.kills) < (cutoff.score, cutoff.kills)
+        """,
+        "leaderboard_dedupe": (
+            "DELETE l1 FROM leaderboard l1 JOIN leaderboard l2 "
+            "ON l1.name = l2.name AND (l2.score, l2.kills, l2.id) > (l1.score, l1.kills, l1.id)"
+        ),
+        "leaderboard_name_not_null": "ALTER TABLE leaderboard MODIFY name VARCHAR(255) NOT NULL",
+    }
+
+    def __init__(self, size=DB_POOL_SIZE, **config):
+        import mysql.connector  # only needed when the MySQL backend is selected
+        self.Error = mysql.connector.Error
+        self.pool = ConnectionPool(mysql.connector, size, **config)
+
+    def connect(self):
+        return self.pool.acquire()
+
+    def has_index(self, cursor, table, index):
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s", (table, index)
+        )
+        return cursor.fetchone()[0] > 0
+
+    def upsert_clause(self, key, columns):
+        return f"ON DUPLICATE KEY UPDATE {', '.join(f'{c} = VALUES({c})' for c in columns)}"
+
+    def trigger_sql(self, name, event, table, body):
+        return f"CREATE TRIGGER {name} AFTER {event} ON {table} FOR EACH ROW {body}"
+
+    def snapshot(self):
+        return dict(self.pool.snapshot(), backend=self.name)
+
+    def close(self):
+        self.pool.close_all()
+
+
+class SQLiteStorage(StorageBackend):
+    """Embedded SQLite file in WAL mode: no server round trips, readers never block the writer."""
+    name = "sqlite"
+    Error = sqlite3.Error
+    types = {"pk": "INTEGER PRIMARY KEY AUTOINCREMENT", "json": "TEXT", "blob": "BLOB"}
+    sql = {
+        "leaderboard_upsert": """
+            INSERT INTO leaderboard (name, score, kills) VALUES (%s, %s, %s)
+            ON CONFLICT(name) DO UPDATE SET score = excluded.score, kills = excluded.kills
+            WHERE (excluded.score, excluded.kills) > (leaderboard.score, leaderboard.kills)
+        """,
+        "leaderboard_trim": """
+            DELETE FROM leaderboard WHERE (score, kills) <
+            (SELECT score, kills FROM leaderboard ORDER BY score DESC, kills DESC LIMIT 1 OFFSET %s)
+        """,
+        "leaderboard_dedupe": (
+            "DELETE FROM leaderboard WHERE EXISTS (SELECT 1 FROM leaderboard l2 "
+            "WHERE l2.name = leaderboard.name AND (l2.score, l2.kills, l2.id) > (leaderboard.score, leaderboard.kills, leaderboard.id))"
+        ),
+    }
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()  # sqlite3 connections stay on the thread that opened them
+        self._opened = []
+        self._lock = threading.Lock()
+
+    def connect(self):
+        raw = getattr(self._local, "raw", None)
+        if raw is None:
+            try:
+                raw = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT, check_same_thread=False)
+                raw.execute("PRAGMA journal_mode=WAL")
+                raw.execute("PRAGMA synchronous=NORMAL")  # WAL keeps this crash-safe; fsync only at checkpoints
+                raw.execute("PRAGMA foreign_keys=ON")
+            except sqlite3.Error as e:
+                print(f"Could not open database {self.path}: {e}. Running without database features.")
+                return None
+            self._local.raw = raw
+            with self._lock:
+                self._opened.append(raw)
+        return SQLiteConnection(raw)
+
+    def has_index(self, cursor, table, index):
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND name = %s",
+                       (table, index))
+        return cursor.fetchone()[0] > 0
+
+    def upsert_clause(self, key, columns):
+        return f"ON CONFLICT({key}) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in columns)}"
+
+    def trigger_sql(self, name, event, table, body):
+        return f"CREATE TRIGGER {name} AFTER {event} ON {table} BEGIN {body}; END"
+
+    def snapshot(self):
+        with self._lock:
+            return {"backend": self.name, "path": self.path, "connections": len(self._opened)}
+
+    def close(self):
+        """Closes every thread's connection (used on shutdown, after the persistence thread stopped)."""
+        with self._lock:
+            opened, self._opened = self._opened, []
+        for raw in opened:
+            try:
+                raw.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+
+def open_storage(backend=STORAGE_BACKEND):
+    """Creates the configured storage backend, falling back to SQLite when MySQL is unusable."""
+    if backend == "mysql":
+        try:
+            mysql_storage = MySQLStorage(DB_POOL_SIZE, **DB_CONFIG)
+            conn = mysql_storage.connect()
+            if conn:
+                conn.close()
+                return mysql_storage
+        except ImportError as e:
+            print(f"MySQL driver not available: {e}.")
+        print(f"Falling back to the embedded SQLite database at {SQLITE_PATH}.")
+    elif backend != "sqlite":
+        print(f"Unknown storage backend '{backend}', using sqlite.")
+    return SQLiteStorage(SQLITE_PATH)
+
+
+storage = None  # opened by get_storage() on first use
+storage_lock = threading.Lock()
+
+def get_storage():
+    """Opens the storage backend and migrates its schema the first time the database is needed."""
+    global storage
+    if storage is None:
+        with storage_lock:
+            if storage is None:
+                with timed_phase("database"):
+                    storage = open_storage()
+                    create_tables(storage)
+    return storage
+
+def get_db_connection():
+    """Opens a connection on the active storage backend (close() hands it back for reuse)."""
+    return get_storage().connect()
+
+def get_db_stats():
+    """Returns backend counters and per-query latency (calls, total_ms, avg_ms, max_ms)."""
+    return dict(get_storage().snapshot(), queries=query_stats.snapshot())
+
+# ---------------- Background persistence ----------------
+PERSIST_QUEUE_SIZE = 64  # max distinct writes waiting for the persistence thread
+
+class PersistenceWorker:
+    """Runs database writes on one background thread so frames never wait on DB I/O.
+
+    Writes are queued under a key such as ("user_data", username). A write submitted while
+    another with the same key is still waiting replaces (or is merged into) it, so bursts of
+    updates cost one statement. pending() lets the game read values not yet written.
+    """
+    _STOP = object()
+
+    def __init__(self, maxsize=PERSIST_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize)
+        self._pending = {}  # key -> [fn, payload], not yet picked up by the thread
+        self._inflight = {}  # key -> payload currently being written
+        self._lock = threading.Lock()
+        self._thread = None
+        self.stats = {"submitted": 0, "coalesced": 0, "written": 0, "failed": 0,
+                      "last_ms": 0.0, "max_ms": 0.0, "total_ms": 0.0}
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="war-io-persistence", daemon=True)
+            self._thread.start()
+
+    def submit(self, key, fn, payload, merge=None):
+        """Queues fn(payload); merge(old, new) combines it with a write still waiting under key."""
+        self.start()
+        with self._lock:
+            self.stats["submitted"] += 1
+            waiting = self._pending.get(key)
+            if waiting is not None:
+                waiting[0] = fn
+                waiting[1] = merge(waiting[1], payload) if merge else payload
+                self.stats["coalesced"] += 1
+                return
+            self._pending[key] = [fn, payload]
+        self._queue.put(key) # Blocks only if the thread falls PERSIST_QUEUE_SIZE writes behind
+
+    def pending(self, key):
+        """Returns the payloads not yet written under key, oldest first (being written, then waiting)."""
+        with self._lock:
+            payloads = [self._inflight[key]] if key in self._inflight else []
+            if key in self._pending:
+                payloads.append(self._pending[key][1])
+            return payloads
+
+    def pending_items(self, kind):
+        """Returns (key, payload) pairs, oldest first, for every unwritten key whose first element is kind."""
+        with self._lock:
+            items = [(k, p) for k, p in self._inflight.items() if k[0] == kind]
+            items.extend((k, w[1]) for k, w in self._pending.items() if k[0] == kind)
+            return items
+
+    def flush(self):
+        """Blocks until everything queued so far has been written."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def stop(self):
+        """Drains the queue and stops the thread (called on shutdown)."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+        self._thread = None
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["queue_depth"] = self._queue.qsize()
+            stats["pending"] = len(self._pending) + len(self._inflight)
+        written = stats["written"] + stats["failed"]
+        stats["avg_ms"] = stats["total_ms"] / written if written else 0.0
+        return stats
+
+    def _run(self):
+        while True:
+            key = self._queue.get()
+            if key is self._STOP:
+                self._queue.task_done()
+                return
+            with self._lock:
+                fn, payload = self._pending.pop(key)
+                self._inflight[key] = payload
+            start = time.perf_counter()
+            ok = False
+            try:
+                ok = fn(payload) is not False
+            except Exception as e:
+                print(f"An unexpected error occurred in background save {key}: {e}")
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._inflight.pop(key, None)
+                self.stats["written" if ok else "failed"] += 1
+                self.stats["last_ms"] = elapsed
+                self.stats["max_ms"] = max(self.stats["max_ms"], elapsed)
+                self.stats["total_ms"] += elapsed
+            self._queue.task_done()
+
+
+persistence = PersistenceWorker()
+
+def get_persistence_stats():
+    """Returns queue depth, coalescing counters and write latency of the persistence thread."""
+    return persistence.snapshot()
+
+def create_tables(backend=None):
+    """Creates necessary tables in the database if they don't exist.
+
+    Without a backend this opens the configured one, which runs the migration.
+    """
+    if backend is None:
+        get_storage()
+        return
+    try:
+        if not backend.migrate():
+            print("No database connection to create tables.")
+    except backend.Error as e:
+        print(f"Error creating tables: {e}. Running without database features.")
+    except Exception as e:
+        print(f"An unexpected error occurred during table creation: {e}. Running without database features.")
 
 # --------- Konfigurasi ----------
 WIDTH = 1200
 HEIGHT = 700
 
+def env_number(name, default, cast=float):
+    """Reads a numeric setting from the environment, warning and using `default` when it is malformed."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        print(f"Warning: {name}={value!r} is not a valid number, using {default}.")
+        return default
+
 # Add variables to track current window size for responsiveness
 current_width = WIDTH
 current_height = HEIGHT
@@ -99,6 +790,8 @@ EXPLOSION_RADIUS = 80
 EXPLOSION_DAMAGE = 40
 
 MAX_LEADERBOARD = 10
+LEADERBOARD_RETAIN = 100  # rows kept in the table by the scheduled trim
+LEADERBOARD_TRIM_INTERVAL = 10 * 60 * 1000  # ms between bulk trims
 
 # Warna
 WHITE = (245, 245, 245)
@@ -116,244 +809,588 @@ CYAN = (80, 200, 220)
 LIGHT_BLUE = (100, 100, 255) # For rain
 MAGENTA = (255, 0, 255) # For TeleportingEnemy
 
-pygame.init()
-try:
-    pygame.mixer.init()
-except Exception as e:
-    print(f"Audio initialization failed: {e}. Running without sound.")
-# Load background music
-try:
-    pygame.mixer.music.load('bg_music.mp3')
-    pygame.mixer.music.set_volume(0.3)
-    pygame.mixer.music.play(-1)
-except:
-    print("Background music not found.")
-# Load sound effects
-try:
-    shoot_sound = pygame.mixer.Sound('shoot.wav')
-    enemy_death_sound = pygame.mixer.Sound('enemy_death.wav')
-    player_hurt_sound = pygame.mixer.Sound('player_hurt.wav')
-    explosion_sound = pygame.mixer.Sound('explosion.wav')
-    powerup_sound = pygame.mixer.Sound('powerup.wav')
-    dash_sound = pygame.mixer.Sound('dash.wav')
-    shield_sound = pygame.mixer.Sound('shield.wav')
-except:
-    shoot_sound = None
-    enemy_death_sound = None
-    player_hurt_sound = None
-    explosion_sound = None
-    powerup_sound = None
-    dash_sound = None
-    shield_sound = None
-    print("Some sound effects not found.")
+# Sound effects are loaded by init_audio(); None until then (and when a file is missing)
+shoot_sound = None
+enemy_death_sound = None
+player_hurt_sound = None
+explosion_sound = None
+powerup_sound = None
+dash_sound = None
+shield_sound = None
+audio_ready = False
+
 fullscreen = False
 windowed_size = (WIDTH, HEIGHT)
-screen = pygame.display.set_mode((current_width, current_height), pygame.RESIZABLE)
-pygame.display.set_caption("War.io")
-clock = pygame.time.Clock()
-create_tables()
+RENDER_SCALE = min(1.0, max(0.25, env_number("WARIO_RENDER_SCALE", 1.0))) # Internal resolution as a share of the window
+RESIZE_DEBOUNCE_MS = 150 # A window drag is applied once it has been still this long
+
+screen = None  # created by init_display(); everything is drawn here
+window = None  # the display surface; the same surface as screen unless RENDER_SCALE < 1
+pending_resize = None  # (width, height, ticks) of the last VIDEORESIZE not yet applied
+clock = None
 # We'll create fonts on demand in draw_text for variable sizes
 base_font_name = "consolas"
-if base_font_name not in pygame.font.get_fonts():
-    base_font_name = pygame.font.get_default_font()
+
+def init_display():
+    """Initializes the video and font subsystems and opens the game window."""
+    global clock, base_font_name
+    with timed_phase("display"):
+        pygame.display.init()
+        create_render_target(current_width, current_height)
+        pygame.display.set_caption("War.io")
+        clock = pygame.time.Clock()
+    with timed_phase("fonts"):
+        pygame.font.init()
+        if base_font_name not in pygame.font.get_fonts():
+            base_font_name = pygame.font.get_default_font()
+
+def init_audio():
+    """Starts the mixer, background music and sound effects; runs once, after the menu is visible."""
+    global audio_ready, shoot_sound, enemy_death_sound, player_hurt_sound, explosion_sound, powerup_sound, dash_sound, shield_sound
+    if audio_ready:
+        return
+    audio_ready = True
+    with timed_phase("audio"):
+        try:
+            pygame.mixer.init()
+        except Exception as e:
+            print(f"Audio initialization failed: {e}. Running without sound.")
+            return
+        # Load background music
+        try:
+            pygame.mixer.music.load(os.path.join(GAME_DIR, 'bg_music.mp3'))
+            pygame.mixer.music.set_volume(0.3)
+            pygame.mixer.music.play(-1)
+        except Exception:
+            print("Background music not found.")
+        # Load sound effects
+        try:
+            shoot_sound = pygame.mixer.Sound(os.path.join(GAME_DIR, 'shoot.wav'))
+            enemy_death_sound = pygame.mixer.Sound(os.path.join(GAME_DIR, 'enemy_death.wav'))
+            player_hurt_sound = pygame.mixer.Sound(os.path.join(GAME_DIR, 'player_hurt.wav'))
+            explosion_sound = pygame.mixer.Sound(os.path.join(GAME_DIR, 'explosion.wav'))
+            powerup_sound = pygame.mixer.Sound(os.path.join(GAME_DIR, 'powerup.wav'))
+            dash_sound = pygame.mixer.Sound(os.path.join(GAME_DIR, 'dash.wav'))
+            shield_sound = pygame.mixer.Sound(os.path.join(GAME_DIR, 'shield.wav'))
+        except Exception:
+            shoot_sound = None
+            enemy_death_sound = None
+            player_hurt_sound = None
+            explosion_sound = None
+            powerup_sound = None
+            dash_sound = None
+            shield_sound = None
+            print("Some sound effects not found.")
+
+def create_render_target(window_w, window_h):
+    """Opens the window at the given size and the surface the game draws on, sized by RENDER_SCALE."""
+    global window, screen, current_width, current_height
+    window = pygame.display.set_mode((window_w, window_h), pygame.RESIZABLE)
+    if RENDER_SCALE < 1:
+        current_width, current_height = max(1, round(window_w * RENDER_SCALE)), max(1, round(window_h * RENDER_SCALE))
+        screen = pygame.Surface((current_width, current_height)).convert()
+    else:
+        current_width, current_height = window_w, window_h
+        screen = window
 
 # Add event handler for window resize to update WIDTH and HEIGHT
 def handle_window_resize(event):
-    """Handles window resize events, updating global dimensions and screen."""
-    global current_width, current_height, screen
-    current_width, current_height = event.w, event.h
-    screen = pygame.display.set_mode((current_width, current_height), pygame.RESIZABLE)
+    """Records the new window size; apply_pending_resize() applies it once the drag settles."""
+    global pending_resize
+    pending_resize = (event.w, event.h, pygame.time.get_ticks())
+
+def apply_pending_resize():
+    """Resizes the render target once no VIDEORESIZE arrived for RESIZE_DEBOUNCE_MS."""
+    global pending_resize
+    if pending_resize and pygame.time.get_ticks() - pending_resize[2] >= RESIZE_DEBOUNCE_MS:
+        width, height, _ = pending_resize
+        pending_resize = None
+        create_render_target(width, height)
+        rebuild_background()
+        renderer.invalidate()
+
+def to_game_pos(pos):
+    """Maps a window position (mouse events) to render-target coordinates."""
+    if screen is window:
+        return pos
+    return (int(pos[0] * current_width / window.get_width()), int(pos[1] * current_height / window.get_height()))
+
+def get_mouse_pos():
+    return to_game_pos(pygame.mouse.get_pos())
+
+def present_to_window(rects=None):
+    """Scales the render target onto the window when they differ; returns rects in window coordinates."""
+    if screen is window:
+        return rects
+    pygame.transform.scale(screen, window.get_size(), window)
+    if rects is None:
+        return None
+    sx, sy = window.get_width() / current_width, window.get_height() / current_height
+    return [pygame.Rect(int(r.x * sx), int(r.y * sy), math.ceil(r.w * sx) + 1, math.ceil(r.h * sy) + 1) for r in rects]
+
+# ---------------- Background ----------------
+# Arena look. tile is an optional image (path or Surface) repeated across the arena and
+# decorate an optional callable(surface) drawing extra detail; both run only when the cache is rebuilt.
+background_theme = {"color": BG, "grid_color": (17, 22, 28), "grid_spacing": 60, "tile": None, "decorate": None}
+background_surface = None
+
+def rebuild_background():
+    """Pre-renders the arena background for the current window size."""
+    global background_surface
+    surface = pygame.Surface((current_width, current_height)).convert()
+    surface.fill(background_theme["color"])
+    tile = background_theme["tile"]
+    if tile is not None:
+        if isinstance(tile, str):
+            tile = pygame.image.load(os.path.join(GAME_DIR, tile)).convert()
+        tw, th = tile.get_size()
+        surface.blits([(tile, (x, y)) for x in range(0, current_width, tw) for y in range(0, current_height, th)], False)
+    spacing = background_theme["grid_spacing"]
+    if spacing:
+        for gx in range(0, current_width, spacing):
+            pygame.draw.line(surface, background_theme["grid_color"], (gx, 0), (gx, current_height))
+        for gy in range(0, current_height, spacing):
+            pygame.draw.line(surface, background_theme["grid_color"], (0, gy), (current_width, gy))
+    if background_theme["decorate"]:
+        background_theme["decorate"](surface)
+    background_surface = surface
+
+def set_background_theme(**changes):
+    """Changes background_theme entries (color, grid_color, grid_spacing, tile, decorate) and rebuilds the cache."""
+    background_theme.update(changes)
+    rebuild_background()
+
+def arena_background():
+    """Returns the cached arena background, building it on first use."""
+    if background_surface is None or background_surface.get_size() != (current_width, current_height):
+        rebuild_background()
+    return background_surface
+
+# ---------------- Frame presentation ----------------
+RENDER_MODE = os.environ.get("WARIO_RENDERER", "flip").lower()  # "flip" or "dirty"
+DIRTY_FLIP_THRESHOLD = 0.5  # share of the window above which one flip beats rect updates
+
+class FrameRenderer:
+    """Presents frames with a full flip, or in "dirty" mode by updating only the regions that changed.
+
+    Screens start a frame with begin() instead of filling the window and end it with present().
+    In dirty mode begin() only restores the background under what was drawn last frame, every
+    draw reports its bounds through mark(), and present() pushes last frame's and this frame's
+    rects with display.update(). A resize, a new background or too much change falls back to a flip.
+    """
+    def __init__(self, mode=RENDER_MODE):
+        self.dirty = mode == "dirty"
+        self._previous = []  # rects drawn last frame, erased by the next begin()
+        self._current = []
+        self._key = None  # (background, window size) of the last frame
+        self._full = True
+        self.last_dirty_area = 0
+        self.last_dirty_fraction = 1.0
+        self.stats = {"frames": 0, "flips": 0, "partial": 0, "dirty_area": 0}
+
+    def begin(self, surf, background=None):
+        """Clears the frame to background (a Surface), or to BG when None."""
+        key = (background, surf.get_size())
+        if key != self._key:
+            self._key = key
+            self._full = True
+        if not self.dirty or self._full:
+            if background is None:
+                surf.fill(BG)
+            else:
+                surf.blit(background, (0, 0))
+        else:
+            for rect in self._previous:
+                if background is None:
+                    surf.fill(BG, rect)
+                else:
+                    surf.blit(background, rect, rect)
+        self._current = []
+
+    def mark(self, rect):
+        """Records a region drawn this frame (ignored in flip mode)."""
+        if self.dirty and rect:
+            self._current.append(pygame.Rect(rect))
+        return rect
+
+    def mark_all(self, rects):
+        if self.dirty and rects:
+            self._current.extend(rects)
+
+    def invalidate(self):
+        """Forces the next frame to be redrawn and flipped in full."""
+        self._full = True
+
+    def present(self):
+        """Shows the frame and records how much of the window changed."""
+        self.stats["frames"] += 1
+        width, height = screen.get_size()
+        total = width * height or 1
+        if self.dirty and not self._full:
+            bounds = pygame.Rect(0, 0, width, height)
+            rects = [r.clip(bounds) for r in self._previous + self._current]
+            rects = [r for r in rects if r.w and r.h]
+            area = sum(r.w * r.h for r in rects)  # overlaps counted twice; only used as a cost estimate
+        else:
+            rects, area = None, total
+        if rects is None or area > total * DIRTY_FLIP_THRESHOLD:
+            present_to_window()
+            pygame.display.flip()
+            self.stats["flips"] += 1
+        else:
+            pygame.display.update(present_to_window(rects))
+            self.stats["partial"] += 1
+        self.last_dirty_area = min(area, total)
+        self.last_dirty_fraction = self.last_dirty_area / total
+        self.stats["dirty_area"] += self.last_dirty_area
+        self._previous, self._current = self._current, []
+        self._full = False
+        apply_pending_resize()
+
+    def snapshot(self):
+        """Returns frame counters and the dirty area of the last frame."""
+        frames = self.stats["frames"] or 1
+        return dict(self.stats, mode="dirty" if self.dirty else "flip",
+                    last_dirty_area=self.last_dirty_area, last_dirty_fraction=self.last_dirty_fraction,
+                    avg_dirty_area=self.stats["dirty_area"] // frames)
+
+
+renderer = FrameRenderer()
 
 # ---------------- Leaderboard helpers ----------------
 def load_leaderboard():
     """Loads leaderboard data from the database."""
+    # Taken before the query so a write finishing mid-read is still seen
+    pending = persistence.pending_items("leaderboard")
     conn = get_db_connection()
     if conn:
+        cursor = None
         try:
             cursor = conn.cursor()
             cursor.execute("SELECT name, score, kills FROM leaderboard ORDER BY score DESC, kills DESC LIMIT %s", (MAX_LEADERBOARD,))
             rows = cursor.fetchall()
-            cursor.close()
-            conn.close()
-            return [{"name": row[0], "score": row[1], "kills": row[2]} for row in rows]
-        except mysql.connector.Error as e:
+            return merge_pending_leaderboard([{"name": row[0], "score": row[1], "kills": row[2]} for row in rows], pending)
+        except storage.Error as e:
             print(f"Database error loading leaderboard: {e}. Using empty leaderboard.")
             return []
         except Exception as e:
             print(f"An unexpected error occurred loading leaderboard: {e}. Using empty leaderboard.")
             return []
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
     return []
 
 
-def save_leaderboard(lb):
-    """Saves leaderboard data to the database."""
+def merge_pending_leaderboard(rows, pending):
+    """Applies results still queued for the persistence thread on top of rows read from the DB."""
+    best = {row["name"]: row for row in rows}
+    for (_, name), (score, kills) in pending:
+        row = best.get(name)
+        if row is None or (score, kills) > (row["score"], row["kills"]):
+            best[name] = {"name": name, "score": score, "kills": kills}
+    return sorted(best.values(), key=lambda e: (e["score"], e["kills"]), reverse=True)[:MAX_LEADERBOARD]
+
+
+def submit_leaderboard_score(name, score, kills):
+    """Queues a leaderboard result for the persistence thread; results pending for a name are coalesced."""
+    persistence.submit(("leaderboard", name), lambda result: write_leaderboard_score(name, *result),
+                       (score, kills), merge=max)
+
+
+def write_leaderboard_score(name, score, kills):
+    """Upserts a result; an existing row is only overwritten when (score, kills) beats it."""
     conn = get_db_connection()
     if conn:
+        cursor = None
         try:
             cursor = conn.cursor()
-            cursor.execute("TRUNCATE TABLE leaderboard") # Clear existing leaderboard
-            for entry in lb:
-                cursor.execute("INSERT INTO leaderboard (name, score, kills) VALUES (%s, %s, %s)", (entry["name"], entry["score"], entry["kills"]))
+            cursor.execute(storage.sql["leaderboard_upsert"], (name, score, kills))
             conn.commit()
-            cursor.close()
-            conn.close()
-        except mysql.connector.Error as e:
+            return True
+        except storage.Error as e:
             print(f"Database error saving leaderboard: {e}. Leaderboard not saved.")
         except Exception as e:
             print(f"An unexpected error occurred saving leaderboard: {e}. Leaderboard not saved.")
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
+    return False
+
+
+def trim_leaderboard(keep=LEADERBOARD_RETAIN):
+    """Deletes, in one statement, every row ranked below the top `keep` results."""
+    conn = get_db_connection()
+    if conn:
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            # The cutoff is the keep-th ranked row; everything strictly below it goes
+            cursor.execute(storage.sql["leaderboard_trim"], (keep - 1,))
+            conn.commit()
+            return True
+        except storage.Error as e:
+            print(f"Database error trimming leaderboard: {e}")
+        except Exception as e:
+            print(f"An unexpected error occurred trimming leaderboard: {e}")
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
+    return False
+
+
+last_leaderboard_trim = None
+
+def maybe_trim_leaderboard():
+    """Queues trim_leaderboard at most once every LEADERBOARD_TRIM_INTERVAL ms."""
+    global last_leaderboard_trim
+    now = pygame.time.get_ticks()
+    if last_leaderboard_trim is None or now - last_leaderboard_trim >= LEADERBOARD_TRIM_INTERVAL:
+        last_leaderboard_trim = now
+        persistence.submit(("leaderboard_trim",), lambda keep: trim_leaderboard(keep), LEADERBOARD_RETAIN)
 
 # ---------------- User management ----------------
-def load_users():
-    """Loads user credentials from the database."""
+USER_CACHE_SIZE = 256  # recent username lookups kept in memory
+
+class LRUCache:
+    """Small thread-safe mapping that evicts the least recently used key once full."""
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Only found rows are cached, so an account created by another client is seen on its first lookup
+user_cache = LRUCache(USER_CACHE_SIZE)  # username -> {"id", "password"}
+admin_cache = LRUCache(USER_CACHE_SIZE)  # username -> {"password", "permissions"}
+
+def find_user(username):
+    """Looks up one user by username; returns {"id", "password"} or None."""
+    user = user_cache.get(username)
+    if user is not None:
+        return user
     conn = get_db_connection()
     if conn:
+        cursor = None
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT username, password FROM users")
-            rows = cursor.fetchall()
-            cursor.close()
-            conn.close()
-            return {row[0]: row[1] for row in rows}
-        except mysql.connector.Error as e:
-            print(f"Database error loading users: {e}. Running without user accounts.")
-            return {}
+            cursor.execute("SELECT id, password FROM users WHERE username = %s", (username,))
+            row = cursor.fetchone()
+            if row:
+                user = {"id": row[0], "password": row[1]}
+                user_cache.put(username, user)
+            return user
+        except storage.Error as e:
+            print(f"Database error looking up user '{username}': {e}")
         except Exception as e:
-            print(f"An unexpected error occurred loading users: {e}. Running without user accounts.")
-            return {}
-    return {}
+            print(f"An unexpected error occurred looking up user '{username}': {e}")
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
+    return None
+
+def get_user_id(username):
+    """Returns the users.id of a username (cached), or None if it doesn't exist."""
+    user = find_user(username)
+    return user["id"] if user else None
+
+def authenticate(username, password):
+    """Returns "admin" or "user" for valid credentials (admins are checked first), else None."""
+    admin = find_admin(username)
+    if admin and admin["password"] == password:
+        return "admin"
+    user = find_user(username)
+    if user and user["password"] == password:
+        return "user"
+    return None
 
 def add_user_to_db(username, password):
     """Adds a new user to the database."""
     conn = get_db_connection()
     if conn:
+        cursor = None
         try:
             cursor = conn.cursor()
             cursor.execute("INSERT INTO users (username, password) VALUES (%s, %s)", (username, password))
             conn.commit()
-        except mysql.connector.Error as e:
+            user_cache.put(username, {"id": cursor.lastrowid, "password": password})
+            return True
+        except storage.Error as e:
             print(f"Error adding user '{username}' to DB: {e}")
         except Exception as e:
             print(f"An unexpected error occurred adding user '{username}' to DB: {e}")
         finally:
             if cursor: cursor.close()
             if conn: conn.close()
+    return False
 
-def load_admins():
-    """Loads admin credentials from the database."""
+def find_admin(username):
+    """Looks up one admin by username; returns {"password", "permissions"} or None."""
+    admin = admin_cache.get(username)
+    if admin is not None:
+        return admin
     conn = get_db_connection()
     if conn:
+        cursor = None
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT username, password, permissions FROM admins")
-            rows = cursor.fetchall()
-            cursor.close()
-            conn.close()
-            return {row[0]: {"password": row[1], "permissions": json.loads(row[2]) if row[2] else {}} for row in rows}
-        except mysql.connector.Error as e:
-            print(f"Database error loading admins: {e}. Running without admin features.")
-            return {}
+            cursor.execute("SELECT password, permissions FROM admins WHERE username = %s", (username,))
+            row = cursor.fetchone()
+            if row:
+                admin = {"password": row[0], "permissions": json.loads(row[1]) if row[1] else {}}
+                admin_cache.put(username, admin)
+            return admin
+        except storage.Error as e:
+            print(f"Database error looking up admin '{username}': {e}")
         except Exception as e:
-            print(f"An unexpected error occurred loading admins: {e}. Running without admin features.")
-            return {}
-    return {}
+            print(f"An unexpected error occurred looking up admin '{username}': {e}")
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
+    return None
 
 def add_admin_to_db(username, password, permissions=None):
     """Adds a new admin to the database."""
     conn = get_db_connection()
     if conn:
+        cursor = None
         try:
             cursor = conn.cursor()
             permissions_json = json.dumps(permissions if permissions else {})
             cursor.execute("INSERT INTO admins (username, password, permissions) VALUES (%s, %s, %s)", (username, password, permissions_json))
             conn.commit()
-        except mysql.connector.Error as e:
+            admin_cache.put(username, {"password": password, "permissions": dict(permissions or {})})
+            return True
+        except storage.Error as e:
             print(f"Error adding admin '{username}' to DB: {e}")
         except Exception as e:
             print(f"An unexpected error occurred adding admin '{username}' to DB: {e}")
         finally:
             if cursor: cursor.close()
             if conn: conn.close()
+    return False
 
 def update_admin_permissions(username, permissions):
     """Updates admin permissions in the database."""
     conn = get_db_connection()
     if conn:
+        cursor = None
         try:
             cursor = conn.cursor()
             permissions_json = json.dumps(permissions)
             cursor.execute("UPDATE admins SET permissions = %s WHERE username = %s", (permissions_json, username))
             conn.commit()
-        except mysql.connector.Error as e:
+        except storage.Error as e:
             print(f"Error updating admin '{username}' permissions: {e}")
         except Exception as e:
             print(f"An unexpected error occurred updating admin '{username}' permissions: {e}")
         finally:
+            admin_cache.discard(username)
             if cursor: cursor.close()
             if conn: conn.close()
 
 def delete_user_from_db(username):
     """Deletes a user from the database (admin function)."""
+    user_id = get_user_id(username)
     conn = get_db_connection()
     if conn:
+        cursor = None
         try:
             cursor = conn.cursor()
-            # Get user_id before deleting from users table
-            cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
-            user_id_row = cursor.fetchone()
-            if user_id_row:
-                user_id = user_id_row[0]
+            if user_id is not None:
                 cursor.execute("DELETE FROM user_data WHERE user_id = %s", (user_id,))
             cursor.execute("DELETE FROM users WHERE username = %s", (username,))
             conn.commit()
+            invalidate_game_statistics()
             print(f"User '{username}' and associated data deleted successfully.")
-        except mysql.connector.Error as e:
+        except storage.Error as e:
             print(f"Error deleting user '{username}' from DB: {e}")
         except Exception as e:
             print(f"An unexpected error occurred deleting user '{username}' from DB: {e}")
         finally:
+            user_cache.discard(username)
             if cursor: cursor.close()
             if conn: conn.close()
 
+GAME_STATS_TTL = 5.0  # seconds the admin panel reuses the last statistics read
+
+GAME_STATS_FIELDS = ("total_users", "active_users", "total_score", "total_kills", "leaderboard_count")
+
+game_stats_cache = None
+game_stats_cached_at = 0.0
+
 def get_game_statistics():
     """Gets game statistics for admin panel."""
+    global game_stats_cache, game_stats_cached_at
+    if game_stats_cache is not None and time.monotonic() - game_stats_cached_at < GAME_STATS_TTL:
+        return game_stats_cache
     conn = get_db_connection()
     if conn:
+        cursor = None
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM users")
-            total_users = cursor.fetchone()[0]
-
-            cursor.execute("SELECT COUNT(*) FROM user_data WHERE score > 0")
-            active_users = cursor.fetchone()[0]
-
-            cursor.execute("SELECT SUM(score) FROM user_data")
-            total_score = cursor.fetchone()[0] or 0
-
-            cursor.execute("SELECT SUM(kills) FROM user_data")
-            total_kills = cursor.fetchone()[0] or 0
-
-            cursor.execute("SELECT COUNT(*) FROM leaderboard")
-            leaderboard_count = cursor.fetchone()[0]
-
-            cursor.close()
-            conn.close()
-
-            return {
-                "total_users": total_users,
-                "active_users": active_users,
-                "total_score": total_score,
-                "total_kills": total_kills,
-                "leaderboard_count": leaderboard_count
-            }
-        except mysql.connector.Error as e:
+            cursor.execute("SELECT total_users, active_users, total_score, total_kills, leaderboard_count FROM game_stats WHERE id = 1")
+            row = cursor.fetchone()
+            if row is None:
+                # Materialized row missing (e.g. cleared by hand): rebuild it from the tables
+                row = recompute_game_statistics(cursor)
+                conn.commit()
+            game_stats_cache = dict(zip(GAME_STATS_FIELDS, row))
+            game_stats_cached_at = time.monotonic()
+            return game_stats_cache
+        except storage.Error as e:
             print(f"Database error getting statistics: {e}")
             return {}
         except Exception as e:
             print(f"An unexpected error occurred getting statistics: {e}")
             return {}
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
     return {}
 
-admins = load_admins()
+def recompute_game_statistics(cursor):
+    """Recomputes the statistics with a single aggregate query and stores them in game_stats."""
+    cursor.execute(GAME_STATS_RECOMPUTE_SQL)
+    row = tuple(int(v or 0) for v in cursor.fetchone())
+    cursor.execute("DELETE FROM game_stats")
+    cursor.execute(f"INSERT INTO game_stats (id, {', '.join(GAME_STATS_FIELDS)}) VALUES (1, %s, %s, %s, %s, %s)", row)
+    return row
+
+def invalidate_game_statistics():
+    """Drops the cached statistics so the next read goes to game_stats."""
+    global game_stats_cache
+    game_stats_cache = None
+
 current_admin = None
 
 # ---------------- User game data management ----------------
@@ -393,9 +1430,59 @@ default_ammo = {
     "disintegration_ray": 8
 }
 
-def load_user_data(username):
-    """Loads user-specific game data from the database."""
-    user_data = {
+def load_weapon_order():
+    """Reads the canonical weapon order from unlocked.json (falls back to default_ammo's order)."""
+    try:
+        with open(os.path.join(GAME_DIR, "unlocked.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not read unlocked.json: {e}. Using built-in weapon order.")
+        return list(default_ammo)
+
+# Positions in this list index the unlocked bitset and the ammo array, so new weapons are only ever appended
+WEAPON_ORDER = load_weapon_order()
+WEAPON_INDEX = {w: i for i, w in enumerate(WEAPON_ORDER)}
+
+# Binary user_data encodings: one format-version byte, then the payload
+UNLOCKED_FORMAT = 1  # little-endian bitset, bit i = WEAPON_ORDER[i]
+AMMO_FORMAT = 1  # little-endian int32 per weapon, in WEAPON_ORDER
+AMMO_STRUCT = struct.Struct(f"<B{len(WEAPON_ORDER)}i")
+
+def encode_unlocked(unlocked):
+    """Packs a set of weapon names into the versioned bitset stored in user_data.unlocked_bin."""
+    bits = 0
+    for weapon in unlocked:
+        if weapon in WEAPON_INDEX:
+            bits |= 1 << WEAPON_INDEX[weapon]
+    return bytes([UNLOCKED_FORMAT]) + bits.to_bytes((len(WEAPON_ORDER) + 7) // 8, "little")
+
+def decode_unlocked(data):
+    """Inverse of encode_unlocked; rows written with a shorter weapon list decode fine."""
+    data = bytes(data)
+    if data[0] != UNLOCKED_FORMAT:
+        raise ValueError(f"unknown unlocked format {data[0]}")
+    bits = int.from_bytes(data[1:], "little")
+    return {w for i, w in enumerate(WEAPON_ORDER) if bits >> i & 1}
+
+def encode_ammo(ammo):
+    """Packs an ammo dict into the versioned fixed-width array stored in user_data.ammo_bin."""
+    return AMMO_STRUCT.pack(AMMO_FORMAT, *[ammo.get(w, 0) for w in WEAPON_ORDER])
+
+def decode_ammo(data):
+    """Inverse of encode_ammo; weapons missing from older rows get their default ammo."""
+    data = bytes(data)
+    if data[0] != AMMO_FORMAT:
+        raise ValueError(f"unknown ammo format {data[0]}")
+    if len(data) == AMMO_STRUCT.size:
+        return dict(zip(WEAPON_ORDER, AMMO_STRUCT.unpack(data)[1:]))
+    counts = struct.unpack_from(f"<{(len(data) - 1) // 4}i", data, 1)
+    ammo = default_ammo.copy()
+    ammo.update(zip(WEAPON_ORDER, counts))
+    return ammo
+
+def default_user_data():
+    """Returns the game data a brand-new user starts with."""
+    return {
         "coins": 0,
         "unlocked": set(["pistol"]),
         "upgrades": {},
@@ -404,102 +1491,194 @@ def load_user_data(username):
         "weapon": "pistol",
         "ammo": default_ammo.copy()
     }
-    conn = get_db_connection()
+
+def load_user_data(username):
+    """Loads user-specific game data from the database."""
+    user_data = default_user_data()
+    # Taken before the query so a write finishing mid-read is still seen
+    pending = persistence.pending(("user_data", username))
+    user_id = get_user_id(username)
+    legacy = {}  # fields that were still stored as JSON
+    conn = get_db_connection() if user_id is not None else None
     if conn:
+        cursor = None
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
-            user_id_row = cursor.fetchone()
-            if user_id_row:
-                user_id = user_id_row[0]
-                cursor.execute("SELECT coins, unlocked, upgrades, score, kills, weapon, ammo FROM user_data WHERE user_id = %s", (user_id,))
-                row = cursor.fetchone()
-                if row:
-                    coins_db, unlocked_json, upgrades_json, score_db, kills_db, weapon_db, ammo_json = row
-                    user_data["coins"] = coins_db
-                    user_data["unlocked"] = set(json.loads(unlocked_json)) if unlocked_json else set(["pistol"])
-                    user_data["upgrades"] = json.loads(upgrades_json) if upgrades_json else {}
-                    user_data["score"] = score_db
-                    user_data["kills"] = kills_db
-                    user_data["weapon"] = weapon_db
-                    user_data["ammo"] = json.loads(ammo_json) if ammo_json else default_ammo.copy()
-            cursor.close()
-            conn.close()
-        except mysql.connector.Error as e:
+            cursor.execute("SELECT coins, unlocked, unlocked_bin, upgrades, score, kills, weapon, ammo, ammo_bin FROM user_data WHERE user_id = %s", (user_id,))
+            row = cursor.fetchone()
+            if row:
+                coins_db, unlocked_json, unlocked_bin, upgrades_json, score_db, kills_db, weapon_db, ammo_json, ammo_bin = row
+                user_data["coins"] = coins_db
+                if unlocked_bin:
+                    user_data["unlocked"] = decode_unlocked(unlocked_bin)
+                elif unlocked_json:
+                    user_data["unlocked"] = legacy["unlocked"] = set(json.loads(unlocked_json))
+                user_data["upgrades"] = json.loads(upgrades_json) if upgrades_json else {}
+                user_data["score"] = score_db
+                user_data["kills"] = kills_db
+                user_data["weapon"] = weapon_db
+                if ammo_bin:
+                    user_data["ammo"] = decode_ammo(ammo_bin)
+                elif ammo_json:
+                    user_data["ammo"] = legacy["ammo"] = json.loads(ammo_json)
+        except storage.Error as e:
             print(f"Database error loading user data for {username}: {e}. Using default data.")
         except json.JSONDecodeError as e:
             print(f"JSON decode error loading user data for {username}: {e}. Using default data for affected fields.")
         except Exception as e:
             print(f"An unexpected error occurred loading user data for {username}: {e}. Using default data.")
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
+    if legacy:
+        legacy = {f: copy_user_field(v) for f, v in legacy.items()}
+        persistence.submit(("user_data_encoding", username), lambda fields: convert_user_encoding(user_id, fields), legacy)
+    # Read-your-writes: fields still queued for the persistence thread win over the DB row
+    for fields in pending:
+        user_data.update({f: copy_user_field(v) for f, v in fields.items()})
     return user_data
 
 def save_user_data(username, user_data):
     """Saves user-specific game data to the database."""
+    return save_user_fields(username, {f: user_data[f] for f in USER_DATA_FIELDS if f in user_data})
+
+# Columns of user_data that a profile can write back, in statement order
+USER_DATA_FIELDS = ("coins", "unlocked", "upgrades", "score", "kills", "weapon", "ammo")
+
+def user_field_columns(field, value):
+    """Returns the (column, value) pairs that store a profile field in user_data."""
+    # unlocked/ammo use the binary encoding; clearing the JSON column finishes that row's migration
+    if field == "unlocked":
+        return [("unlocked_bin", encode_unlocked(value)), ("unlocked", None)]
+    if field == "ammo":
+        return [("ammo_bin", encode_ammo(value)), ("ammo", None)]
+    if field == "upgrades":
+        return [(field, json.dumps(value))]
+    return [(field, value)]
+
+def save_user_fields(username, fields):
+    """Writes only the given user_data columns for a user in a single upsert."""
+    pairs = [pair for f in USER_DATA_FIELDS if f in fields for pair in user_field_columns(f, fields[f])]
+    if not pairs:
+        return True
+    columns = [c for c, _ in pairs]
+    user_id = get_user_id(username)
     conn = get_db_connection()
     if conn:
+        cursor = None
         try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
-            user_id_row = cursor.fetchone()
-            if not user_id_row:
+            if user_id is None:
                 raise ValueError(f"User {username} not found in database.")
-            user_id = user_id_row[0]
-
-            # Ensure 'unlocked' is a list for JSON serialization if it's a set
-            unlocked_for_db = list(user_data.get("unlocked", set(["pistol"])))
-
-            cursor.execute("""
-                INSERT INTO user_data (user_id, coins, unlocked, upgrades, score, kills, weapon, ammo)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                coins = VALUES(coins), unlocked = VALUES(unlocked), upgrades = VALUES(upgrades),
-                score = VALUES(score), kills = VALUES(kills), weapon = VALUES(weapon), ammo = VALUES(ammo)
-            """, (
-                user_id,
-                user_data.get("coins", 0),
-                json.dumps(unlocked_for_db),
-                json.dumps(user_data.get("upgrades", {})),
-                user_data.get("score", 0),
-                user_data.get("kills", 0),
-                user_data.get("weapon", "pistol"),
-                json.dumps(user_data.get("ammo", default_ammo.copy()))
-            ))
+            cursor = conn.cursor()
+            cursor.execute(
+                f"INSERT INTO user_data (user_id, {', '.join(columns)}) "
+                f"VALUES ({', '.join(['%s'] * (len(columns) + 1))}) "
+                + storage.upsert_clause("user_id", columns),
+                (user_id,) + tuple(v for _, v in pairs)
+            )
             conn.commit()
-            cursor.close()
-            conn.close()
-        except mysql.connector.Error as e:
+            return True
+        except storage.Error as e:
             print(f"Database error saving user data for {username}: {e}. Data not saved.")
         except ValueError as e:
             print(f"Error: {e}. Data not saved.")
         except Exception as e:
             print(f"An unexpected error occurred saving user data for {username}: {e}. Data not saved.")
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
     else:
         print("No database connection to save user data.")
+    return False
+
+def convert_user_encoding(user_id, fields):
+    """Rewrites a row's JSON unlocked/ammo in the binary encoding, unless a newer save already did."""
+    conn = get_db_connection()
+    if conn:
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            for field, value in fields.items():
+                (bin_column, encoded), (json_column, _) = user_field_columns(field, value)
+                cursor.execute(
+                    f"UPDATE user_data SET {bin_column} = %s, {json_column} = NULL "
+                    f"WHERE user_id = %s AND {bin_column} IS NULL",
+                    (encoded, user_id)
+                )
+            conn.commit()
+            return True
+        except storage.Error as e:
+            print(f"Database error converting user data for user {user_id}: {e}")
+        except Exception as e:
+            print(f"An unexpected error occurred converting user data for user {user_id}: {e}")
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
+    return False
+
+def copy_user_field(value):
+    """Returns a snapshot of a profile field that later in-place changes won't affect."""
+    if isinstance(value, (set, dict)):
+        return value.copy()
+    return value
+
+# ---------------- User profile session ----------------
+PROFILE_FLUSH_DEBOUNCE = 3000  # ms without changes before dirty fields are written
+
+class UserProfile:
+    """In-memory session copy of a user's data that writes back only the fields that changed."""
+    def __init__(self, username=None, user_data=None):
+        data = user_data if user_data is not None else default_user_data()
+        object.__setattr__(self, "username", username)
+        object.__setattr__(self, "_dirty", set())
+        object.__setattr__(self, "_last_change", 0)
+        for field in USER_DATA_FIELDS:
+            object.__setattr__(self, field, data[field])
+
+    @classmethod
+    def load(cls, username):
+        """Loads a user's profile from the database once, at login."""
+        return cls(username, load_user_data(username))
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in USER_DATA_FIELDS:
+            self.mark_dirty(name)
+
+    def mark_dirty(self, *fields):
+        """Flags fields for the next flush; needed after in-place changes (e.g. unlocked.add)."""
+        self._dirty.update(fields)
+        object.__setattr__(self, "_last_change", pygame.time.get_ticks())
+
+    @property
+    def dirty(self):
+        return bool(self._dirty)
+
+    def flush(self):
+        """Checkpoint: hands all dirty fields to the persistence thread as one write."""
+        if not self.username or not self._dirty:
+            self._dirty.clear()
+            return
+        # Copy containers so the game can keep mutating them while the thread serializes
+        fields = {f: copy_user_field(getattr(self, f)) for f in self._dirty}
+        username = self.username
+        persistence.submit(("user_data", username), lambda pending: save_user_fields(username, pending),
+                           fields, merge=lambda older, newer: {**older, **newer})
+        self._dirty.clear()
+
+    def maybe_flush(self):
+        """Flushes once the profile has been left unchanged for PROFILE_FLUSH_DEBOUNCE ms."""
+        if self._dirty and pygame.time.get_ticks() - self._last_change >= PROFILE_FLUSH_DEBOUNCE:
+            self.flush()
 
-def save_coins(coins_val):
-    """Saves the current user's coin count to the database."""
-    if current_user:
-        user_data = load_user_data(current_user)
-        user_data["coins"] = coins_val
-        save_user_data(current_user, user_data)
-
-def save_unlocked(unlocked_set):
-    """Saves the current user's unlocked weapons to the database."""
-    if current_user:
-        user_data = load_user_data(current_user)
-        user_data["unlocked"] = unlocked_set # Expects a set
-        save_user_data(current_user, user_data)
-
-def save_upgrades(upgrades_val):
-    """Saves the current user's upgrades to the database."""
-    if current_user:
-        user_data = load_user_data(current_user)
-        user_data["upgrades"] = upgrades_val
-        save_user_data(current_user, user_data)
-
-users = load_users()
 current_user = None
-leaderboard = load_leaderboard()
+leaderboard = [] # Filled by warm_up_storage() once the database is open
+
+def warm_up_storage():
+    """Opens the database and loads the leaderboard; queued on the persistence thread by main()."""
+    global leaderboard
+    get_storage()
+    leaderboard = load_leaderboard()
 
 # ---------------- Weapon prices ----------------
 weapon_prices = {
@@ -544,15 +1723,17 @@ upgrade_prices = {
     "damage_mult": 300
 }
 
-coins = 0
-unlocked = set(["pistol"])
-upgrades = {}
+profile = UserProfile() # Session profile of the logged-in user (guest profile when logged out)
 
 # Global weather state
 is_raining = False
 rain_duration = 0
 rain_start_time = 0
-rain_drops = []
+RAIN_DROPS = 200 # Drops in a normal shower
+RAIN_STORM_DROPS = 2000 # Drops in a heavy storm
+RAIN_STORM_CHANCE = 0.2 # Chance that a rain spell is a storm
+RAIN_TEXTURE_DROPS = 1000 # Above this many drops, rain is drawn from pre-baked scrolling layers
+RAIN_LAYER_SPEEDS = (4.5, 6.0, 7.5) # Fall speed of each storm layer, pixels per 60 FPS frame
 RAIN_SPEED_DEBUFF = 0.85 # REVISI: Mengurangi penalti kecepatan hujan
 # Global daily mission state
 daily_mission = {"desc": "Bunuh 50 musuh", "target": 50, "progress": 0, "reward": 100, "completed": False}
@@ -576,53 +1757,447 @@ def add_to_leaderboard(name, score, kills):
                 entry["score"] = int(score)
                 entry["kills"] = int(kills)
                 leaderboard = sorted(leaderboard, key=lambda e: (e["score"], e["kills"]), reverse=True)[:MAX_LEADERBOARD]
-                save_leaderboard(leaderboard)
+                submit_leaderboard_score(name, int(score), int(kills))
             return
     # If not exists, add if qualifies
     if qualifies_for_leaderboard(score, kills):
         leaderboard.append({"name": name, "score": int(score), "kills": int(kills)})
         leaderboard = sorted(leaderboard, key=lambda e: (e["score"], e["kills"]), reverse=True)[:MAX_LEADERBOARD]
-        save_leaderboard(leaderboard)
+        submit_leaderboard_score(name, int(score), int(kills))
 
 # ---------------- Utility draw ----------------
+FONT_CACHE_SIZE = 32  # distinct font sizes kept open
+TEXT_CACHE_SIZE = 512  # rendered text surfaces kept for reuse
+
+font_cache = LRUCache(FONT_CACHE_SIZE)  # size -> pygame.font.Font
+text_cache = LRUCache(TEXT_CACHE_SIZE)  # (text, size, color, antialias) -> rendered Surface
+
+def get_font(size):
+    """Returns the base font at the given size, creating it only once."""
+    size = int(size)
+    f = font_cache.get(size)
+    if f is None:
+        f = pygame.font.SysFont(base_font_name, size)
+        font_cache.put(size, f)
+    return f
+
+def render_text(text, size, color=WHITE, antialias=True):
+    """Returns a rendered text surface, reusing one rendered earlier with the same arguments."""
+    key = (str(text), int(size), tuple(color), antialias)
+    txt = text_cache.get(key)
+    if txt is None:
+        txt = get_font(size).render(key[0], antialias, color)
+        text_cache.put(key, txt)
+    return txt
+
+def get_text_cache_stats():
+    """Returns hit/miss counters and sizes of the font and rendered-text caches."""
+    return {
+        "font_hits": font_cache.hits, "font_misses": font_cache.misses, "fonts": len(font_cache),
+        "text_hits": text_cache.hits, "text_misses": text_cache.misses, "texts": len(text_cache)
+    }
+
 def draw_text(surf, text, size, x, y, color=WHITE, center=False):
     """Draws text on a surface."""
-    # create font with requested size (fallback to default font)
-    f = pygame.font.SysFont(base_font_name, int(size))
-    txt = f.render(str(text), True, color)
+    txt = render_text(text, size, color)
     rect = txt.get_rect()
     if center:
         rect.center = (x, y)
     else:
         rect.topleft = (x, y)
-    surf.blit(txt, rect)
+    return renderer.mark(surf.blit(txt, rect))
+
+# ---------------- HUD ----------------
+class HUD:
+    """In-game HUD kept on a persistent alpha surface; only fields whose text changed are re-rendered.
+
+    Call begin() once per frame, text() for each field that should be visible, then end() to
+    update the cached surface and blit it. Fields not given this frame are cleared.
+    """
+    def __init__(self):
+        self.surface = None
+        self._fields = {}  # name -> ((text, size, color, x, y), rect on the surface)
+        self._frame = {}  # name -> (text, size, color, x, y) requested this frame
+        self.rendered_last_frame = 0
+        self.stats = {"frames": 0, "fields_rendered": 0}
+
+    def begin(self, width, height):
+        if self.surface is None or self.surface.get_size() != (width, height):
+            self.surface = pygame.Surface((width, height), pygame.SRCALPHA)
+            self._fields.clear()
+        self._frame = {}
+
+    def text(self, name, text, size, x, y, color=WHITE):
+        self._frame[name] = (str(text), size, tuple(color), x, y)
+
+    def end(self, surf):
+        changed = [n for n, spec in self._frame.items() if n not in self._fields or self._fields[n][0] != spec]
+        removed = [n for n in self._fields if n not in self._frame]
+        cleared = []
+        for name in changed + removed:
+            if name in self._fields:
+                cleared.append(self._fields.pop(name)[1])
+        for rect in cleared:
+            self.surface.fill((0, 0, 0, 0), rect)
+        # Unchanged fields touching a cleared area lost pixels and are drawn again too
+        redraw = set(changed)
+        redraw.update(n for n, (_, rect) in self._fields.items() if rect.collidelist(cleared) != -1)
+        for name in redraw:
+            text, size, color, x, y = self._frame[name]
+            rect = self.surface.blit(render_text(text, size, color), (x, y))
+            self._fields[name] = (self._frame[name], rect)
+        self.rendered_last_frame = len(redraw)
+        self.stats["frames"] += 1
+        self.stats["fields_rendered"] += len(redraw)
+        if renderer.dirty:
+            for _, rect in self._fields.values():
+                renderer.mark(surf.blit(self.surface, rect, rect))
+        else:
+            surf.blit(self.surface, (0, 0))
+
+    def snapshot(self):
+        """Returns fields re-rendered last frame and on average."""
+        frames = self.stats["frames"]
+        return dict(self.stats, last_frame=self.rendered_last_frame,
+                    avg_per_frame=self.stats["fields_rendered"] / frames if frames else 0.0)
+
+# ---------------- Simulation clock ----------------
+SIM_HZ = 120  # Fixed simulation rate, independent of the render rate
+SIM_DT = 1.0 / SIM_HZ
+FRAME_SCALE = SIM_DT * 60  # Converts "per 60 FPS frame" amounts to per-step amounts
+MAX_FRAME_TIME = 0.25  # Longest frame the simulation catches up on; beyond that the game slows down
+RENDER_FPS = env_number("WARIO_RENDER_FPS", 0, int)  # 0 = uncapped
+
+class SimClock:
+    """Game time in ms, advanced only by simulation steps; entities read it instead of pygame ticks."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.now = 0.0
+        self.steps = 0
+
+    def advance(self, dt):
+        self.now += dt * 1000
+        self.steps += 1
+
+
+sim_clock = SimClock()
+
+class SimTimers:
+    """pygame.time.set_timer on simulation time: due timers post their event from the step that reaches them."""
+    def __init__(self):
+        self.timers = {}  # event type -> [interval ms, due at]
+
+    def set_timer(self, event_type, millis):
+        if millis <= 0:
+            self.timers.pop(event_type, None)
+        else:
+            self.timers[event_type] = [millis, sim_clock.now + millis]
+
+    def update(self):
+        for event_type, timer in self.timers.items():
+            if sim_clock.now >= timer[1]:
+                timer[1] += timer[0]
+                pygame.event.post(pygame.event.Event(event_type))
+
+
+def store_positions(*groups):
+    """Remembers where moving entities were at the start of a simulation step."""
+    for group in groups:
+        for e in group:
+            e.prev_pos.update(e.pos)
+
+
+def interpolate_positions(alpha, *groups):
+    """Places each entity's draw_pos between its last two simulated positions."""
+    for group in groups:
+        for e in group:
+            e.draw_pos = e.prev_pos.lerp(e.pos, alpha)
+
+# ---------------- Entity store ----------------
+class EntityStore:
+    """Container for one kind of game entity with O(1) removal.
+
+    kill() only tombstones an entity (its `alive` flag), so loops over the store stay valid while
+    entities die mid-step; iteration skips the dead. compact(), called once at the end of a step,
+    swap-removes the tombstones, so order within the store is not preserved across steps.
+    add() returns a (slot, generation) handle; get() returns None once that entity is gone, even if
+    the slot has been reused.
+    """
+    def __init__(self, entities=()):
+        self.items = []
+        self.slots = []  # slot -> entity, or None when free
+        self.generations = []
+        self.free = []
+        for e in entities:
+            self.add(e)
+
+    def add(self, e):
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot = len(self.slots)
+            self.slots.append(None)
+            self.generations.append(0)
+        self.slots[slot] = e
+        e.alive = True
+        e.handle = (slot, self.generations[slot])
+        self.items.append(e)
+        return e.handle
+
+    append = add
+
+    def get(self, handle):
+        slot, generation = handle
+        if self.generations[slot] != generation:
+            return None
+        e = self.slots[slot]
+        return e if e.alive else None
+
+    def kill(self, e):
+        e.alive = False
+
+    def __iter__(self):
+        for e in self.items:
+            if e.alive:
+                yield e
+
+    def __len__(self):
+        """Entries including ones killed this step; exact again after compact()."""
+        return len(self.items)
+
+    def compact(self):
+        """Drops every killed entity, filling each hole with the last entry."""
+        items = self.items
+        i = 0
+        while i < len(items):
+            e = items[i]
+            if e.alive:
+                i += 1
+                continue
+            slot = e.handle[0]
+            self.slots[slot] = None
+            self.generations[slot] += 1
+            self.free.append(slot)
+            last = items.pop()
+            if i < len(items):
+                items[i] = last
+
+    def clear(self):
+        for e in self.items:
+            e.alive = False
+        self.compact()
+
 
 # ---------------- Game Entities ----------------
-class Particle:
-    """Represents a visual particle effect."""
-    def __init__(self, pos, vel, radius, life, color):
-        self.pos = Vector2(pos)
-        self.vel = Vector2(vel)
-        self.radius = radius
-        self.life = life
-        self.maxlife = life
-        self.color = color
+PARTICLE_CAPACITY = 2048  # initial pool size; doubles if a burst doesn't fit
+PARTICLE_ALPHA_BUCKETS = 16  # fade steps baked into the sprite cache
+PARTICLE_GRAVITY = 9 * 0.6
+
+particle_rng = np.random.default_rng()
+
+class ParticleSystem:
+    """Pool of particles stored in NumPy arrays, integrated and drawn in batches.
+
+    Live particles occupy the first `count` slots. Sprites are pre-rendered circles cached by
+    (color, radius, alpha bucket) and drawn with a single Surface.blits call.
+    """
+    _sprites = {}  # (color index, radius, alpha bucket) -> Surface, shared by every pool
+    _palette = []
+    _color_index = {}
+
+    def __init__(self, capacity=PARTICLE_CAPACITY):
+        self.count = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = getattr(self, "pos", None)
+        arrays = {
+            "pos": np.zeros((capacity, 2), np.float32),
+            "vel": np.zeros((capacity, 2), np.float32),
+            "radius": np.zeros(capacity, np.float32),
+            "life": np.zeros(capacity, np.float32),
+            "maxlife": np.ones(capacity, np.float32),
+            "color": np.zeros(capacity, np.int16),
+        }
+        if old is not None:
+            for name, array in arrays.items():
+                array[:self.count] = getattr(self, name)[:self.count]
+        for name, array in arrays.items():
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.count
+
+    @classmethod
+    def color_id(cls, color):
+        color = tuple(color)
+        if color not in cls._color_index:
+            cls._color_index[color] = len(cls._palette)
+            cls._palette.append(color)
+        return cls._color_index[color]
+
+    def _reserve(self, n):
+        if self.count + n > self.capacity:
+            capacity = self.capacity
+            while self.count + n > capacity:
+                capacity *= 2
+            self._allocate(capacity)
+        start = self.count
+        self.count += n
+        return slice(start, self.count)
+
+    def emit(self, x, y, vx, vy, radius, life, color):
+        """Adds one particle."""
+        i = self._reserve(1).start
+        self.pos[i] = (x, y)
+        self.vel[i] = (vx, vy)
+        self.radius[i] = radius
+        self.life[i] = self.maxlife[i] = life
+        self.color[i] = self.color_id(color)
+
+    def burst(self, x, y, count, speed, radius, life, colors, distance=(0, 0)):
+        """Adds `count` particles flying out of (x, y) in random directions.
+
+        speed, radius, life and distance (spawn offset along the flight direction) are (low, high)
+        ranges; colors is a list of (color, probability).
+        """
+        if count <= 0:
+            return
+        s = self._reserve(count)
+        ang = particle_rng.uniform(0, math.tau, count)
+        direction = np.column_stack((np.cos(ang), np.sin(ang)))
+        self.pos[s] = (x, y) + direction * particle_rng.uniform(*distance, count)[:, None]
+        self.vel[s] = direction * particle_rng.uniform(*speed, count)[:, None]
+        self.radius[s] = particle_rng.uniform(*radius, count)
+        self.life[s] = self.maxlife[s] = particle_rng.uniform(*life, count)
+        ids = np.array([self.color_id(c) for c, _ in colors], np.int16)
+        weights = np.cumsum([p for _, p in colors])
+        self.color[s] = ids[np.minimum(np.searchsorted(weights / weights[-1], particle_rng.random(count)), len(ids) - 1)]
+
+    def clear(self):
+        self.count = 0
 
     def update(self, dt):
-        self.pos += self.vel * dt
-        self.life -= dt
-        self.vel.y += 9 * dt * 0.6 # Gravity effect
+        """Moves every particle, applies gravity and life decay, then compacts out dead ones."""
+        n = self.count
+        if not n:
+            return
+        self.pos[:n] += self.vel[:n] * dt
+        self.life[:n] -= dt
+        self.vel[:n, 1] += PARTICLE_GRAVITY * dt
+        alive = self.life[:n] > 0.01
+        k = int(alive.sum())
+        if k < n:
+            for array in (self.pos, self.vel, self.radius, self.life, self.maxlife, self.color):
+                array[:k] = array[:n][alive]
+            self.count = k
 
     def draw(self, surf):
-        if self.life <= 0:
+        n = self.count
+        if not n:
             return
-        t = max(0, self.life / self.maxlife)
-        r = max(0.5, int(self.radius * t))
-        alpha = int(255 * t)
-        s = pygame.Surface((r * 2, r * 2), pygame.SRCALPHA)
-        c = (*self.color, alpha)
-        pygame.draw.circle(s, c, (r, r), r)
-        surf.blit(s, (self.pos.x - r, self.pos.y - r))
+        t = np.clip(self.life[:n] / self.maxlife[:n], 0, 1)
+        r = np.maximum(1, (self.radius[:n] * t).astype(np.int32))
+        bucket = (t * (PARTICLE_ALPHA_BUCKETS - 1) + 0.5).astype(np.int32)
+        x = (self.pos[:n, 0] - r).astype(np.int32)
+        y = (self.pos[:n, 1] - r).astype(np.int32)
+        sprites = self._sprites
+        batch = []
+        for key, px, py in zip(zip(self.color[:n].tolist(), r.tolist(), bucket.tolist()), x.tolist(), y.tolist()):
+            sprite = sprites.get(key)
+            if sprite is None:
+                sprite = sprites[key] = self._bake(*key)
+            batch.append((sprite, (px, py)))
+        return surf.blits(batch, renderer.dirty)
+
+    @classmethod
+    def _bake(cls, color, r, bucket):
+        sprite = pygame.Surface((r * 2, r * 2), pygame.SRCALPHA)
+        alpha = int(255 * bucket / (PARTICLE_ALPHA_BUCKETS - 1))
+        pygame.draw.circle(sprite, (*cls._palette[color], alpha), (r, r), r)
+        return sprite
+
+
+SPRITE_COLORKEY = (255, 0, 254)  # transparent pixels of hard-edged sprites; no game color uses it
+
+sprite_cache = {}  # (shape, *params) -> pre-rendered Surface in display format
+
+def keyed_surface(size):
+    """Returns a surface cleared to SPRITE_COLORKEY, for shapes without soft edges."""
+    sprite = pygame.Surface(size)
+    sprite.fill(SPRITE_COLORKEY)
+    sprite.set_colorkey(SPRITE_COLORKEY)
+    return sprite
+
+
+def bake_sprite(key, build):
+    """Returns the cached sprite for key, building it with build() on first use.
+
+    Colorkeyed sprites are RLE encoded, which blits far faster than per-pixel alpha.
+    """
+    sprite = sprite_cache.get(key)
+    if sprite is None:
+        sprite = build()
+        if pygame.display.get_surface() is not None:
+            if sprite.get_flags() & pygame.SRCALPHA:
+                sprite = sprite.convert_alpha()
+            else:
+                sprite = sprite.convert()
+        if sprite.get_colorkey() is not None:
+            sprite.set_colorkey(SPRITE_COLORKEY, pygame.RLEACCEL)
+        sprite_cache[key] = sprite
+    return sprite
+
+
+def circle_sprite(color, radius):
+    """Returns a filled circle sprite; blit it at (x - radius, y - radius)."""
+    def build():
+        sprite = keyed_surface((radius * 2 + 1, radius * 2 + 1))
+        pygame.draw.circle(sprite, color, (radius, radius), radius)
+        return sprite
+    return bake_sprite(("circle", tuple(color), radius), build)
+
+
+def box_sprite(color, half):
+    """Returns a rounded square sprite with sides of 2 * half."""
+    def build():
+        sprite = keyed_surface((half * 2, half * 2))
+        pygame.draw.rect(sprite, color, (0, 0, half * 2, half * 2), border_radius=4)
+        return sprite
+    return bake_sprite(("box", tuple(color), half), build)
+
+
+def labeled_circle_sprite(color, radius, label, label_color, offset):
+    """Returns a circle sprite with text drawn at offset from its center, and the sprite's offset from the center."""
+    txt = render_text(label, 14, label_color)
+    bounds = pygame.Rect(-radius, -radius, radius * 2 + 1, radius * 2 + 1).union(txt.get_rect(topleft=offset))
+    def build():
+        sprite = pygame.Surface(bounds.size, pygame.SRCALPHA)
+        pygame.draw.circle(sprite, color, (-bounds.x, -bounds.y), radius)
+        sprite.blit(txt, (offset[0] - bounds.x, offset[1] - bounds.y))
+        return sprite
+    return bake_sprite(("label", tuple(color), radius, label, tuple(label_color)), build), bounds.topleft
+
+
+def health_bar_sprite(fill, width, height):
+    """Returns a health bar sprite with fill pixels of the bar green."""
+    def build():
+        sprite = pygame.Surface((width, height))
+        sprite.fill(GRAY)
+        pygame.draw.rect(sprite, GREEN, (0, 0, fill, height))
+        pygame.draw.rect(sprite, BLACK, (0, 0, width, height), 1)
+        return sprite
+    return bake_sprite(("health", fill, width, height), build)
+
+
+def draw_sprites(surf, drawables):
+    """Draws a layer of entities with one Surface.blits call; returns their rects in dirty mode."""
+    batch = [d.sprite() for d in drawables]
+    if batch:
+        return surf.blits(batch, renderer.dirty)
 
 
 class Bullet:
@@ -630,6 +2205,8 @@ class Bullet:
     def __init__(self, pos, dir_vec, owner="player", btype="normal",
                  speed=BULLET_SPEED, radius=5, color=YELLOW, damage=18, lifetime=5000):
         self.pos = Vector2(pos)
+        self.prev_pos = Vector2(pos)
+        self.draw_pos = Vector2(pos)
         if dir_vec.length_squared() == 0:
             dir_vec = Vector2(1, 0)
         self.dir = dir_vec.normalize()
@@ -640,7 +2217,7 @@ class Bullet:
         self.radius = radius
         self.color = color
         self.damage = damage
-        self.spawn_time = pygame.time.get_ticks()
+        self.spawn_time = sim_clock.now
         self.lifetime = lifetime  # ms
         self.timer = None
         self.exploded = False
@@ -651,46 +2228,64 @@ class Bullet:
     def update(self, dt):
         self.pos += self.vel * dt
         if self.timer is not None:
-            self.timer -= clock.get_time()
+            self.timer -= dt * 1000
             if self.timer <= 0 and not self.exploded:
-                self.exploded = True
-                self.alive = False # Mark for removal after explosion
-        if pygame.time.get_ticks() - self.spawn_time > self.lifetime:
+                self.exploded = True # The game loop queues the blast and removes the grenade
+        if sim_clock.now - self.spawn_time > self.lifetime:
             self.alive = False
         # Remove bullets that go far off-screen
         if (self.pos.x < -120 or self.pos.x > current_width + 120 or
                 self.pos.y < -120 or self.pos.y > current_height + 120):
             self.alive = False
 
+    def sprite(self):
+        return circle_sprite(self.color, self.radius), (int(self.draw_pos.x) - self.radius, int(self.draw_pos.y) - self.radius)
+
     def draw(self, surf):
-        pygame.draw.circle(surf, self.color, (int(self.pos.x), int(self.pos.y)), self.radius)
+        return surf.blit(*self.sprite())
 
 
 class Entity:
     """Base class for game entities with position, size, health, and color."""
     def __init__(self, x, y, size, color=WHITE, hp=100):
         self.pos = Vector2(x, y)
+        self.prev_pos = Vector2(x, y)  # position at the start of the current simulation step
+        self.draw_pos = Vector2(x, y)  # interpolated position used for drawing
         self.size = size
         self.color = color
         self.hp = hp
         self.max_hp = hp
 
+    def sprite(self):
+        return circle_sprite(self.color, self.size), (int(self.draw_pos.x) - self.size, int(self.draw_pos.y) - self.size)
+
+    def health_bar(self, width=40, height=6):
+        """Returns the health bar sprite and its position above the entity."""
+        hp_w = min(width, int(width * max(0, self.hp) / self.max_hp))  # one cached sprite per pixel of fill
+        return (health_bar_sprite(hp_w, width, height),
+                (int(self.draw_pos.x) - width // 2, int(self.draw_pos.y - self.size - 10) - height // 2))
+
     def draw_health_bar(self, surf, width=40, height=6):
         """Draws a health bar above the entity."""
-        bar_rect = pygame.Rect(0, 0, width, height)
-        bar_rect.center = (int(self.pos.x), int(self.pos.y - self.size - 10))
-        pygame.draw.rect(surf, GRAY, bar_rect)
-        hp_w = int(width * max(0, self.hp) / self.max_hp)
-        hp_rect = pygame.Rect(bar_rect.left, bar_rect.top, hp_w, height)
-        pygame.draw.rect(surf, GREEN, hp_rect)
-        pygame.draw.rect(surf, BLACK, bar_rect, 1)
+        return surf.blit(*self.health_bar(width, height))
+
+
+class HealthBar:
+    """Drawable view of an entity's health bar, for batching with draw_sprites."""
+    __slots__ = ("entity",)
+
+    def __init__(self, entity):
+        self.entity = entity
+
+    def sprite(self):
+        return self.entity.health_bar()
 
 
 class Player(Entity):
     """Represents the player character."""
     def __init__(self, x=current_width//2, y=current_height//2, initial_upgrades=None):
         super().__init__(x, y, PLAYER_SIZE, color=WHITE, hp=100)
-        upgrades_data = initial_upgrades if initial_upgrades is not None else upgrades # Use global upgrades if not provided
+        upgrades_data = initial_upgrades if initial_upgrades is not None else profile.upgrades # Use session upgrades if not provided
         self.max_hp = 100 + (50 if upgrades_data.get("max_hp", 0) else 0)
         self.hp = self.max_hp # Player starts with full HP
         self.speed_bonus = 1.2 if upgrades_data.get("speed", 0) else 1.0
@@ -794,7 +2389,7 @@ class Player(Entity):
 
     def update_combo(self):
         """Updates the player's combo count and multiplier."""
-        now = pygame.time.get_ticks()
+        now = sim_clock.now
         if now - self.last_kill_time < self.combo_timer:
             self.combo += 1
             self.combo_multiplier = 1.0 + (self.combo * 0.1)  # Increase multiplier by 0.1 per combo
@@ -805,12 +2400,12 @@ class Player(Entity):
 
     def can_shoot(self):
         """Checks if the player can currently shoot."""
-        now = pygame.time.get_ticks()
+        now = sim_clock.now
         return now - self.last_shot >= self.cooldowns.get(self.weapon, 200)
 
     def start_dash(self):
         """Initiates a dash maneuver."""
-        now = pygame.time.get_ticks()
+        now = sim_clock.now
         if now - self.last_dash >= self.dash_cooldown and not self.dashing:
             self.dashing = True
             self.dash_timer = self.dash_duration
@@ -827,7 +2422,7 @@ class Player(Entity):
 
     def activate_shield_skill(self):
         """Activates the player's shield skill."""
-        now = pygame.time.get_ticks()
+        now = sim_clock.now
         if now - self.last_shield_skill >= self.shield_skill_cooldown:
             self.shield_skill_active = True
             self.shield_skill_timer = self.shield_skill_duration
@@ -864,11 +2459,7 @@ class Player(Entity):
 
         # During dash, create particles (trail)
         if self.dashing and particles is not None:
-            for _ in range(2):
-                ang = random.uniform(-math.pi, math.pi)
-                sp = random.uniform(0.5, 2.0)
-                vel = Vector2(math.cos(ang) * sp, math.sin(ang) * sp)
-                particles.append(Particle(self.pos.xy, vel, radius=random.uniform(2, 4), life=0.25, color=(220,220,255)))
+            particles.burst(self.pos.x, self.pos.y, max(1, round(2 * FRAME_SCALE)), speed=(0.5, 2.0), radius=(2, 4), life=(0.25, 0.25), colors=[((220,220,255), 1)])
 
         # apply movement
         self.pos += self.vel * dt
@@ -877,20 +2468,20 @@ class Player(Entity):
 
         # update dash timer
         if self.dashing:
-            self.dash_timer -= clock.get_time()
+            self.dash_timer -= dt * 1000
             if self.dash_timer <= 0:
                 self.dashing = False
 
         # update damage buff
         if self.damage_timer > 0:
-            self.damage_timer -= clock.get_time()
+            self.damage_timer -= dt * 1000
             if self.damage_timer <= 0:
                 self.damage_mult = 1.0
                 self.damage_timer = 0
 
         # update shield skill timer
         if self.shield_skill_active:
-            self.shield_skill_timer -= clock.get_time()
+            self.shield_skill_timer -= dt * 1000
             if self.shield_skill_timer <= 0:
                 self.shield_skill_active = False
                 self.shield_hp = 0 # Shield HP depletes when skill ends
@@ -904,37 +2495,39 @@ class Player(Entity):
 
         # update area damage weapon cooldown timer
         if self.weapon == "area_damage":
-            self.area_damage_tick_timer -= clock.get_time()
+            self.area_damage_tick_timer -= dt * 1000
             if self.area_damage_tick_timer < 0:
                 self.area_damage_tick_timer = 0 # Ensure timer doesn't go negative
 
     def draw(self, surf, mouse_pos=(0,0)):
         """Draws the player on the surface."""
+        pos = self.draw_pos
         color = WHITE if not self.dashing else CYAN
-        pygame.draw.circle(surf, color, (int(self.pos.x), int(self.pos.y)), self.size)
+        bounds = pygame.draw.circle(surf, color, (int(pos.x), int(pos.y)), self.size)
         if self.shield_hp > 0:
             # Draw shield as an outer circle
-            pygame.draw.circle(surf, self.shield_color, (int(self.pos.x), int(self.pos.y)), self.size + 10, 3)
-        dirv = Vector2(mouse_pos) - self.pos
+            bounds.union_ip(pygame.draw.circle(surf, self.shield_color, (int(pos.x), int(pos.y)), self.size + 10, 3))
+        dirv = Vector2(mouse_pos) - pos
         if dirv.length_squared() > 0:
             dirn = dirv.normalize()
-            end = self.pos + dirn * (self.size + 12)
-            pygame.draw.line(surf, BLACK,
-                             (int(self.pos.x), int(self.pos.y)), (int(end.x), int(end.y)), 6)
-        self.draw_health_bar(surf)
+            end = pos + dirn * (self.size + 12)
+            bounds.union_ip(pygame.draw.line(surf, BLACK,
+                             (int(pos.x), int(pos.y)), (int(end.x), int(end.y)), 6))
+        bounds.union_ip(self.draw_health_bar(surf))
 
         # Draw area damage weapon effect radius if active and weapon selected
         if self.weapon == "area_damage":
-            now = pygame.time.get_ticks()
+            now = sim_clock.now
             if now - self.area_damage_last_used < self.area_damage_cooldown: # Only draw if recently activated
                 color = (255, 0, 0, 50)  # semi-transparent red
                 s = pygame.Surface((self.area_damage_radius*2, self.area_damage_radius*2), pygame.SRCALPHA)
                 pygame.draw.circle(s, color, (self.area_damage_radius, self.area_damage_radius), self.area_damage_radius, width=3)
-                surf.blit(s, (int(self.pos.x - self.area_damage_radius), int(self.pos.y - self.area_damage_radius)))
+                bounds.union_ip(surf.blit(s, (int(pos.x - self.area_damage_radius), int(pos.y - self.area_damage_radius))))
+        return bounds
 
     def shoot(self, mouse_pos, bullets, particles=None):
         """Fires a bullet based on the current weapon."""
-        now = pygame.time.get_ticks()
+        now = sim_clock.now
         if not self.can_shoot():
             return
 
@@ -977,19 +2570,15 @@ class Player(Entity):
                 self.ammo["machinegun"] -= 1
 
         elif w == "area_damage":
-            now = pygame.time.get_ticks()
+            now = sim_clock.now
             if now - self.area_damage_last_used >= self.area_damage_cooldown:
                 self.area_damage_last_used = now
                 self.area_damage_tick_timer = self.area_damage_tick_interval
                 # Area damage weapon does not shoot bullets, damage applied in game loop
                 # Just spawn some particles to indicate activation
                 if particles:
-                    for _ in range(20):
-                        ang = random.uniform(0, math.tau)
-                        dist = random.uniform(0, self.area_damage_radius)
-                        pos = self.pos + Vector2(math.cos(ang)*dist, math.sin(ang)*dist)
-                        vel = Vector2(math.cos(ang)*random.uniform(0.5,1.5), math.sin(ang)*random.uniform(0.5,1.5))
-                        particles.append(Particle(pos.xy, vel, radius=4, life=0.5, color=RED))
+                    particles.burst(self.pos.x, self.pos.y, 20, speed=(0.5, 1.5), radius=(4, 4), life=(0.5, 0.5),
+                                    colors=[(RED, 1)], distance=(0, self.area_damage_radius))
                 self.ammo["area_damage"] -= 1
 
         elif w == "sniper":
@@ -1077,6 +2666,7 @@ class Player(Entity):
                 new_pos.x = max(self.size, min(current_width - self.size, new_pos.x))
                 new_pos.y = max(self.size, min(current_height - self.size, new_pos.y))
                 self.pos = new_pos
+                self.prev_pos = Vector2(self.pos) # Don't interpolate across the jump
                 self.ammo["teleport_gun"] -= 1
 
         elif w == "black_hole_gun":
@@ -1151,122 +2741,241 @@ class Player(Entity):
         self.last_shot = now
 
 
+# ---------------- Enemy pool ----------------
+ENEMY_CAPACITY = 256  # initial pool size; doubles when a wave doesn't fit
+ENEMY_CHASE, ENEMY_WAVE, ENEMY_TELEPORT = 0, 1, 2  # steering behaviors
+
+enemy_rng = np.random.default_rng()
+
+class EnemyPool:
+    """Enemy state stored in NumPy arrays and steered in one vectorized step per simulation step.
+
+    Enemy objects are thin views: their pos, hp, size, speed, ... properties read and write one
+    slot of the pool. Live enemies occupy the first `count` slots in the order of the game's enemy
+    list; sync() compacts out enemies that were dropped from that list.
+    """
+    VECTORS = ("pos", "prev_pos", "draw_pos", "vel")
+    SCALARS = ("speed", "hp", "size", "kind", "steered", "amplitude", "frequency", "time",
+               "teleport_cd", "last_teleport")
+
+    def __init__(self, capacity=ENEMY_CAPACITY):
+        self.count = 0
+        self.views = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = getattr(self, "pos", None)
+        arrays = {name: np.zeros((capacity, 2)) for name in self.VECTORS}
+        arrays.update({name: np.zeros(capacity) for name in self.SCALARS})
+        arrays["kind"] = np.zeros(capacity, np.int8)
+        arrays["steered"] = np.zeros(capacity, bool)
+        if old is not None:
+            for name, array in arrays.items():
+                array[:self.count] = getattr(self, name)[:self.count]
+        for name, array in arrays.items():
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.count
+
+    def add(self, view):
+        """Gives a new enemy view a slot; its constructor fills in the fields."""
+        if self.count == self.capacity:
+            self._allocate(self.capacity * 2)
+        i = self.count
+        self.count += 1
+        for name in self.VECTORS + self.SCALARS:
+            getattr(self, name)[i] = 0
+        self.kind[i] = view.kind
+        self.steered[i] = view.steered
+        self.views.append(view)
+        return i
+
+    def clear(self):
+        self.count = 0
+        self.views = []
+
+    def sync(self, enemies):
+        """Compacts the pool to the enemies still in the list, in list order.
+
+        Views that were dropped get a private one-slot pool so stray references keep their last state.
+        """
+        if len(enemies) == self.count:
+            return
+        keep = np.array([e.slot for e in enemies], np.intp)
+        alive = np.zeros(self.count, bool)
+        alive[keep] = True
+        for i in np.flatnonzero(~alive).tolist():
+            self._detach(self.views[i])
+        k = len(keep)
+        for name in self.VECTORS + self.SCALARS:
+            array = getattr(self, name)
+            array[:k] = array[keep]
+        self.views = list(enemies)
+        for i, e in enumerate(self.views):
+            e.slot = i
+        self.count = k
+
+    def _detach(self, view):
+        solo = EnemyPool(1)
+        solo.add(view)
+        for name in self.VECTORS + self.SCALARS:
+            getattr(solo, name)[0] = getattr(self, name)[view.slot]
+        view.pool, view.slot = solo, 0
+
+    def store_positions(self):
+        n = self.count
+        self.prev_pos[:n] = self.pos[:n]
+
+    def interpolate_positions(self, alpha):
+        n = self.count
+        self.draw_pos[:n] = self.prev_pos[:n] + (self.pos[:n] - self.prev_pos[:n]) * alpha
+
+    def update(self, dt, target_pos, enemies):
+        """Steers every pooled enemy except those that drive their own movement (the boss)."""
+        self.sync(enemies)
+        self.steer(dt, target_pos, np.flatnonzero(self.steered[:self.count]))
+
+    def steer(self, dt, target_pos, idx):
+        """Chase, wave and teleport behaviors for the slots in idx."""
+        if not len(idx):
+            return
+        kind = self.kind[idx]
+        teleport = kind == ENEMY_TELEPORT
+        if teleport.any():
+            now = sim_clock.now
+            due = teleport & (now - self.last_teleport[idx] > self.teleport_cd[idx])
+            if due.any():
+                # Teleport to a random position near the target; these don't move this step
+                jump = idx[due]
+                angle = enemy_rng.uniform(0, math.tau, len(jump))
+                dist = enemy_rng.uniform(100, 300, len(jump))
+                self.pos[jump] = np.column_stack((target_pos[0] + np.cos(angle) * dist,
+                                                  target_pos[1] + np.sin(angle) * dist))
+                self.prev_pos[jump] = self.pos[jump]  # Don't interpolate across the jump
+                self.last_teleport[jump] = now
+                idx, kind = idx[~due], kind[~due]
+
+        d = np.array(target_pos, np.float64) - self.pos[idx]
+        length = np.hypot(d[:, 0], d[:, 1])
+        speed = self.speed[idx] * (RAIN_SPEED_DEBUFF if is_raining else 1.0)
+        scale = np.divide(speed, length, out=np.zeros_like(length), where=length > 0)
+        vel = d * scale[:, None]
+
+        wave = kind == ENEMY_WAVE
+        if wave.any():
+            wavy = idx[wave]
+            self.time[wavy] += dt
+            vel[wave, 1] += np.sin(self.time[wavy] * self.frequency[wavy]) * self.amplitude[wavy] * dt
+
+        self.vel[idx] = vel
+        self.pos[idx] += vel * dt
+
+
+enemy_pool = EnemyPool()
+
+def pool_vector(name):
+    """Property exposing one row of a pooled (n, 2) array as a Vector2 copy."""
+    def get(self):
+        array, i = getattr(self.pool, name), self.slot
+        return Vector2(array.item(i, 0), array.item(i, 1))
+
+    def set(self, value):
+        getattr(self.pool, name)[self.slot] = (value[0], value[1])
+    return property(get, set)
+
+
+def pool_scalar(name):
+    """Property exposing one element of a pooled array."""
+    def get(self):
+        return getattr(self.pool, name).item(self.slot)
+
+    def set(self, value):
+        getattr(self.pool, name)[self.slot] = value
+    return property(get, set)
+
+
 class Enemy(Entity):
-    """Base class for enemy characters."""
-    def __init__(self, x, y, hp=30):
+    """Base class for enemy characters; a view over one slot of an EnemyPool."""
+    kind = ENEMY_CHASE
+    steered = True  # moved by EnemyPool.update
+
+    pos = pool_vector("pos")
+    prev_pos = pool_vector("prev_pos")
+    draw_pos = pool_vector("draw_pos")
+    vel = pool_vector("vel")
+    speed = pool_scalar("speed")
+    hp = pool_scalar("hp")
+    size = pool_scalar("size")
+
+    def __init__(self, x, y, hp=30, pool=None):
+        self.pool = pool if pool is not None else enemy_pool
+        self.slot = self.pool.add(self)
         col = random.choice([(220, 60, 60), (180, 30, 30), (200, 80, 50)])
         super().__init__(x, y, 18, color=col, hp=hp)
-        self.vel = Vector2(0, 0)
+        self.speed = ENEMY_SPEED
+
+    def sprite(self):
+        x, y = self.pool.draw_pos[self.slot].tolist()
+        size = int(self.pool.size[self.slot])
+        return circle_sprite(self.color, size), (int(x) - size, int(y) - size)
 
     def update(self, dt, target_pos):
-        """Updates the enemy's state, moving towards the target."""
-        dirv = Vector2(target_pos) - self.pos
-        if dirv.length_squared() > 0:
-            speed = ENEMY_SPEED
-            if is_raining: # Apply rain speed debuff
-                speed *= RAIN_SPEED_DEBUFF
-            self.vel = dirv.normalize() * speed
-        else:
-            self.vel = Vector2(0, 0)
-        self.pos += self.vel * dt
+        """Moves just this enemy; the game loop steers the whole pool at once with EnemyPool.update."""
+        self.pool.steer(dt, target_pos, np.array([self.slot]))
 
 
 class FastEnemy(Enemy):
     """A faster, less durable enemy."""
-    def __init__(self, x, y):
-        super().__init__(x, y, hp=20)
+    def __init__(self, x, y, pool=None):
+        super().__init__(x, y, hp=20, pool=pool)
         self.color = (255, 100, 100)  # Light red
         self.speed = ENEMY_SPEED * 1.8
 
-    def update(self, dt, target_pos):
-        dirv = Vector2(target_pos) - self.pos
-        if dirv.length_squared() > 0:
-            speed = self.speed
-            if is_raining: # Apply rain speed debuff
-                speed *= RAIN_SPEED_DEBUFF
-            self.vel = dirv.normalize() * speed
-        else:
-            self.vel = Vector2(0, 0)
-        self.pos += self.vel * dt
-
 
 class ArmoredEnemy(Enemy):
     """A slower, more durable enemy."""
-    def __init__(self, x, y):
-        super().__init__(x, y, hp=60)
+    def __init__(self, x, y, pool=None):
+        super().__init__(x, y, hp=60, pool=pool)
         self.color = (100, 100, 100)  # Gray
         self.speed = ENEMY_SPEED * 0.7
         self.size = 22
 
-    def update(self, dt, target_pos):
-        dirv = Vector2(target_pos) - self.pos
-        if dirv.length_squared() > 0:
-            speed = self.speed
-            if is_raining: # Apply rain speed debuff
-                speed *= RAIN_SPEED_DEBUFF
-            self.vel = dirv.normalize() * speed
-        else:
-            self.vel = Vector2(0, 0)
-        self.pos += self.vel * dt
-
 
 class FlyingEnemy(Enemy):
     """An enemy that moves with a wavy pattern."""
-    def __init__(self, x, y):
-        super().__init__(x, y, hp=25)
+    kind = ENEMY_WAVE
+    amplitude = pool_scalar("amplitude")
+    frequency = pool_scalar("frequency")
+    time = pool_scalar("time")
+
+    def __init__(self, x, y, pool=None):
+        super().__init__(x, y, hp=25, pool=pool)
         self.color = (150, 150, 255)  # Light blue
         self.speed = ENEMY_SPEED * 1.2
         self.amplitude = 50
         self.frequency = 0.02
         self.time = 0
 
-    def update(self, dt, target_pos):
-        self.time += dt
-        dirv = Vector2(target_pos) - self.pos
-        if dirv.length_squared() > 0:
-            speed = self.speed
-            if is_raining: # Apply rain speed debuff
-                speed *= RAIN_SPEED_DEBUFF
-            self.vel = dirv.normalize() * speed
-        else:
-            self.vel = Vector2(0, 0)
-        # Add wavy movement
-        self.vel.y += math.sin(self.time * self.frequency) * self.amplitude * dt
-        self.pos += self.vel * dt
-
 
 class TeleportingEnemy(Enemy):
     """An enemy that periodically teleports near the player."""
-    def __init__(self, x, y):
-        super().__init__(x, y, hp=30)
+    kind = ENEMY_TELEPORT
+    teleport_cd = pool_scalar("teleport_cd")
+    last_teleport = pool_scalar("last_teleport")
+
+    def __init__(self, x, y, pool=None):
+        super().__init__(x, y, hp=30, pool=pool)
         self.color = MAGENTA
         self.speed = ENEMY_SPEED * 1.5
         self.teleport_cd = 2000  # ms
         self.last_teleport = 0
 
-    def update(self, dt, target_pos):
-        now = pygame.time.get_ticks()
-        if now - self.last_teleport > self.teleport_cd:
-            # Teleport to a random position near the player
-            angle = random.uniform(0, math.tau)
-            dist = random.uniform(100, 300)
-            self.pos = Vector2(target_pos) + Vector2(math.cos(angle) * dist, math.sin(angle) * dist)
-            self.last_teleport = now
-        else:
-            # Move towards player
-            dirv = Vector2(target_pos) - self.pos
-            if dirv.length_squared() > 0:
-                speed = self.speed
-                if is_raining: # Apply rain speed debuff
-                    speed *= RAIN_SPEED_DEBUFF
-                self.vel = dirv.normalize() * speed
-            else:
-                self.vel = Vector2(0, 0)
-            self.pos += self.vel * dt
-
 
 class Boss(Enemy):
     """A powerful boss enemy with multiple phases."""
+    steered = False  # moves itself from update()
     def __init__(self, x, y):
         super().__init__(x, y, hp=500)
         self.size = 40
@@ -1276,9 +2985,9 @@ class Boss(Enemy):
         self.phase = 1 # New: Boss phases
         self.phase_timer = 0 # New: Timer for phase specific actions
 
-    def update(self, dt, target_pos, bullets, player_instance, particles_list, enemies_list):
+    def update(self, dt, target_pos, bullets, player_instance, particles_list, blasts, events):
         """Updates the boss's state, including phase-specific actions."""
-        self.phase_timer += clock.get_time() # Use clock.get_time() for ms
+        self.phase_timer += dt * 1000 # ms
 
         # Phase transition
         if self.hp < self.max_hp / 2 and self.phase == 1: # Transition to Phase 2 at 50% HP
@@ -1288,7 +2997,7 @@ class Boss(Enemy):
 
         if self.phase == 1:
             super().update(dt, target_pos) # Normal movement
-            now = pygame.time.get_ticks()
+            now = sim_clock.now
             if now - self.last_shot > self.shoot_cd:
                 dirv = Vector2(target_pos) - self.pos
                 if dirv.length_squared() > 0:
@@ -1303,34 +3012,16 @@ class Boss(Enemy):
             if self.phase_timer >= 2000: # Teleport every 2 seconds
                 # Teleport to a random position
                 self.pos = Vector2(random.randint(50, current_width - 50), random.randint(50, current_height - 50))
+                self.prev_pos = Vector2(self.pos)
 
                 # Spawn explosion at new position
                 spawn_explosion(particles_list, self.pos.x, self.pos.y, count=PARTICLE_COUNT * 5)
 
                 # Damage enemies and player in explosion radius
-                for e in list(enemies_list): # Damage other enemies too
-                    if e != self and (self.pos - e.pos).length() < EXPLOSION_RADIUS:
-                        e.hp -= EXPLOSION_DAMAGE * 1.5 # More damage for boss explosion
-                        spawn_blood(particles_list, e.pos.x, e.pos.y, intensity=8)
-                        if e.hp <= 0:
-                            # No score/drops for boss damaging other enemies
-                            try: enemies_list.remove(e)
-                            except ValueError: pass
+                blasts.add(self.pos.x, self.pos.y, EXPLOSION_RADIUS, EXPLOSION_DAMAGE * 1.5, blood=8, exclude=self) # More damage for boss explosion; no score/drops
 
                 if (self.pos - player_instance.pos).length() < EXPLOSION_RADIUS:
-                    damage = EXPLOSION_DAMAGE * 2 # Player takes more damage
-                    if player_instance.shield_hp > 0:
-                        if player_instance.shield_hp >= damage:
-                            player_instance.shield_hp -= damage
-                            damage = 0
-                        else:
-                            damage -= player_instance.shield_hp
-                            player_instance.shield_hp = 0
-                    player_instance.hp -= damage
-                    spawn_blood(particles_list, player_instance.pos.x, player_instance.pos.y, intensity=12)
-                    if player_instance.hp <= 0:
-                        # Game over logic will be handled in game_loop
-                        pass
+                    events.hurt(EXPLOSION_DAMAGE * 2, blood=12) # Player takes more damage
 
                 self.phase_timer = 0 # Reset phase timer
 
@@ -1343,8 +3034,11 @@ class HealthOrb:
         self.color = GREEN
         self.heal_amount = 25
 
+    def sprite(self):
+        return circle_sprite(self.color, self.size), (int(self.pos.x) - self.size, int(self.pos.y) - self.size)
+
     def draw(self, surf):
-        pygame.draw.circle(surf, self.color, (int(self.pos.x), int(self.pos.y)), self.size)
+        return surf.blit(*self.sprite())
 
 
 class AmmoBox:
@@ -1356,10 +3050,11 @@ class AmmoBox:
         self.fill = {"shotgun": 6, "rocket": 2, "machinegun": 40, "area_damage": 1, "sniper": 4,
                      "flamethrower": 20, "laser": 10, "grenade": 3, "plasma": 2, "gravity_gun": 5, "railgun" : 15 , "minigun" : 20 , "bfg" : 7 , "freeze_ray" : 10, "poison_gun" : 10, "lightning_gun" : 10 , "acid_gun" : 5}
 
+    def sprite(self):
+        return box_sprite(self.color, self.size), (int(self.pos.x - self.size), int(self.pos.y - self.size))
+
     def draw(self, surf):
-        pygame.draw.rect(surf, self.color,
-                         (int(self.pos.x - self.size), int(self.pos.y - self.size),
-                          self.size * 2, self.size * 2), border_radius=4)
+        return surf.blit(*self.sprite())
 
 
 class Powerup:
@@ -1370,9 +3065,12 @@ class Powerup:
         self.ptype = ptype  # 'dash' or 'damage'
         self.color = CYAN if ptype == "dash" else ORANGE
 
+    def sprite(self):
+        sprite, (ox, oy) = labeled_circle_sprite(self.color, self.size, self.ptype[0].upper(), BLACK, (-6, -10))
+        return sprite, (int(self.pos.x) + ox, int(self.pos.y) + oy)
+
     def draw(self, surf):
-        pygame.draw.circle(surf, self.color, (int(self.pos.x), int(self.pos.y)), self.size)
-        draw_text(surf, self.ptype[0].upper(), 14, int(self.pos.x - 6), int(self.pos.y - 10), color=BLACK)
+        return surf.blit(*self.sprite())
 
 
 class Mine:
@@ -1383,47 +3081,203 @@ class Mine:
         self.color = DARK_RED
         self.damage = 20
 
+    def sprite(self):
+        return circle_sprite(self.color, self.size), (int(self.pos.x) - self.size, int(self.pos.y) - self.size)
+
     def draw(self, surf):
-        pygame.draw.circle(surf, self.color, (int(self.pos.x), int(self.pos.y)), self.size)
+        return surf.blit(*self.sprite())
 
 
 # ---------------- Helpers: particles, explosion ------------
 def spawn_blood(particles, x, y, intensity=PARTICLE_COUNT):
     """Spawns blood particles at a given position."""
-    for _ in range(intensity):
-        ang = random.uniform(0, math.tau)
-        speed = random.uniform(2, 8)
-        vel = Vector2(math.cos(ang) * speed, math.sin(ang) * speed)
-        radius = random.uniform(2, 5)
-        life = random.uniform(0.4, 1.0)
-        color = RED if random.random() > 0.3 else DARK_RED
-        particles.append(Particle((x, y), vel, radius, life, color))
+    particles.burst(x, y, intensity, speed=(2, 8), radius=(2, 5), life=(0.4, 1.0), colors=[(RED, 0.7), (DARK_RED, 0.3)])
 
 
 def spawn_explosion(particles, x, y, count=PARTICLE_COUNT * 3):
     """Spawns explosion particles and plays explosion sound."""
     if explosion_sound:
         explosion_sound.play()
-    for _ in range(count):
-        ang = random.uniform(0, math.tau)
-        speed = random.uniform(3, 12)
-        vel = Vector2(math.cos(ang) * speed, math.sin(ang) * speed)
-        radius = random.uniform(3, 8)
-        life = random.uniform(0.6, 1.4)
-        color = ORANGE if random.random() > 0.4 else YELLOW
-        particles.append(Particle((x, y), vel, radius, life, color))
+    particles.burst(x, y, count, speed=(3, 12), radius=(3, 8), life=(0.6, 1.4), colors=[(ORANGE, 0.6), (YELLOW, 0.4)])
 
 
 def spawn_sparks(particles, x, y, count=8):
     """Spawns spark particles at a given position."""
-    for _ in range(count):
-        ang = random.uniform(0, math.tau)
-        speed = random.uniform(1, 5)
-        vel = Vector2(math.cos(ang) * speed, math.sin(ang) * speed)
-        radius = random.uniform(1, 3)
-        life = random.uniform(0.2, 0.6)
-        color = WHITE
-        particles.append(Particle((x, y), vel, radius, life, color))
+    particles.burst(x, y, count, speed=(1, 5), radius=(1, 3), life=(0.2, 0.6), colors=[(WHITE, 1)])
+
+# ---------------- Spatial hash ----------------
+SPATIAL_CELL_SIZE = 64  # About one large enemy plus a bullet, so most queries touch 3x3 cells
+
+class SpatialHash:
+    """Uniform grid over entity centers for broadphase queries, rebuilt once per simulation step.
+
+    Queries return entities in the order they were added, so callers that stop at the first hit
+    behave exactly like a scan over the original list.
+    """
+    def __init__(self, cell_size=SPATIAL_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.max_size = 0  # largest entity radius, added to query reach
+
+    def rebuild(self, entities):
+        cells = self.cells = {}
+        cs = self.cell_size
+        max_size = 0
+        for order, e in enumerate(entities):
+            x, y = e.pos
+            key = (int(x // cs), int(y // cs))
+            bucket = cells.get(key)
+            if bucket is None:
+                cells[key] = [(order, e)]
+            else:
+                bucket.append((order, e))
+            if e.size > max_size:
+                max_size = e.size
+        self.max_size = max_size
+
+    def query(self, x, y, reach):
+        """Returns entities whose center may lie within reach of (x, y)."""
+        cs = self.cell_size
+        cells = self.cells
+        found = []
+        for cx in range(int((x - reach) // cs), int((x + reach) // cs) + 1):
+            for cy in range(int((y - reach) // cs), int((y + reach) // cs) + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    found.extend(bucket)
+        if len(found) > 1:
+            found.sort(key=lambda item: item[0])
+        return [e for _, e in found]
+
+# ---------------- Area damage ----------------
+class Blast:
+    """One area-of-effect hit queued for the end of the simulation step."""
+    def __init__(self, x, y, radius, damage, blood=0, points=None, weapon=None, exclude=None,
+                 inclusive=False, death_sound=False):
+        self.x, self.y = x, y
+        self.radius = radius
+        self.damage = damage
+        self.blood = blood  # blood particles per enemy hit
+        self.points = points  # base score per kill; None = kills give no rewards
+        self.weapon = weapon  # credited to the daily mission
+        self.exclude = exclude  # an enemy the blast never hurts (its source)
+        self.inclusive = inclusive  # hit at exactly radius too
+        self.death_sound = death_sound
+
+
+class BlastQueue:
+    """Collects explosions, boss blasts and aura ticks during a step and resolves them in one NumPy pass.
+
+    Damage is applied in queue order: an enemy is credited to the first blast whose cumulative
+    damage kills it, and later blasts in the same step neither hurt it nor spawn blood on it.
+    """
+    def __init__(self):
+        self.blasts = []
+
+    def __len__(self):
+        return len(self.blasts)
+
+    def add(self, x, y, radius, damage, **kwargs):
+        self.blasts.append(Blast(x, y, radius, damage, **kwargs))
+
+    def resolve(self, store, particles):
+        """Applies all queued blasts, kills the enemies that drop to 0 hp and returns [(enemy, blast)] kills."""
+        blasts, self.blasts = self.blasts, []
+        enemies = list(store)
+        if not blasts or not enemies:
+            return []
+        pos = np.array([tuple(e.pos) for e in enemies], np.float32)
+        centers = np.array([(b.x, b.y) for b in blasts], np.float32)
+        r2 = np.array([b.radius for b in blasts], np.float32)[:, None] ** 2
+        dx = pos[:, 0] - centers[:, 0, None]  # blasts x enemies
+        dy = pos[:, 1] - centers[:, 1, None]
+        d2 = dx * dx + dy * dy
+        inclusive = np.array([b.inclusive for b in blasts])[:, None]
+        hit = (d2 < r2) | (inclusive & (d2 == r2))
+        for i, b in enumerate(blasts):
+            if b.exclude is not None:
+                for j, e in enumerate(enemies):
+                    if e is b.exclude:
+                        hit[i, j] = False
+        touched = np.flatnonzero(hit.any(axis=0))  # only enemies inside some blast go further
+        if not len(touched):
+            return []
+        hit = hit[:, touched]
+        hp = np.array([enemies[j].hp for j in touched.tolist()], np.float64)
+        damage = np.array([b.damage for b in blasts], np.float64)[:, None]
+        dead_after = np.cumsum(hit * damage, axis=0) >= hp  # dead once this blast has landed
+        killed = dead_after[-1]
+        killer = np.where(killed, dead_after.argmax(axis=0), len(blasts))
+        hit &= np.arange(len(blasts))[:, None] <= killer
+        total = (hit * damage).sum(axis=0)
+
+        touched = touched.tolist()
+        for k, amount in enumerate(total.tolist()):
+            if amount:
+                enemies[touched[k]].hp -= amount
+        blood = np.array([b.blood for b in blasts])
+        for i, k in zip(*np.nonzero(hit & (blood > 0)[:, None])):
+            e = enemies[touched[k]]
+            spawn_blood(particles, e.pos.x, e.pos.y, intensity=int(blood[i]))
+        dead = sorted(np.flatnonzero(killed).tolist(), key=lambda k: killer[k])
+        kills = [(enemies[touched[k]], blasts[killer[k]]) for k in dead]
+        for e, _ in kills:
+            store.kill(e)
+        return kills
+
+# ---------------- Game events ----------------
+class KillEvent:
+    """An enemy died; points feed the score, weapon the daily mission."""
+    __slots__ = ("enemy", "x", "y", "points", "weapon", "sound")
+
+    def __init__(self, enemy, points, weapon, sound=False):
+        self.enemy = enemy
+        self.x, self.y = enemy.pos
+        self.points = points
+        self.weapon = weapon
+        self.sound = sound  # play the enemy death sound
+
+
+class DamageEvent:
+    """The player was hit for `amount` before shields."""
+    __slots__ = ("amount", "blood")
+
+    def __init__(self, amount, blood=0):
+        self.amount = amount
+        self.blood = blood
+
+
+class PickupEvent:
+    """The player touched a health orb, ammo box or power-up."""
+    __slots__ = ("item",)
+
+    def __init__(self, item):
+        self.item = item
+
+
+class GameEvents:
+    """Typed events collected during a simulation step.
+
+    Collision code only records what happened; game_loop drains the queue once per step and
+    hands each list to the systems that score, drop loot, track missions and play sounds.
+    """
+    def __init__(self):
+        self.kills, self.damage, self.pickups = [], [], []
+
+    def kill(self, enemy, points, weapon, sound=False):
+        self.kills.append(KillEvent(enemy, points, weapon, sound))
+
+    def hurt(self, amount, blood=0):
+        self.damage.append(DamageEvent(amount, blood))
+
+    def pickup(self, item):
+        self.pickups.append(PickupEvent(item))
+
+    def drain(self):
+        """Returns (kills, damage, pickups) recorded since the last drain."""
+        drained = self.kills, self.damage, self.pickups
+        self.kills, self.damage, self.pickups = [], [], []
+        return drained
 
 # ---------------- Spawn enemy helper ----------------
 def spawn_enemy(enemies, level):
@@ -1460,40 +3314,122 @@ def spawn_enemy(enemies, level):
         enemies.append(TeleportingEnemy(x, y))
 
 # ---------------- Weather System ----------------
-def start_rain():
+weather_rng = np.random.default_rng()
+
+class RainLayer:
+    """Falling rain, simulated and drawn in bulk.
+
+    Showers keep one drop per slot in NumPy arrays, moved in a single vectorized step and drawn
+    as one batch of streak blits. Storms above RAIN_TEXTURE_DROPS bake their drops into a few
+    screen-sized colorkeyed layers instead, each scrolled at its own speed with two blits, so
+    the cost no longer depends on the number of drops.
+    """
+    STREAK_LENGTH = 10
+
+    def __init__(self):
+        self.count = 0
+        self.x = np.zeros(0, np.int32)
+        self.y = np.zeros(0, np.float32)
+        self.speed = np.zeros(0, np.float32)
+        self.layers = []  # [surface, speed, offset] per storm layer
+        self._streak = None
+
+    def __len__(self):
+        return self.count
+
+    def start(self, count):
+        self.count = count
+        self.layers = []
+        if count > RAIN_TEXTURE_DROPS:
+            count = 0
+            self._bake_layers(current_width, current_height)
+        self.x = weather_rng.integers(0, current_width + 1, count, dtype=np.int32)
+        self.y = weather_rng.integers(0, current_height + 1, count).astype(np.float32)
+        self.speed = weather_rng.uniform(4, 8, count).astype(np.float32)
+
+    def clear(self):
+        self.start(0)
+
+    def _bake_layers(self, width, height):
+        per_layer = self.count // len(RAIN_LAYER_SPEEDS)
+        self.layers = []
+        for speed in RAIN_LAYER_SPEEDS:
+            layer = pygame.Surface((width, height), 0, 32)
+            layer.fill(SPRITE_COLORKEY)
+            pixels = pygame.surfarray.pixels2d(layer)
+            xs = weather_rng.integers(0, width, per_layer)
+            ys = weather_rng.integers(0, height, per_layer)
+            for d in range(self.STREAK_LENGTH + 1):
+                pixels[xs, (ys + d) % height] = layer.map_rgb(LIGHT_BLUE) # Streaks wrap so the layer tiles vertically
+            del pixels
+            if pygame.display.get_surface() is not None:
+                layer = layer.convert()
+            layer.set_colorkey(SPRITE_COLORKEY, pygame.RLEACCEL)
+            self.layers.append([layer, speed, 0.0])
+
+    def update(self, elapsed_ms):
+        """Moves every drop down and respawns the ones that left the bottom of the screen."""
+        frames = elapsed_ms / 16.6667 # Speeds are in pixels per 60 FPS frame
+        for layer in self.layers:
+            layer[2] = (layer[2] + layer[1] * frames) % layer[0].get_height()
+        if not len(self.x):
+            return
+        self.y += self.speed * frames
+        fallen = np.flatnonzero(self.y > current_height)
+        if len(fallen):
+            self.x[fallen] = weather_rng.integers(0, current_width + 1, len(fallen), dtype=np.int32)
+            self.y[fallen] = weather_rng.integers(-20, 1, len(fallen))
+
+    def draw(self, surf):
+        """Draws the rain and returns the bounding rect of what was drawn."""
+        if self.layers:
+            if self.layers[0][0].get_size() != surf.get_size():
+                self._bake_layers(*surf.get_size())
+            for layer, _, offset in self.layers:
+                surf.blit(layer, (0, int(offset)))
+                surf.blit(layer, (0, int(offset) - layer.get_height()))
+            return surf.get_rect()
+        if not len(self.x):
+            return None
+        if self._streak is None:
+            streak = pygame.Surface((1, self.STREAK_LENGTH + 1))
+            streak.fill(LIGHT_BLUE)
+            self._streak = streak.convert() if pygame.display.get_surface() is not None else streak
+        ys = self.y.astype(np.int32)
+        streak = self._streak
+        surf.blits([(streak, pos) for pos in zip(self.x.tolist(), ys.tolist())], False)
+        left, top = int(self.x.min()), int(ys.min())
+        return pygame.Rect(left, top, int(self.x.max()) - left + 1, int(ys.max()) - top + self.STREAK_LENGTH + 1)
+
+
+rain = RainLayer()
+
+def start_rain(count=None):
     """Initiates the rain weather effect."""
-    global is_raining, rain_duration, rain_start_time, rain_drops
+    global is_raining, rain_duration, rain_start_time
     is_raining = True
     rain_duration = random.randint(10000, 25000) # Rain for 10-25 seconds
-    rain_start_time = pygame.time.get_ticks()
-    rain_drops = []
-    for _ in range(200): # More rain drops
-        x = random.randint(0, current_width)
-        y = random.randint(0, current_height)
-        speed = random.uniform(4, 8)
-        rain_drops.append([x, y, speed])
+    rain_start_time = sim_clock.now
+    if count is None:
+        count = RAIN_STORM_DROPS if random.random() < RAIN_STORM_CHANCE else RAIN_DROPS
+    rain.start(count)
 
 def stop_rain():
     """Stops the rain weather effect."""
-    global is_raining, rain_drops
+    global is_raining
     is_raining = False
-    rain_drops = []
+    rain.clear()
 
-def update_rain():
+def update_rain(dt):
     """Updates the position of rain drops."""
-    global rain_drops
     if is_raining:
-        for drop in rain_drops:
-            drop[1] += drop[2] * (clock.get_time() / 16.6667) # Adjust speed with dt
-            if drop[1] > current_height:
-                drop[0] = random.randint(0, current_width)
-                drop[1] = random.randint(-20, 0)
+        rain.update(dt * 1000)
 
 def draw_rain(surf):
-    """Draws rain drops on the surface."""
+    """Draws rain drops on the surface and returns the area they cover."""
     if is_raining:
-        for drop in rain_drops:
-            pygame.draw.line(surf, LIGHT_BLUE, (int(drop[0]), int(drop[1])), (int(drop[0]), int(drop[1] + 10)), 1)
+        return rain.draw(surf)
+    return None
 
 # ---------------- Daily Mission System ----------------
 def reset_daily_mission():
@@ -1508,27 +3444,25 @@ def reset_daily_mission():
     daily_mission["progress"] = 0
     daily_mission["completed"] = False
 
-def update_daily_mission(player_instance, enemy_killed_weapon=None):
-    """Updates the progress of the daily mission."""
-    global coins, daily_mission
+def update_daily_mission(player_instance, enemy_killed_weapon=None, kills=1):
+    """Updates the progress of the daily mission for `kills` kills made with one weapon."""
+    global daily_mission
     if daily_mission["completed"]:
         return
 
     if "Bunuh" in daily_mission["desc"]:
         if "dengan" in daily_mission["desc"]: # Specific weapon kill mission
             if enemy_killed_weapon == daily_mission.get("weapon"):
-                daily_mission["progress"] += 1
+                daily_mission["progress"] += kills
         else: # General kill mission
-            daily_mission["progress"] += 1
+            daily_mission["progress"] += kills
     elif "Capai score" in daily_mission["desc"]:
         daily_mission["progress"] = player_instance.score # Update progress with current score
 
     if daily_mission["progress"] >= daily_mission["target"]:
-        coins += daily_mission["reward"]
+        profile.coins += daily_mission["reward"] # Written back by the profile's debounced flush
         daily_mission["completed"] = True
         print(f"Misi Harian Selesai! Kamu mendapatkan {daily_mission['reward']} koin.")
-        # Save coins immediately
-        save_coins(coins)
 
 
 # ---------------- Quiz Data ----------------
@@ -1768,14 +3702,14 @@ quiz_questions = [
 # ---------------- User login screen ----------------
 def login_screen():
     """Handles user login and registration."""
-    global current_user, current_admin, coins, unlocked, upgrades
+    global current_user, current_admin, profile
     username = ""
     password = ""
     step = "username"  # "username" or "password"
     mode = "login"  # or "register"
     message = ""
     while True:
-        screen.fill(BG)
+        renderer.begin(screen)
         draw_text(screen, "Login / Register", 48, current_width // 2, 100, color=WHITE, center=True)
         if step == "username":
             draw_text(screen, f"Username: {username}", 24, current_width // 2, 200, color=WHITE, center=True)
@@ -1784,7 +3718,7 @@ def login_screen():
             draw_text(screen, f"Password: {'*' * len(password)}", 24, current_width // 2, 250, color=WHITE, center=True)
         draw_text(screen, message, 20, current_width // 2, 300, color=RED, center=True)
 
-        mx, my = pygame.mouse.get_pos()
+        mx, my = get_mouse_pos()
         click = False
         for ev in pygame.event.get():
             if ev.type == pygame.QUIT:
@@ -1808,45 +3742,32 @@ def login_screen():
                             message = "Enter username"
                     else: # step == "password"
                         if mode == "login":
-                            # Check if it's an admin first
-                            if username in admins and admins[username]["password"] == password:
+                            role = authenticate(username, password)
+                            if role == "admin":
                                 current_admin = username
                                 current_user = None  # Clear current user when admin logs in
                                 return "admin" # Return admin state
-                            elif username in users and users[username] == password:
+                            elif role == "user":
                                 current_user = username
                                 current_admin = None  # Clear current admin when user logs in
-                                # Load user data on login
-                                user_data = load_user_data(current_user)
-                                coins = user_data.get("coins", 0)
-                                unlocked = set(user_data.get("unlocked", ["pistol"]))
-                                upgrades = user_data.get("upgrades", {})
+                                # Load user data once on login
+                                profile = UserProfile.load(current_user)
                                 return "user" # Return user state
                             else:
                                 message = "Invalid username or password"
                         elif mode == "register":
                             if username and password:
-                                if username in users or username in admins:
+                                if find_user(username) or find_admin(username):
                                     message = "Username already exists"
+                                elif not add_user_to_db(username, password):
+                                    message = "Could not create account"
                                 else:
-                                    users[username] = password # Add to in-memory users
-                                    add_user_to_db(username, password) # Add to database
                                     current_user = username
                                     current_admin = None  # Clear current admin when user logs in
                                     # Initialize user data on registration
-                                    user_data = {
-                                        "coins": 0,
-                                        "unlocked": set(["pistol"]),
-                                        "upgrades": {},
-                                        "score": 0,
-                                        "kills": 0,
-                                        "weapon": "pistol",
-                                        "ammo": default_ammo.copy()
-                                    }
-                                    save_user_data(current_user, user_data) # Save initial user data to DB
-                                    coins = 0
-                                    unlocked = set(["pistol"])
-                                    upgrades = {}
+                                    profile = UserProfile(current_user)
+                                    profile.mark_dirty(*USER_DATA_FIELDS)
+                                    profile.flush() # Save initial user data to DB
                                     return "user" # Return user state
                             else:
                                 message = "Enter username and password"
@@ -1908,48 +3829,35 @@ def login_screen():
                 message = "Enter username"
         elif action == "Submit" and step == "password":
             if mode == "login":
-                # Check if it's an admin first
-                if username in admins and admins[username]["password"] == password:
+                role = authenticate(username, password)
+                if role == "admin":
                     current_admin = username
                     current_user = None  # Clear current user when admin logs in
                     return "admin" # Return admin state
-                elif username in users and users[username] == password:
+                elif role == "user":
                     current_user = username
                     current_admin = None  # Clear current admin when user logs in
-                    user_data = load_user_data(current_user)
-                    coins = user_data.get("coins", 0)
-                    unlocked = set(user_data.get("unlocked", ["pistol"]))
-                    upgrades = user_data.get("upgrades", {})
+                    profile = UserProfile.load(current_user)
                     return "user" # Return user state
                 else:
                     message = "Invalid username or password"
             elif mode == "register":
                 if username and password:
-                    if username in users or username in admins:
+                    if find_user(username) or find_admin(username):
                         message = "Username already exists"
+                    elif not add_user_to_db(username, password):
+                        message = "Could not create account"
                     else:
-                        users[username] = password
-                        add_user_to_db(username, password)
                         current_user = username
                         current_admin = None  # Clear current admin when user logs in
-                        user_data = {
-                            "coins": 0,
-                            "unlocked": set(["pistol"]),
-                            "upgrades": {},
-                            "score": 0,
-                            "kills": 0,
-                            "weapon": "pistol",
-                            "ammo": default_ammo.copy()
-                        }
-                        save_user_data(current_user, user_data)
-                        coins = 0
-                        unlocked = set(["pistol"])
-                        upgrades = {}
+                        profile = UserProfile(current_user)
+                        profile.mark_dirty(*USER_DATA_FIELDS)
+                        profile.flush()
                         return "user" # Return user state
                 else:
                     message = "Enter username and password"
 
-        pygame.display.flip()
+        renderer.present()
         clock.tick(FPS)
 
 # ---------------- Menu & Leaderboard screens ----------------
@@ -1961,30 +3869,23 @@ def draw_buttons(buttons, mx, my, click):
             color = (120, 120, 120)
             if click:
                 return label
-        pygame.draw.rect(screen, color, rect, border_radius=8)
+        renderer.mark(pygame.draw.rect(screen, color, rect, border_radius=8))
         draw_text(screen, label, 24, rect.centerx, rect.centery, color=WHITE, center=True)
     return None
 
     
 def main_menu():
     """Displays the main menu and handles user interactions."""
-    global current_user, current_admin, coins, unlocked, upgrades, daily_mission
-    if not current_user and not current_admin:
-        coins = 0
-        unlocked = set(["pistol"])
-        upgrades = {}
-    elif current_user:
-        # Ensure global coins, unlocked, upgrades are updated from DB on menu entry
-        user_data = load_user_data(current_user)
-        coins = user_data.get("coins", 0)
-        unlocked = set(user_data.get("unlocked", ["pistol"]))
-        upgrades = user_data.get("upgrades", {})
+    global current_user, current_admin, profile, daily_mission
+    if not current_user:
+        profile = UserProfile() # Guests start every session from scratch
     
     # Reset daily mission when entering main menu (for simplicity, new mission each game session)
     reset_daily_mission()
+    maybe_trim_leaderboard()
 
     while True:
-        screen.fill(BG)
+        renderer.begin(screen)
         # Title positioned higher for better balance
         draw_text(screen, "War.io", 48, current_width // 2, current_height // 2 - int(current_height * 0.23), color=WHITE, center=True)
         # Instructions with better spacing
@@ -1999,7 +3900,7 @@ def main_menu():
         for i, entry in enumerate(leaderboard[:5]):
             draw_text(screen, f"{i+1}. {entry['name']}  S:{entry['score']}  K:{entry['kills']}", 16, current_width - int(current_width * 0.18), int(current_height * 0.11) + i*int(current_height * 0.035), color=GRAY)
         # Show coins
-        draw_text(screen, f"Coins: {coins}", 20, int(current_width * 0.008), current_height - int(current_height * 0.07), color=YELLOW)
+        draw_text(screen, f"Coins: {profile.coins}", 20, int(current_width * 0.008), current_height - int(current_height * 0.07), color=YELLOW)
 
         # Show Daily Mission
         if current_user:
@@ -2018,18 +3919,11 @@ def main_menu():
             draw_text(screen, status_text, 14, current_width - 200, current_height - 32, color=GREEN if daily_mission["completed"] else YELLOW)
 
 
-        mx, my = pygame.mouse.get_pos()
+        mx, my = get_mouse_pos()
         click = False
         for ev in pygame.event.get():
             if ev.type == pygame.QUIT:
-                # Save user data on quit if logged in
-                if current_user:
-                    user_data = {
-                        "coins": coins,
-                        "unlocked": unlocked,
-                        "upgrades": upgrades
-                    }
-                    save_user_data(current_user, user_data)
+                profile.flush() # Checkpoint: save user data on quit
                 pygame.quit()
                 return "quit"
             if ev.type == pygame.VIDEORESIZE:
@@ -2038,14 +3932,7 @@ def main_menu():
                 click = True
             if ev.type == pygame.KEYDOWN:
                 if ev.key == pygame.K_ESCAPE:
-                    # Save user data on quit if logged in
-                    if current_user:
-                        user_data = {
-                            "coins": coins,
-                            "unlocked": unlocked,
-                            "upgrades": upgrades
-                        }
-                        save_user_data(current_user, user_data)
+                    profile.flush() # Checkpoint: save user data on quit
                     pygame.display.flip()
                     pygame.quit()
                     return "quit"
@@ -2059,19 +3946,9 @@ def main_menu():
                 buttons.append((pygame.Rect(current_width // 2 - button_w // 2, y, button_w, button_h), label))
             choice = draw_buttons(buttons, mx, my, click)
             if choice == "Logout":
-                # Save user data on logout
-                if current_user:
-                    user_data = {
-                        "coins": coins,
-                        "unlocked": unlocked,
-                        "upgrades": upgrades
-                    }
-                    save_user_data(current_user, user_data)
+                profile.flush() # Checkpoint: save user data on logout
                 current_user = None
-                # Reset global coins, unlocked, upgrades on logout
-                coins = 0
-                unlocked = set(["pistol"])
-                upgrades = {}
+                profile = UserProfile() # Back to a guest profile
                 continue
         elif current_admin: # Admin is logged in
             draw_text(screen, f"Logged in as: {current_admin} (Admin)", 20, current_width // 2, current_height // 2 - int(current_height * 0.15), color=MAGENTA, center=True)
@@ -2092,20 +3969,10 @@ def main_menu():
         else: # No one is logged in
             # Draw login button at top left
             login_btn = pygame.Rect(10, 10, 100, 40)
-            pygame.draw.rect(screen, (80,80,80), login_btn, border_radius=8)
+            renderer.mark(pygame.draw.rect(screen, (80,80,80), login_btn, border_radius=8))
             draw_text(screen, "Login", 24, login_btn.centerx, login_btn.centery, color=WHITE, center=True)
             if click and login_btn.collidepoint(mx, my):
-                login_result = login_screen()
-                if login_result == "user":
-                    # After user login, reload global user data
-                    if current_user:
-                        user_data = load_user_data(current_user)
-                        coins = user_data.get("coins", 0)
-                        unlocked = set(user_data.get("unlocked", ["pistol"]))
-                        upgrades = user_data.get("upgrades", {})
-                elif login_result == "admin":
-                    # Admin logged in, current_admin is set
-                    pass
+                login_screen() # Sets current_user/profile or current_admin on success
                 continue
             button_labels = ["Start Game", "Quiz", "Shop", "Leaderboard", "Quit"]
             buttons = []
@@ -2114,7 +3981,11 @@ def main_menu():
                 buttons.append((pygame.Rect((current_width - button_w) // 2, y, button_w, button_h), label))
             choice = draw_buttons(buttons, mx, my, click)
 
-        pygame.display.flip()
+        profile.maybe_flush()
+        renderer.present()
+        if not startup_reported:
+            report_startup()
+            init_audio() # Music starts once the menu is already on screen
         clock.tick(FPS)
         if choice == "Start Game":
             return "game"
@@ -2125,14 +3996,7 @@ def main_menu():
         if choice == "Shop":
             shop_screen()
         if choice == "Quit":
-            # Save user data on quit if logged in
-            if current_user:
-                user_data = {
-                    "coins": coins,
-                    "unlocked": unlocked,
-                    "upgrades": upgrades
-                }
-                save_user_data(current_user, user_data)
+            profile.flush() # Checkpoint: save user data on quit
             pygame.quit()
             return "quit"
 
@@ -2142,7 +4006,7 @@ def leaderboard_screen():
     global leaderboard # Ensure we use the global leaderboard
     leaderboard = load_leaderboard() # Reload leaderboard to get latest scores
     while True:
-        screen.fill(BG)
+        renderer.begin(screen)
         draw_text(screen, "Leaderboard", 48, current_width // 2, int(current_height * 0.11), color=WHITE, center=True)
         y = int(current_height * 0.23)
         if leaderboard:
@@ -2153,7 +4017,7 @@ def leaderboard_screen():
         else:
             draw_text(screen, "No scores yet. Play to add your name!", 20, current_width // 2, current_height // 2, color=GRAY, center=True)
 
-        mx, my = pygame.mouse.get_pos()
+        mx, my = get_mouse_pos()
         click = False
         for ev in pygame.event.get():
             if ev.type == pygame.QUIT:
@@ -2169,7 +4033,7 @@ def leaderboard_screen():
 
         back_btn = pygame.Rect(current_width // 2 - int(current_width * 0.15), current_height - int(current_height * 0.16), int(current_width * 0.3), int(current_height * 0.07))
         res = draw_buttons([(back_btn, "Back")], mx, my, click)
-        pygame.display.flip()
+        renderer.present()
         clock.tick(FPS)
         if res == "Back":
             return
@@ -2212,79 +4076,229 @@ weapon_image_paths = {
     "disintegration_ray": "assets/images/disintegration_ray.png"
 }
 
-for weapon_name, path in weapon_image_paths.items():
+WEAPON_ICON_SIZE = (40, 40)  # Ukuran tetap untuk konsistensi
+ATLAS_VERSION = 1
+ATLAS_DIR = os.path.join(GAME_DIR, "assets", "cooked")
+WEAPON_ATLAS_PATH = os.path.join(ATLAS_DIR, "weapons.rgba")  # raw RGBA pixels, mmapped at runtime
+WEAPON_ATLAS_INDEX = os.path.join(ATLAS_DIR, "weapons.json")
+
+atlas_stats = {}
+
+def weapon_atlas_key():
+    """Hashes the cook settings and the bytes of every source icon; recorded by the cook, never at runtime."""
+    digest = hashlib.sha1(json.dumps([ATLAS_VERSION, WEAPON_ICON_SIZE]).encode())
+    for weapon_name, path in weapon_image_paths.items():
+        digest.update(weapon_name.encode())
+        try:
+            with open(os.path.join(GAME_DIR, path), "rb") as f:
+                digest.update(hashlib.sha1(f.read()).digest())
+        except OSError:
+            digest.update(b"missing")
+    return digest.hexdigest()
+
+
+def weapon_source_stamps():
+    """[weapon, path, mtime_ns, size] for every source icon; a changed stamp means a stale atlas."""
+    stamps = []
+    for weapon_name, path in weapon_image_paths.items():
+        try:
+            st = os.stat(os.path.join(GAME_DIR, path))
+            stamps.append([weapon_name, path, st.st_mtime_ns, st.st_size])
+        except OSError:
+            stamps.append([weapon_name, path, None, None])
+    return stamps
+
+
+def cook_weapon_atlas():
+    """Decodes and scales every weapon icon, packs them into one RGBA atlas and writes it with its index."""
+    started = time.perf_counter()
+    icon_w, icon_h = WEAPON_ICON_SIZE
+    columns = math.ceil(math.sqrt(len(weapon_image_paths)))
+    rows = math.ceil(len(weapon_image_paths) / columns)
+    pixels = np.zeros((rows * icon_h, columns * icon_w, 4), np.uint8)
+    icons, missing = {}, []
+    for i, (weapon_name, path) in enumerate(weapon_image_paths.items()):
+        try:
+            img = pygame.transform.scale(pygame.image.load(os.path.join(GAME_DIR, path)), WEAPON_ICON_SIZE)
+        except (pygame.error, OSError):
+            missing.append(weapon_name)
+            continue
+        x, y = (i % columns) * icon_w, (i // columns) * icon_h
+        pixels[y:y + icon_h, x:x + icon_w] = np.frombuffer(pygame.image.tobytes(img, "RGBA"), np.uint8).reshape(icon_h, icon_w, 4)
+        icons[weapon_name] = [x, y, icon_w, icon_h]
+    for weapon_name in missing:
+        print(f"Warning: Could not load image for {weapon_name} from {weapon_image_paths[weapon_name]}. Using fallback.")
+    referenced = {os.path.normpath(path) for path in weapon_image_paths.values()}
+    image_dir = os.path.join(GAME_DIR, "assets", "images")
+    if os.path.isdir(image_dir):
+        for name in sorted(os.listdir(image_dir)):
+            if os.path.normpath(os.path.join("assets", "images", name)) not in referenced:
+                print(f"Note: assets/images/{name} is not used by any weapon and was not cooked.")
+    index = {"version": ATLAS_VERSION, "icon_size": list(WEAPON_ICON_SIZE), "key": weapon_atlas_key(),
+             "sources": weapon_source_stamps(),
+             "size": [pixels.shape[1], pixels.shape[0]], "icons": icons, "missing": missing}
+    buffer = pixels.tobytes()
     try:
-        full_path = os.path.join(os.path.dirname(__file__), path)
-        img = pygame.image.load(full_path).convert_alpha()
-        img = pygame.transform.scale(img, (40, 40))  # Ukuran tetap untuk konsistensi
-        weapon_images[weapon_name] = img
-    except pygame.error:
-        print(f"Warning: Could not load image for {weapon_name} from {path}. Using fallback.")
-        weapon_images[weapon_name] = None
+        os.makedirs(ATLAS_DIR, exist_ok=True)
+        with open(WEAPON_ATLAS_PATH, "wb") as f:
+            f.write(buffer)
+        with open(WEAPON_ATLAS_INDEX, "w") as f:  # written last: an index only exists next to a complete atlas
+            json.dump(index, f, indent=1)
+    except OSError as e:
+        print(f"Could not write weapon atlas cache: {e}")
+    atlas_stats["decode_ms"] = (time.perf_counter() - started) * 1000
+    return index, buffer
+
+
+def read_weapon_atlas():
+    """Returns (index, pixel buffer) of the cooked atlas, or None when it is missing or stale.
+
+    Staleness is judged from the sources' stat() stamps, so a warm load never reads the PNGs.
+    """
+    try:
+        with open(WEAPON_ATLAS_INDEX) as f:
+            index = json.load(f)
+        if (index.get("version") != ATLAS_VERSION or index.get("icon_size") != list(WEAPON_ICON_SIZE)
+                or index.get("sources") != weapon_source_stamps()):
+            return None
+        with open(WEAPON_ATLAS_PATH, "rb") as f:
+            return index, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+
+def load_weapon_images():
+    """Loads the shop's weapon icons the first time the shop is opened.
+
+    Icons come from the cooked atlas as subsurfaces of one texture; the atlas is re-cooked when
+    any source image changes.
+    """
+    if weapon_images:
+        return
+    with timed_phase("shop assets"):
+        started = time.perf_counter()  # includes the staleness check
+        cached = read_weapon_atlas()
+        atlas_stats["cache_hit"] = cached is not None
+        index, buffer = cached or cook_weapon_atlas()
+        try:
+            atlas = pygame.image.frombuffer(buffer, tuple(index["size"]), "RGBA")
+            atlas = atlas.convert_alpha()  # copies into display format, so the mapping can be closed
+        except (pygame.error, ValueError) as e:
+            print(f"Warning: Weapon atlas is unusable ({e}). Using fallback.")
+            atlas = None
+        finally:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+        for weapon_name in weapon_image_paths:
+            rect = index["icons"].get(weapon_name)
+            weapon_images[weapon_name] = atlas.subsurface(rect) if atlas and rect else None
+        atlas_stats["decode_ms"] = (time.perf_counter() - started) * 1000
+        atlas_stats["icons"] = sum(1 for img in weapon_images.values() if img)
+        atlas_stats["texture_bytes"] = atlas.get_pitch() * atlas.get_height() if atlas else 0
+        print(f"Weapon atlas: {atlas_stats['icons']} icons, {atlas_stats['texture_bytes'] / 1024:.0f} KiB texture memory, "
+              f"{'loaded' if cached else 'cooked'} in {atlas_stats['decode_ms']:.1f} ms")
+
+class ShopList:
+    """Virtualized shop column.
+
+    Each row is composed once per (item, owned, affordable) and the rows are stacked into one
+    cached strip. A frame only blits the visible slice of the strip, so cost does not grow with
+    the number of items and scrolling never re-renders text or icons.
+    """
+    def __init__(self, items, state, images=None):
+        self.items = list(items)
+        self.state = state  # item -> (owned, price)
+        self.images = images if images is not None else {}
+        self.rows = {}  # (item, owned, affordable) -> row Surface
+        self.strip = None
+        self._strip_key = None
+        self.stats = {"rows_rendered": 0, "strips_built": 0}
+
+    def total_height(self, row_height, gap):
+        return len(self.items) * row_height + max(0, len(self.items) - 1) * gap
+
+    def _row(self, item, owned, affordable, size):
+        key = (item, owned, affordable)
+        row = self.rows.get(key)
+        if row is None or row.get_size() != size:
+            row = self.rows[key] = self._compose(item, owned, affordable, size)
+            self.stats["rows_rendered"] += 1
+        return row
+
+    def _compose(self, item, owned, affordable, size):
+        width, height = size
+        price = self.state(item)[1]
+        color = GREEN if owned else (GRAY if affordable else RED)
+        status = "Owned" if owned else f"Buy ({price} coins)"
+        text = f"{item.replace('_', ' ').title()}: {status}"
+        row = keyed_surface(size)
+        pygame.draw.rect(row, (60, 60, 60), row.get_rect(), border_radius=6)
+        img = self.images.get(item)
+        txt = render_text(text, 20, color)
+        if img:
+            # Gambar di kiri (center 25px dari left), teks di kanan gambar (40px + padding 10px)
+            row.blit(img, img.get_rect(center=(25, height // 2)))
+            row.blit(txt, (60, height // 2 - 10))
+        else:
+            row.blit(txt, txt.get_rect(center=(width // 2, height // 2)))
+        return row
+
+    def draw(self, surf, x, y, width, row_height, gap, bottom, scroll=0):
+        """Draws the rows visible between y and bottom; returns their (rect, item) buttons."""
+        keys = []
+        for item in self.items:
+            owned, price = self.state(item)
+            keys.append((item, owned, profile.coins >= price))
+        strip_key = (tuple(keys), width, row_height, gap)
+        if strip_key != self._strip_key:
+            self.strip = keyed_surface((width, max(1, self.total_height(row_height, gap))))
+            for i, key in enumerate(keys):
+                self.strip.blit(self._row(*key, (width, row_height)), (0, i * (row_height + gap)))
+            self.strip.set_colorkey(SPRITE_COLORKEY, pygame.RLEACCEL)
+            self._strip_key = strip_key
+            self.stats["strips_built"] += 1
+        view = pygame.Rect(0, scroll, width, max(0, bottom - y))
+        renderer.mark(surf.blit(self.strip, (x, y), view))
+        buttons = []
+        first = scroll // (row_height + gap)
+        for i in range(first, len(self.items)):
+            top = y + i * (row_height + gap) - scroll
+            if top >= bottom:
+                break
+            buttons.append((pygame.Rect(x, top, width, row_height).clip(pygame.Rect(x, y, width, bottom - y)), self.items[i]))
+        return buttons
+
+
+SHOP_WEAPONS = [
+    "shotgun", "rocket", "machinegun", "area_damage", "sniper",
+    "flamethrower", "laser", "grenade", "plasma", "sword", "gravity_gun",
+    "railgun", "minigun", "bfg", "freeze_ray", "poison_gun", "lightning_gun",
+    "acid_gun", "teleport_gun", "black_hole_gun", "time_bomb", "chain_lightning",
+    "homing_missile", "energy_sword", "flak_cannon", "pulse_rifle", "gauss_rifle",
+    "cryo_blaster", "napalm_launcher", "sonic_blaster", "disintegration_ray"
+]
 
 def shop_screen():
     """Displays the in-game shop for weapons and upgrades."""
-    global coins, unlocked, upgrades
+    load_weapon_images()
 
     scroll_offset = 0
     item_height = int(current_height * 0.07)
     item_gap = 8  # Jarak antar button/item (spacing vertikal)
+    weapon_list = ShopList(SHOP_WEAPONS, lambda w: (w in profile.unlocked, weapon_prices.get(w, 0)), weapon_images)
+    upgrade_list = ShopList(upgrade_prices.keys(), lambda u: (profile.upgrades.get(u, 0) > 0, upgrade_prices[u]))
 
     def draw_weapon_list_and_buttons():
-        """Draws the list of weapons with image on left and text on right, with spacing."""
+        """Draws the scrollable list of weapons with image on left and text on right, with spacing."""
         draw_text(screen, "Weapons", 32, current_width // 4, int(current_height * 0.18), color=WHITE, center=True)
         y_start = int(current_height * 0.25)
         x_start = current_width // 4 - int(current_width * 0.16)
-        buttons = []
-        all_weapons = [
-            "shotgun", "rocket", "machinegun", "area_damage", "sniper",
-            "flamethrower", "laser", "grenade", "plasma", "sword", "gravity_gun",
-            "railgun", "minigun", "bfg", "freeze_ray", "poison_gun", "lightning_gun",
-            "acid_gun", "teleport_gun", "black_hole_gun", "time_bomb", "chain_lightning",
-            "homing_missile", "energy_sword", "flak_cannon", "pulse_rifle", "gauss_rifle",
-            "cryo_blaster", "napalm_launcher", "sonic_blaster", "disintegration_ray"
-        ]
         visible_height = current_height - y_start - int(current_height * 0.2)
-        # Hitung total height dengan spacing
-        total_height = len(all_weapons) * item_height + max(0, (len(all_weapons) - 1)) * item_gap
-        max_scroll = max(0, total_height - visible_height)
+        max_scroll = max(0, weapon_list.total_height(item_height, item_gap) - visible_height)
         nonlocal scroll_offset
         scroll_offset = max(0, min(scroll_offset, max_scroll))
-
-        y = y_start - scroll_offset
-        for i, w in enumerate(all_weapons):
-            if y + item_height > y_start and y < current_height:
-                price = weapon_prices.get(w, 0)
-                owned = w in unlocked
-                color = GREEN if owned else (GRAY if coins >= price else RED)
-                status = "Owned" if owned else f"Buy ({price} coins)"
-                weapon_name = w.replace('_', ' ').title()
-                text = f"{weapon_name}: {status}"
-                
-                rect = pygame.Rect(x_start, y, int(current_width * 0.32), item_height)
-                pygame.draw.rect(screen, (60, 60, 60), rect, border_radius=6)
-                
-                # Gambar di kiri (center vertically)
-                img_x = rect.left + 25  # Center gambar di 25px dari left rect
-                if weapon_images.get(w):
-                    img = weapon_images[w]
-                    img_rect = img.get_rect(center=(img_x, rect.centery))
-                    screen.blit(img, img_rect)
-                    
-                    # Teks di kanan gambar (top-left alignment, dengan padding 10px setelah gambar)
-                    text_x = rect.left + 50 + 10  # Setelah gambar (40px + padding 10px)
-                    text_y = rect.centery - 10  # Adjust y agar centered vertically
-                    # Render teks manual untuk presisi
-                    f = pygame.font.SysFont(base_font_name, 20)
-                    txt_surf = f.render(text, True, color)
-                    screen.blit(txt_surf, (text_x, text_y))
-                else:
-                    # Jika no image, center teks di rect
-                    draw_text(screen, text, 20, rect.centerx, rect.centery, color=color, center=True)
-                
-                buttons.append((rect, w))
-            # Increment y dengan spacing
-            y += item_height + item_gap
+        buttons = weapon_list.draw(screen, x_start, y_start, int(current_width * 0.32), item_height, item_gap,
+                                   current_height, scroll_offset)
         return buttons, max_scroll
 
     def draw_upgrade_list_and_buttons():
@@ -2292,30 +4306,17 @@ def shop_screen():
         draw_text(screen, "Upgrades", 32, 3 * current_width // 4, int(current_height * 0.18), color=WHITE, center=True)
         y = int(current_height * 0.25)
         x_start = 3 * current_width // 4 - int(current_width * 0.16)
-        buttons = []
-        for i, u in enumerate(upgrade_prices.keys()):
-            price = upgrade_prices[u]
-            owned = upgrades.get(u, 0) > 0
-            color = GREEN if owned else (GRAY if coins >= price else RED)
-            status = "Owned" if owned else f"Buy ({price} coins)"
-            text = f"{u.replace('_', ' ').title()}: {status}"
-            rect = pygame.Rect(x_start, y, int(current_width * 0.32), item_height)
-            pygame.draw.rect(screen, (60, 60, 60), rect, border_radius=6)
-            draw_text(screen, text, 20, rect.centerx, rect.centery, color=color, center=True)
-            buttons.append((rect, u))
-            # Increment y dengan spacing
-            y += item_height + item_gap
-        return buttons
+        return upgrade_list.draw(screen, x_start, y, int(current_width * 0.32), item_height, item_gap, current_height)
 
     while True:
-        screen.fill(BG)
+        renderer.begin(screen)
         draw_text(screen, "Shop", 48, current_width // 2, int(current_height * 0.11), color=WHITE, center=True)
-        draw_text(screen, f"Coins: {coins}", 24, current_width // 2, int(current_height * 0.15), color=YELLOW, center=True)
+        draw_text(screen, f"Coins: {profile.coins}", 24, current_width // 2, int(current_height * 0.15), color=YELLOW, center=True)
 
         weapon_buttons, max_scroll = draw_weapon_list_and_buttons()
         upgrade_buttons = draw_upgrade_list_and_buttons()
 
-        mx, my = pygame.mouse.get_pos()
+        mx, my = get_mouse_pos()
         click = False
         for ev in pygame.event.get():
             if ev.type == pygame.QUIT:
@@ -2325,6 +4326,7 @@ def shop_screen():
                 handle_window_resize(ev)
             if ev.type == pygame.KEYDOWN:
                 if ev.key == pygame.K_ESCAPE:
+                    profile.flush() # Checkpoint: shop exit
                     return
             if ev.type == pygame.MOUSEBUTTONDOWN and ev.button == 1:
                 click = True
@@ -2347,26 +4349,24 @@ def shop_screen():
         if action:
             item_type, item_name = action
             if item_type == "weapon":
-                if item_name not in unlocked:
+                if item_name not in profile.unlocked:
                     price = weapon_prices.get(item_name, 0)
-                    if coins >= price:
-                        coins -= price
-                        unlocked.add(item_name)
-                        save_coins(coins)
-                        save_unlocked(unlocked)
+                    if profile.coins >= price:
+                        profile.coins -= price
+                        profile.unlocked.add(item_name)
+                        profile.mark_dirty("unlocked")
                         print(f"Unlocked {item_name.replace('_', ' ').title()} for {price} coins.")
                     else:
                         print("Not enough coins!")
                 else:
                     print(f"{item_name.replace('_', ' ').title()} already unlocked.")
             elif item_type == "upgrade":
-                if upgrades.get(item_name, 0) == 0:
+                if profile.upgrades.get(item_name, 0) == 0:
                     price = upgrade_prices.get(item_name, 0)
-                    if coins >= price:
-                        coins -= price
-                        upgrades[item_name] = 1
-                        save_coins(coins)
-                        save_upgrades(upgrades)
+                    if profile.coins >= price:
+                        profile.coins -= price
+                        profile.upgrades[item_name] = 1
+                        profile.mark_dirty("upgrades")
                         print(f"Bought {item_name.replace('_', ' ').title()} upgrade for {price} coins.")
                     else:
                         print("Not enough coins!")
@@ -2375,20 +4375,21 @@ def shop_screen():
 
         back_btn = pygame.Rect(current_width // 2 - int(current_width * 0.15), current_height - int(current_height * 0.16), int(current_width * 0.3), int(current_height * 0.07))
         res = draw_buttons([(back_btn, "Back")], mx, my, click)
-        pygame.display.flip()
+        renderer.present()
         clock.tick(FPS)
         if res == "Back":
+            profile.flush() # Checkpoint: shop exit
             return
 
 
 # ---------------- Quiz Screen ----------------
 def run_quiz():
     """Runs an in-game quiz for the player."""
-    global coins # Ensure global coins is updated
     if not current_user:
-        screen.fill(BG)
+        renderer.invalidate()
+        renderer.begin(screen)
         draw_text(screen, "Please log in to take the quiz.", 28, current_width // 2, current_height // 2, color=RED, center=True)
-        pygame.display.flip()
+        renderer.present()
         pygame.time.wait(1500)
         return
 
@@ -2406,7 +4407,7 @@ def run_quiz():
     correct = False
 
     while True:
-        screen.fill(BG)
+        renderer.begin(screen)
         q = questions[idx]
         draw_text(screen, f"Quiz ({idx+1}/10)", 28, current_width // 2, int(current_height * 0.11), color=WHITE, center=True)
         draw_text(screen, q['question'], 22, current_width // 2, int(current_height * 0.16), color=WHITE, center=True)
@@ -2417,13 +4418,13 @@ def run_quiz():
         for i, opt in enumerate(q['options']):
             r = pygame.Rect(current_width // 2 - int(current_width * 0.25), oy + i*int(current_height * 0.08), int(current_width * 0.5), int(current_height * 0.06))
             option_rects.append((r, opt))
-            pygame.draw.rect(screen, (60,60,60), r, border_radius=6)
+            renderer.mark(pygame.draw.rect(screen, (60,60,60), r, border_radius=6))
             draw_text(screen, opt, 20, r.centerx, r.centery, color=WHITE, center=True)
 
         draw_text(screen, "Click an option then press ENTER to confirm.", 16, current_width // 2, current_height - int(current_height * 0.07), color=GRAY, center=True)
         draw_text(screen, "ESC to quit quiz.", 16, current_width // 2, current_height - int(current_height * 0.04), color=GRAY, center=True)
 
-        mx, my = pygame.mouse.get_pos()
+        mx, my = get_mouse_pos()
         click = False
         for ev in pygame.event.get():
             if ev.type == pygame.QUIT:
@@ -2459,7 +4460,7 @@ def run_quiz():
         if selected is not None and not in_feedback:
             for r, opt in option_rects:
                 if opt[0].upper() == selected.upper():
-                    pygame.draw.rect(screen, (100,100,140), r, border_radius=6)
+                    renderer.mark(pygame.draw.rect(screen, (100,100,140), r, border_radius=6))
                     draw_text(screen, opt, 20, r.centerx, r.centery, color=WHITE, center=True)
 
         # feedback animation
@@ -2468,12 +4469,12 @@ def run_quiz():
             if correct_rect:
                 highlight_surf = pygame.Surface((correct_rect.width, correct_rect.height), pygame.SRCALPHA)
                 highlight_surf.fill((*GREEN, 128))
-                screen.blit(highlight_surf, correct_rect.topleft)
+                renderer.mark(screen.blit(highlight_surf, correct_rect.topleft))
             # if incorrect, highlight selected with red
             if not correct and selected_rect:
                 highlight_surf = pygame.Surface((selected_rect.width, selected_rect.height), pygame.SRCALPHA)
                 highlight_surf.fill((*RED, 128))
-                screen.blit(highlight_surf, selected_rect.topleft)
+                renderer.mark(screen.blit(highlight_surf, selected_rect.topleft))
             feedback_timer -= clock.get_time()
             if feedback_timer <= 0:
                 in_feedback = False
@@ -2484,22 +4485,23 @@ def run_quiz():
                 if idx >= len(questions):
                     # show result briefly and return
                     earned_coins = score * 10
-                    coins += earned_coins
-                    save_coins(coins) # Save updated coins to DB
+                    profile.coins += earned_coins
+                    profile.flush() # Save updated coins to DB
                     end_message = f"Quiz selesai! Score: {score}/{len(questions)} Coins: +{earned_coins}"
-                    screen.fill(BG)
+                    renderer.invalidate()
+                    renderer.begin(screen)
                     draw_text(screen, end_message, 28, current_width // 2, current_height // 2, color=WHITE, center=True)
-                    pygame.display.flip()
+                    renderer.present()
                     pygame.time.wait(1500)
                     return
 
-        pygame.display.flip()
+        renderer.present()
         clock.tick(FPS)
 
 # ---------------- Admin Panel Screen ----------------
 def admin_panel_screen():
     """Displays the admin panel and handles admin actions."""
-    global current_admin, users # Need access to users for management
+    global current_admin
     message = ""
     input_box_active = False
     input_box_text = ""
@@ -2507,12 +4509,12 @@ def admin_panel_screen():
     action_mode = None # "delete_user", "add_admin"
 
     while True:
-        screen.fill(BG)
+        renderer.begin(screen)
         draw_text(screen, "Admin Panel", 48, current_width // 2, 100, color=WHITE, center=True)
         draw_text(screen, f"Welcome, {current_admin}!", 28, current_width // 2, 150, color=MAGENTA, center=True)
         draw_text(screen, message, 20, current_width // 2, 200, color=RED, center=True)
 
-        mx, my = pygame.mouse.get_pos()
+        mx, my = get_mouse_pos()
         click = False
         for ev in pygame.event.get():
             if ev.type == pygame.QUIT:
@@ -2522,7 +4524,7 @@ def admin_panel_screen():
                 handle_window_resize(ev)
             if ev.type == pygame.MOUSEBUTTONDOWN and ev.button == 1:
                 click = True
-                if input_box_rect.collidepoint(ev.pos):
+                if input_box_rect.collidepoint(to_game_pos(ev.pos)):
                     input_box_active = True
                 else:
                     input_box_active = False
@@ -2538,18 +4540,15 @@ def admin_panel_screen():
                 if input_box_active:
                     if ev.key == pygame.K_RETURN:
                         if action_mode == "delete_user":
-                            if input_box_text in users:
+                            if find_user(input_box_text):
                                 delete_user_from_db(input_box_text)
-                                users.pop(input_box_text) # Update in-memory users
                                 message = f"User '{input_box_text}' deleted."
                             else:
                                 message = f"User '{input_box_text}' not found."
                         elif action_mode == "add_admin":
                             # For simplicity, adding admin with default password "adminpass" and empty permissions
                             # In a real app, you'd prompt for password and permissions
-                            if input_box_text and input_box_text not in admins:
-                                add_admin_to_db(input_box_text, "adminpass", {})
-                                admins[input_box_text] = {"password": "adminpass", "permissions": {}} # Update in-memory admins
+                            if input_box_text and not find_admin(input_box_text) and add_admin_to_db(input_box_text, "adminpass", {}):
                                 message = f"Admin '{input_box_text}' added with default password 'adminpass'."
                             else:
                                 message = f"Admin '{input_box_text}' already exists or invalid name."
@@ -2590,44 +4589,36 @@ def admin_panel_screen():
             return "menu"
 
         if input_box_active:
-            pygame.draw.rect(screen, WHITE, input_box_rect, 2)
+            renderer.mark(pygame.draw.rect(screen, WHITE, input_box_rect, 2))
             draw_text(screen, input_box_text, 24, input_box_rect.x + 5, input_box_rect.y + 5, color=WHITE)
 
-        pygame.display.flip()
+        renderer.present()
         clock.tick(FPS)
 
 # ---------------- Main Game Loop ----------------
 def game_loop():
     """Main game loop where the action happens."""
-    global coins, unlocked, upgrades, is_raining, rain_duration, rain_start_time, rain_drops, daily_mission
-    
-    # Load user data if logged in, otherwise use defaults
-    if current_user:
-        user_data = load_user_data(current_user)
-        initial_score = user_data.get("score", 0)
-        initial_kills = user_data.get("kills", 0)
-        initial_weapon = user_data.get("weapon", "pistol")
-        initial_ammo = user_data.get("ammo", default_ammo.copy())
-        unlocked = set(user_data.get("unlocked", ["pistol"]))
-        upgrades = user_data.get("upgrades", {})
-        coins = user_data.get("coins", 0)
-    else:
-        initial_score = 0
-        initial_kills = 0
-        initial_weapon = "pistol"
-        initial_ammo = default_ammo.copy()
-        unlocked = set(["pistol"])
-        upgrades = {}
-        coins = 0
-
-    player = Player(current_width // 2, current_height // 2, initial_upgrades=upgrades)
-    player.score = initial_score
-    player.kills = initial_kills
-    player.weapon = initial_weapon
-    player.ammo = initial_ammo
-    player.apply_upgrades(upgrades) # Apply upgrades to player instance
-
-    bullets, enemies, particles, orbs, ammoboxes, powerups, mines = [], [], [], [], [], [], []
+    global profile, is_raining, rain_duration, rain_start_time, daily_mission
+
+    # Logged-in players continue from their session profile, guests start from defaults
+    if not current_user:
+        profile = UserProfile()
+    unlocked = profile.unlocked
+
+    player = Player(current_width // 2, current_height // 2, initial_upgrades=profile.upgrades)
+    player.score = profile.score
+    player.kills = profile.kills
+    player.weapon = profile.weapon
+    player.ammo = dict(profile.ammo)
+    player.apply_upgrades(profile.upgrades) # Apply upgrades to player instance
+
+    sim_clock.reset()
+    enemy_pool.clear()
+    bullets, enemies, orbs, ammoboxes, powerups, mines = (EntityStore() for _ in range(6))
+    particles = ParticleSystem()
+    enemy_grid = SpatialHash()
+    blasts = BlastQueue()
+    events = GameEvents()
     game_over = False
     win = False
     entering_name = False
@@ -2635,20 +4626,81 @@ def game_loop():
     can_submit = False
     coins_added = False
 
+    timers = SimTimers() # Gameplay timers run on simulation time
     SPAWN_EVENT = pygame.USEREVENT + 1
-    pygame.time.set_timer(SPAWN_EVENT, ENEMY_SPAWN_INTERVAL)
+    timers.set_timer(SPAWN_EVENT, ENEMY_SPAWN_INTERVAL)
 
     MINE_SPAWN_EVENT = pygame.USEREVENT + 2
-    pygame.time.set_timer(MINE_SPAWN_EVENT, 5000)  # Spawn mine every 5 seconds
+    timers.set_timer(MINE_SPAWN_EVENT, 5000)  # Spawn mine every 5 seconds
 
     COMBO_RESET_EVENT = pygame.USEREVENT + 3
-    pygame.time.set_timer(COMBO_RESET_EVENT, 3000)  # Reset combo every 3 seconds if no kill
+    timers.set_timer(COMBO_RESET_EVENT, 3000)  # Reset combo every 3 seconds if no kill
 
     WEATHER_EVENT = pygame.USEREVENT + 4 # New event for weather changes
-    pygame.time.set_timer(WEATHER_EVENT, random.randint(15000, 30000)) # Weather changes every 15-30 seconds
+    timers.set_timer(WEATHER_EVENT, random.randint(15000, 30000)) # Weather changes every 15-30 seconds
 
     mouse_pos = (0, 0)
     running = True
+    hud = HUD()
+
+    # Systems that consume the step's GameEvents, in drain order
+    def score_kills(kills):
+        """Score with combo bonus, kill count and combo, kill by kill."""
+        for ev in kills:
+            player.score += int(ev.points * player.combo_multiplier) # Apply combo bonus
+            player.kills += 1
+            player.update_combo() # Update combo on kill
+
+    def drop_loot(kills):
+        for ev in kills:
+            boss = isinstance(ev.enemy, Boss)
+            if random.random() < 0.25 or boss: orbs.add(HealthOrb(ev.x, ev.y))
+            if random.random() < 0.25 or boss: ammoboxes.add(AmmoBox(ev.x, ev.y))
+            if random.random() < 0.12:
+                ptype = random.choice(["dash", "damage"])
+                powerups.add(Powerup(ev.x, ev.y, ptype))
+
+    def progress_missions(kills):
+        """One daily mission update per weapon used this step; a completed mission only touches the profile."""
+        for weapon, count in collections.Counter(ev.weapon for ev in kills).items():
+            update_daily_mission(player, enemy_killed_weapon=weapon, kills=count)
+
+    def apply_damage(hits):
+        """Shield skill makes the player immune, else shield absorbs what it can; returns True if the player died."""
+        for ev in hits:
+            if player.shield_skill_active: # Full immunity while the skill runs
+                continue
+            damage = ev.amount
+            if player.shield_hp > 0:
+                absorbed = min(player.shield_hp, damage)
+                player.shield_hp -= absorbed
+                damage -= absorbed
+            player.hp -= damage
+            if ev.blood:
+                spawn_blood(particles, player.pos.x, player.pos.y, intensity=ev.blood)
+        return bool(hits) and player.hp <= 0
+
+    def collect_pickups(pickups):
+        for ev in pickups:
+            item = ev.item
+            if isinstance(item, HealthOrb):
+                player.hp = min(player.max_hp, player.hp + item.heal_amount)
+            elif isinstance(item, AmmoBox):
+                for k, v in item.fill.items():
+                    if k in player.ammo:
+                        player.ammo[k] += v
+            elif item.ptype == "dash":
+                player.last_dash = -99999
+                particles.burst(player.pos.x, player.pos.y, 10, speed=(1, 4), radius=(3, 3), life=(0.5, 0.5), colors=[(CYAN, 1)])
+            elif item.ptype == "damage":
+                player.apply_damage_boost(mult=1.6, duration=8000)
+                particles.burst(player.pos.x, player.pos.y, 10, speed=(1, 4), radius=(3, 3), life=(0.5, 0.5), colors=[(ORANGE, 1)])
+
+    def play_event_sounds(kills, hits, pickups):
+        """Each sound plays at most once per step, however many events asked for it."""
+        if enemy_death_sound and any(ev.sound for ev in kills): enemy_death_sound.play()
+        if player_hurt_sound and hits: player_hurt_sound.play()
+        if powerup_sound and any(not isinstance(ev.item, Powerup) for ev in pickups): powerup_sound.play()
 
     weapon_list = ["pistol", "shotgun", "rocket", "machinegun", "area_damage", "sniper", "flamethrower", "laser", "grenade", "plasma", "sword", "gravity_gun", "railgun", "minigun", "bfg", "freeze_ray", "poison_gun", "lightning_gun", "acid_gun", "teleport_gun", "black_hole_gun", "time_bomb", "chain_lightning", "homing_missile", "energy_sword", "flak_cannon", "pulse_rifle", "gauss_rifle", "cryo_blaster", "napalm_launcher", "sonic_blaster", "disintegration_ray"]
     mouse_held = False
@@ -2657,8 +4709,10 @@ def game_loop():
     stop_rain()
     reset_daily_mission()
 
+    accumulator = 0.0 # Frame time not yet simulated, in seconds
     while running:
-        dt = clock.tick(FPS) / 1000.0 # dt in seconds for consistent physics
+        # Rendering runs as fast as RENDER_FPS allows; the simulation advances in fixed SIM_DT steps
+        accumulator += min(clock.tick(RENDER_FPS) / 1000.0, MAX_FRAME_TIME)
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 return "quit"
@@ -2680,7 +4734,7 @@ def game_loop():
             
             elif event.type == COMBO_RESET_EVENT and not game_over:
                 # Reset combo if no kill within the timer
-                now = pygame.time.get_ticks()
+                now = sim_clock.now
                 if now - player.last_kill_time >= player.combo_timer:
                     player.combo = 0
                     player.combo_multiplier = 1.0
@@ -2688,13 +4742,13 @@ def game_loop():
             elif event.type == WEATHER_EVENT and not game_over: # Handle weather changes
                 if is_raining:
                     stop_rain()
-                    pygame.time.set_timer(WEATHER_EVENT, random.randint(15000, 30000)) # Next weather event after clear
+                    timers.set_timer(WEATHER_EVENT, random.randint(15000, 30000)) # Next weather event after clear
                 else:
                     start_rain()
-                    pygame.time.set_timer(WEATHER_EVENT, rain_duration) # Next weather event after rain duration
+                    timers.set_timer(WEATHER_EVENT, rain_duration) # Next weather event after rain duration
 
             elif event.type == pygame.MOUSEMOTION:
-                mouse_pos = event.pos
+                mouse_pos = to_game_pos(event.pos)
             elif event.type == pygame.MOUSEBUTTONDOWN and not game_over:
                 if event.button == 1:
                     mouse_held = True
@@ -2733,11 +4787,7 @@ def game_loop():
                     if event.key in (pygame.K_LSHIFT, pygame.K_RSHIFT):
                         started = player.start_dash()
                         if started:
-                            for _ in range(6):
-                                ang = random.uniform(0, math.tau)
-                                speed = random.uniform(1, 4)
-                                particles.append(Particle(player.pos.xy, Vector2(math.cos(ang)*speed, math.sin(ang)*speed),
-                                                          radius=random.uniform(2,4), life=0.3, color=CYAN))
+                            particles.burst(player.pos.x, player.pos.y, 6, speed=(1, 4), radius=(2, 4), life=(0.3, 0.3), colors=[(CYAN, 1)])
                     if event.key == pygame.K_q:
                         player.activate_shield_skill()
                     # weapon switching
@@ -2772,329 +4822,193 @@ def game_loop():
                                     name_buf += event.unicode
 
         keys = pygame.key.get_pressed()
-        if not game_over:
-            player.update(dt, keys, particles)
-
-            if mouse_held:
-                player.shoot(mouse_pos, bullets, particles)
-            if keys[pygame.K_SPACE]:
-                player.shoot(mouse_pos, bullets, particles)
+        while accumulator >= SIM_DT:
+            accumulator -= SIM_DT
+            dt = SIM_DT
+            sim_clock.advance(dt)
+            timers.update()
+            store_positions(bullets, (player,))
+            enemy_pool.store_positions()
+            if not game_over:
+                player.update(dt, keys, particles)
+
+                if mouse_held:
+                    player.shoot(mouse_pos, bullets, particles)
+                if keys[pygame.K_SPACE]:
+                    player.shoot(mouse_pos, bullets, particles)
 
-            for b in bullets:
-                b.update(dt)
+                for b in bullets:
+                    b.update(dt)
 
-            for e in enemies:
-                if isinstance(e, Boss):
-                    e.update(dt, player.pos, bullets, player, particles, enemies) # Pass player and particles for boss phase 2
-                else:
-                    e.update(dt, player.pos)
+                enemy_pool.update(dt, player.pos, enemies)
+                for e in enemies:
+                    if isinstance(e, Boss):
+                        e.update(dt, player.pos, bullets, player, particles, blasts, events) # Pass player and particles for boss phase 2
             
-            # Gravity Gun effect: pull enemies towards gravity bullets
-            for b in list(bullets):
-                if b.btype == "gravity" and b.alive:
-                    for e in list(enemies):
-                        dist = (e.pos - b.pos).length()
-                        if dist < 150: # Radius of gravity pull
-                            direction = (b.pos - e.pos).normalize()
-                            e.pos += direction * 2 * dt # Pull enemies towards the bullet
-
-            # grenade explosions
-            grenades_to_explode = [b for b in bullets if b.btype == "grenade" and b.exploded]
-            for g in grenades_to_explode:
-                spawn_explosion(particles, g.pos.x, g.pos.y)
-                for ee in list(enemies):
-                    if (g.pos - ee.pos).length() < EXPLOSION_RADIUS:
-                        ee.hp -= 60
-                        spawn_blood(particles, ee.pos.x, ee.pos.y, intensity=8)
-                        if ee.hp <= 0:
-                            player.score += int(10 * player.combo_multiplier) # Apply combo bonus
-                            player.kills += 1
-                            player.update_combo() # Update combo on kill
-                            update_daily_mission(player, enemy_killed_weapon=player.weapon) # Update daily mission
-                            if random.random() < 0.25 or isinstance(ee, Boss):
-                                orbs.append(HealthOrb(ee.pos.x, ee.pos.y))
-                            if random.random() < 0.25 or isinstance(ee, Boss):
-                                ammoboxes.append(AmmoBox(ee.pos.x, ee.pos.y))
-
-                            if random.random() < 0.12:
-                                ptype = random.choice(["dash", "damage"])
-                                powerups.append(Powerup(ee.pos.x, ee.pos.y, ptype))
-                            try: enemies.remove(ee)
-                            except ValueError: pass
-                try: bullets.remove(g)
-                except ValueError: pass
-
-            # bullets -> enemies collisions
-            for b in list(bullets):
-                if not b.alive:
-                    continue
-                if b.owner == "player":
-                    for e in list(enemies):
-                        if (b.pos - e.pos).length() < (b.radius + e.size):
-                            if b.btype == "rocket":
-                                spawn_explosion(particles, b.pos.x, b.pos.y)
-                                for ee in list(enemies):
-                                    if (b.pos - ee.pos).length() < EXPLOSION_RADIUS:
-                                        ee.hp -= EXPLOSION_DAMAGE
-                                        spawn_blood(particles, ee.pos.x, ee.pos.y, intensity=PARTICLE_COUNT//2)
-                                        if ee.hp <= 0:
-                                            player.score += int(15 * player.combo_multiplier) # Apply combo bonus
-                                            player.kills += 1
-                                            player.update_combo() # Update combo on kill
-                                            update_daily_mission(player, enemy_killed_weapon=player.weapon) # Update daily mission
-                                            if random.random() < 0.25 or isinstance(ee, Boss): orbs.append(HealthOrb(ee.pos.x, ee.pos.y))
-                                            if random.random() < 0.25 or isinstance(ee, Boss): ammoboxes.append(AmmoBox(ee.pos.x, ee.pos.y))
-                                            if random.random() < 0.12:
-                                                ptype = random.choice(["dash", "damage"])
-                                                powerups.append(Powerup(ee.pos.x, ee.pos.y, ptype))
-                                            try: enemies.remove(ee)
-                                            except ValueError: pass
-                                b.alive = False
-                                break
-                            elif b.btype == "plasma":
-                                spawn_explosion(particles, b.pos.x, b.pos.y, count=PARTICLE_COUNT*4)
-                                for ee in list(enemies):
-                                    if (b.pos - ee.pos).length() < EXPLOSION_RADIUS * 0.7:
-                                        ee.hp -= b.damage
-                                        spawn_blood(particles, ee.pos.x, ee.pos.y, intensity=6)
-                                        if ee.hp <= 0:
-                                            player.score += int(15 * player.combo_multiplier) # Apply combo bonus
-                                            player.kills += 1
-                                            player.update_combo() # Update combo on kill
-                                            update_daily_mission(player, enemy_killed_weapon=player.weapon) # Update daily mission
-                                            if random.random() < 0.25 or isinstance(ee, Boss): orbs.append(HealthOrb(ee.pos.x, ee.pos.y))
-                                            if random.random() < 0.25 or isinstance(ee, Boss): ammoboxes.append(AmmoBox(ee.pos.x, ee.pos.y))
-                                            if random.random() < 0.12:
-                                                ptype = random.choice(["dash", "damage"])
-                                                powerups.append(Powerup(ee.pos.x, ee.pos.y, ptype))
-                                            try: enemies.remove(ee)
-                                            except ValueError: pass
-                                b.alive = False
-                                break
-                            elif b.btype == "laser":
-                                e.hp -= b.damage
-                                spawn_blood(particles, b.pos.x, b.pos.y, intensity=4)
-                                spawn_sparks(particles, b.pos.x, b.pos.y, count=4)
-                                if e.hp <= 0:
-                                    player.score += int(10 * player.combo_multiplier) # Apply combo bonus
-                                    player.kills += 1
-                                    player.update_combo() # Update combo on kill
-                                    update_daily_mission(player, enemy_killed_weapon=player.weapon) # Update daily mission
-                                    if random.random() < 0.25 or isinstance(e, Boss): orbs.append(HealthOrb(e.pos.x, e.pos.y))
-                                    if random.random() < 0.25 or isinstance(e, Boss): ammoboxes.append(AmmoBox(e.pos.x, e.pos.y))
-                                    if random.random() < 0.12:
-                                        ptype = random.choice(["dash", "damage"])
-                                        powerups.append(Powerup(e.pos.x, e.pos.y, ptype))
-                                    try: enemies.remove(e)
-                                    except ValueError: pass
-                                # laser continues
-                            elif b.btype == "gravity": # Gravity gun does no direct damage
-                                # Handled by pulling enemies
-                                pass
-                            else:
-                                dmg = b.damage
-                                e.hp -= dmg
-                                spawn_blood(particles, b.pos.x, b.pos.y, intensity=6)
-                                spawn_sparks(particles, b.pos.x, b.pos.y, count=4)
-                                if b.btype not in ("laser",):
-                                    b.alive = False
-                                if e.hp <= 0:
-                                    player.score += int(10 * player.combo_multiplier) # Apply combo bonus
-                                    player.kills += 1
-                                    player.update_combo() # Update combo on kill
-                                    update_daily_mission(player, enemy_killed_weapon=player.weapon) # Update daily mission
-                                    if random.random() < 0.25 or isinstance(e, Boss): orbs.append(HealthOrb(e.pos.x, e.pos.y))
-                                    if random.random() < 0.25 or isinstance(e, Boss): ammoboxes.append(AmmoBox(e.pos.x, e.pos.y))
-                                    if random.random() < 0.12:
-                                        ptype = random.choice(["dash", "damage"])
-                                        powerups.append(Powerup(e.pos.x, e.pos.y, ptype))
-                                    try: enemies.remove(e)
-                                    except ValueError: pass
-                                break
-
-            bullets = [b for b in bullets if b.alive]
-
-            # enemy contact with player
-            damage = 0  # default, tidak kena hit
-
-            for e in list(enemies):
-                if (e.pos - player.pos).length() < (e.size + player.size - 6):
-                    push = (player.pos - e.pos)
-                    if push.length_squared() == 0:
-                        push = Vector2(random.uniform(-1, 1), random.uniform(-1, 1))
-                    push = push.normalize() * 8
-                    player.pos += push
-                    damage = 12
-                    e.pos -= push * 0.3   # <- pindahkan ini ke dalam blok tabrakan
-
-            if damage > 0:
-                if player_hurt_sound: player_hurt_sound.play()
-                if player.shield_skill_active: # Shield skill makes player immune
-                    # No damage taken, but shield HP might still be affected if it was a temporary shield
-                    # For shield skill, we assume full immunity
-                    pass
-                elif player.shield_hp > 0:
-                    if player.shield_hp >= damage:
-                        player.shield_hp -= damage
-                        damage = 0
-                    else:
-                        damage -= player.shield_hp
-                        player.shield_hp = 0
-                player.hp -= damage
-                spawn_blood(particles, player.pos.x, player.pos.y, intensity=8)
-                if player.hp <= 0:
-                    game_over = True
-
-
-            # boss bullets hit player
-            for b in list(bullets):
-                if b.owner == "boss" and b.alive:
-                    if (b.pos - player.pos).length() < (b.radius + player.size):
-                        damage = b.damage
-                        if player_hurt_sound: player_hurt_sound.play()
-                        if player.shield_skill_active: # Shield skill makes player immune
-                            pass
-                        elif player.shield_hp > 0:
-                            if player.shield_hp >= damage:
-                                player.shield_hp -= damage
-                                damage = 0
-                            else:
-                                damage -= player.shield_hp
-                                player.shield_hp = 0
-                        player.hp -= damage
-                        b.alive = False
-                        spawn_blood(particles, player.pos.x, player.pos.y, intensity=12)
-                        if player.hp <= 0:
-                            game_over = True
+                # Gravity Gun effect: pull enemies towards gravity bullets
+                for b in bullets:
+                    if b.btype == "gravity":
+                        for e in enemies:
+                            dist = (e.pos - b.pos).length()
+                            if dist < 150: # Radius of gravity pull
+                                direction = (b.pos - e.pos).normalize()
+                                e.pos += direction * 2 * dt # Pull enemies towards the bullet
+
+                # grenade explosions
+                for g in bullets:
+                    if g.btype == "grenade" and g.exploded:
+                        spawn_explosion(particles, g.pos.x, g.pos.y)
+                        blasts.add(g.pos.x, g.pos.y, EXPLOSION_RADIUS, 60, blood=8, points=10, weapon=player.weapon)
+                        bullets.kill(g)
+
+                # bullets -> enemies collisions: grid broadphase, squared-distance narrow phase
+                enemy_grid.rebuild(enemies)
+                for b in bullets:
+                    if b.owner == "player":
+                        for e in enemy_grid.query(b.pos.x, b.pos.y, b.radius + enemy_grid.max_size):
+                            if not e.alive: # Already killed this step
+                                continue
+                            if b.pos.distance_squared_to(e.pos) < (b.radius + e.size) ** 2:
+                                if b.btype == "rocket":
+                                    spawn_explosion(particles, b.pos.x, b.pos.y)
+                                    blasts.add(b.pos.x, b.pos.y, EXPLOSION_RADIUS, EXPLOSION_DAMAGE,
+                                               blood=PARTICLE_COUNT//2, points=15, weapon=player.weapon)
+                                    bullets.kill(b)
+                                    break
+                                elif b.btype == "plasma":
+                                    spawn_explosion(particles, b.pos.x, b.pos.y, count=PARTICLE_COUNT*4)
+                                    blasts.add(b.pos.x, b.pos.y, EXPLOSION_RADIUS * 0.7, b.damage,
+                                               blood=6, points=15, weapon=player.weapon)
+                                    bullets.kill(b)
+                                    break
+                                elif b.btype == "laser":
+                                    e.hp -= b.damage
+                                    spawn_blood(particles, b.pos.x, b.pos.y, intensity=4)
+                                    spawn_sparks(particles, b.pos.x, b.pos.y, count=4)
+                                    if e.hp <= 0:
+                                        events.kill(e, 10, player.weapon)
+                                        enemies.kill(e)
+                                    # laser continues
+                                elif b.btype == "gravity": # Gravity gun does no direct damage
+                                    # Handled by pulling enemies
+                                    pass
+                                else:
+                                    dmg = b.damage
+                                    e.hp -= dmg
+                                    spawn_blood(particles, b.pos.x, b.pos.y, intensity=6)
+                                    spawn_sparks(particles, b.pos.x, b.pos.y, count=4)
+                                    if b.btype not in ("laser",):
+                                        bullets.kill(b)
+                                    if e.hp <= 0:
+                                        events.kill(e, 10, player.weapon)
+                                        enemies.kill(e)
+                                    break
+
+
+                # enemy contact with player
+                touching = False
+
+                for e in enemies:
+                    if (e.pos - player.pos).length() < (e.size + player.size - 6):
+                        push = (player.pos - e.pos)
+                        if push.length_squared() == 0:
+                            push = Vector2(random.uniform(-1, 1), random.uniform(-1, 1))
+                        push = push.normalize() * 8 * FRAME_SCALE # Tuned per 60 FPS frame of contact
+                        player.pos += push
+                        touching = True
+                        e.pos -= push * 0.3   # <- pindahkan ini ke dalam blok tabrakan
+
+                if touching: # one hit per step however many enemies overlap
+                    events.hurt(12 * FRAME_SCALE, blood=max(1, round(8 * FRAME_SCALE))) # Damage and blood tuned per 60 FPS frame
+
+
+                # boss bullets hit player
+                for b in bullets:
+                    if b.owner == "boss":
+                        if (b.pos - player.pos).length() < (b.radius + player.size):
+                            events.hurt(b.damage, blood=12)
+                            bullets.kill(b)
             
-            # Mine collisions
-            for mine in list(mines):
-                if (mine.pos - player.pos).length() < (mine.size + player.size):
-                    damage = mine.damage
-                    if player_hurt_sound: player_hurt_sound.play()
-                    if player.shield_skill_active: # Shield skill makes player immune
-                        pass
-                    elif player.shield_hp > 0:
-                        if player.shield_hp >= damage:
-                            player.shield_hp -= damage
-                            damage = 0
-                        else:
-                            damage -= player.shield_hp
-                            player.shield_hp = 0
-                    player.hp -= damage
-                    spawn_explosion(particles, mine.pos.x, mine.pos.y)
-                    mines.remove(mine)
-                    if player.hp <= 0:
-                        game_over = True
-                else: # Mines can also damage enemies
-                    for e in list(enemies):
-                        if (mine.pos - e.pos).length() < (mine.size + e.size):
-                            e.hp -= mine.damage
-                            spawn_explosion(particles, mine.pos.x, mine.pos.y)
-                            mines.remove(mine)
-                            if e.hp <= 0:
-                                if enemy_death_sound: enemy_death_sound.play()
-                                player.score += int(10 * player.combo_multiplier) # Apply combo bonus
-                                player.kills += 1
-                                player.update_combo() # Update combo on kill
-                                update_daily_mission(player, enemy_killed_weapon="mine") # Update daily mission
-                                if random.random() < 0.25 or isinstance(e, Boss): orbs.append(HealthOrb(e.pos.x, e.pos.y))
-                                if random.random() < 0.25 or isinstance(e, Boss): ammoboxes.append(AmmoBox(e.pos.x, e.pos.y))
-                                if random.random() < 0.12:
-                                    ptype = random.choice(["dash", "damage"])
-                                    powerups.append(Powerup(e.pos.x, e.pos.y, ptype))
-                                try: enemies.remove(e)
-                                except ValueError: pass
-                            break # Only one enemy can trigger a mine explosion
-
-            # pickups
-            for orb in list(orbs):
-                if (orb.pos - player.pos).length() < (orb.size + player.size):
-                    player.hp = min(player.max_hp, player.hp + orb.heal_amount)
-                    if powerup_sound: powerup_sound.play()
-                    orbs.remove(orb)
-
-            for box in list(ammoboxes):
-                if (box.pos - player.pos).length() < (box.size + player.size):
-                    for k, v in box.fill.items():
-                        if k in player.ammo:
-                            player.ammo[k] += v
-                    if powerup_sound: powerup_sound.play()
-                    ammoboxes.remove(box)
-
-            for pu in list(powerups):
-                if (pu.pos - player.pos).length() < (pu.size + player.size):
-                    if pu.ptype == "dash":
-                        player.last_dash = -99999
-                        for _ in range(10):
-                            ang = random.uniform(0, math.tau)
-                            particles.append(Particle(player.pos.xy, Vector2(math.cos(ang)*random.uniform(1,4), math.sin(ang)*random.uniform(1,4)), radius=3, life=0.5, color=CYAN))
-                    elif pu.ptype == "damage":
-                        player.apply_damage_boost(mult=1.6, duration=8000)
-                        for _ in range(10):
-                            ang = random.uniform(0, math.tau)
-                            particles.append(Particle(player.pos.xy, Vector2(math.cos(ang)*random.uniform(1,4), math.sin(ang)*random.uniform(1,4)), radius=3, life=0.5, color=ORANGE))
-                    try: powerups.remove(pu)
-                    except ValueError: pass
-
-        # particle update
-        for p in particles:
-            p.update(dt)
-        particles = [p for p in particles if p.life > 0.01]
-
-        # Area damage weapon effect: damage enemies inside radius slowly with cooldown
-        if player.weapon == "area_damage":
-            now = pygame.time.get_ticks()
-            if now - player.area_damage_last_used < player.area_damage_cooldown:
-                player.area_damage_tick_timer -= clock.get_time()
-                if player.area_damage_tick_timer <= 0:
-                    player.area_damage_tick_timer = player.area_damage_tick_interval
-                    for e in enemies:
-                        dist = (e.pos - player.pos).length()
-                        if dist <= player.area_damage_radius:
-                            e.hp -= player.area_damage_per_tick
-                            spawn_blood(particles, e.pos.x, e.pos.y, intensity=4)
-                            if e.hp <= 0:
-                                if enemy_death_sound: enemy_death_sound.play()
-                                player.score += int(10 * player.combo_multiplier) # Apply combo bonus
-                                player.kills += 1
-                                player.update_combo() # Update combo on kill
-                                update_daily_mission(player, enemy_killed_weapon=player.weapon) # Update daily mission
-                                if random.random() < 0.25 or isinstance(e, Boss): orbs.append(HealthOrb(e.pos.x, e.pos.y))
-                                if random.random() < 0.25 or isinstance(e, Boss): ammoboxes.append(AmmoBox(e.pos.x, e.pos.y))
-                                if random.random() < 0.12:
-                                    ptype = random.choice(["dash", "damage"])
-                                    powerups.append(Powerup(e.pos.x, e.pos.y, ptype))
-                                try: enemies.remove(e)
-                                except ValueError: pass
-
-        # Update rain effects
-        if is_raining:
-            update_rain()
-            if pygame.time.get_ticks() - rain_start_time > rain_duration:
-                stop_rain()
-                pygame.time.set_timer(WEATHER_EVENT, random.randint(15000, 30000)) # Schedule next weather event
+                # Mine collisions
+                for mine in mines:
+                    if (mine.pos - player.pos).length() < (mine.size + player.size):
+                        events.hurt(mine.damage)
+                        spawn_explosion(particles, mine.pos.x, mine.pos.y)
+                        mines.kill(mine)
+                    else: # Mines can also damage enemies
+                        for e in enemies:
+                            if (mine.pos - e.pos).length() < (mine.size + e.size):
+                                e.hp -= mine.damage
+                                spawn_explosion(particles, mine.pos.x, mine.pos.y)
+                                mines.kill(mine)
+                                if e.hp <= 0:
+                                    events.kill(e, 10, "mine", sound=True)
+                                    enemies.kill(e)
+                                break # Only one enemy can trigger a mine explosion
+
+                # pickups
+                for store in (orbs, ammoboxes, powerups):
+                    for item in store:
+                        if (item.pos - player.pos).length() < (item.size + player.size):
+                            events.pickup(item)
+                            store.kill(item)
+
+            # particle update
+            particles.update(dt)
+
+            # Area damage weapon effect: damage enemies inside radius slowly with cooldown
+            if player.weapon == "area_damage":
+                now = sim_clock.now
+                if now - player.area_damage_last_used < player.area_damage_cooldown:
+                    player.area_damage_tick_timer -= dt * 1000
+                    if player.area_damage_tick_timer <= 0:
+                        player.area_damage_tick_timer = player.area_damage_tick_interval
+                        blasts.add(player.pos.x, player.pos.y, player.area_damage_radius, player.area_damage_per_tick,
+                                   blood=4, points=10, weapon=player.weapon, inclusive=True, death_sound=True)
+
+            # Every blast queued this step lands at once
+            for e, blast in blasts.resolve(enemies, particles):
+                if blast.points is not None:
+                    events.kill(e, blast.points, blast.weapon, sound=blast.death_sound)
+
+            # Systems react to everything that happened this step
+            kills, hits, pickups = events.drain()
+            score_kills(kills)
+            drop_loot(kills)
+            progress_missions(kills)
+            if apply_damage(hits):
+                game_over = True
+            collect_pickups(pickups)
+            play_event_sounds(kills, hits, pickups)
+
+            # Drop everything killed this step
+            for store in (bullets, enemies, orbs, ammoboxes, powerups, mines):
+                store.compact()
+
+            # Update rain effects
+            if is_raining:
+                update_rain(dt)
+                if sim_clock.now - rain_start_time > rain_duration:
+                    stop_rain()
+                    timers.set_timer(WEATHER_EVENT, random.randint(15000, 30000)) # Schedule next weather event
 
-        # occasionally spawn fallback enemy
-        if len(enemies) < 1 and random.random() < 0.02:
-            spawn_enemy(enemies, player.level)
+            # occasionally spawn fallback enemy
+            if len(enemies) < 1 and random.random() < 1 - 0.98 ** FRAME_SCALE: # 2% per 60 FPS frame
+                spawn_enemy(enemies, player.level)
 
         if player.kills >= 200: # Example win condition
             win = True
             game_over = True
 
         if game_over and not coins_added:
-            coins += player.kills * 10
-            save_coins(coins)
+            profile.coins += player.kills * 10
             coins_added = True
-            # Save updated score and kills to database if logged in
-            if current_user:
-                user_data = load_user_data(current_user)
-                user_data["score"] = player.score
-                user_data["kills"] = player.kills
-                user_data["weapon"] = player.weapon
-                user_data["ammo"] = player.ammo
-                save_user_data(current_user, user_data)
+            # Save updated coins, score and kills to database if logged in (checkpoint: game over)
+            profile.score = player.score
+            profile.kills = player.kills
+            profile.weapon = player.weapon
+            profile.ammo = dict(player.ammo)
+            profile.flush()
             # Auto add to leaderboard if qualifies and logged in
             can_submit = qualifies_for_leaderboard(player.score, player.kills)
             if can_submit and current_user:
@@ -3105,71 +5019,64 @@ def game_loop():
 
 
         # --- Drawing ---
-        screen.fill(BG)
-        for gx in range(0, current_width, 60):
-            pygame.draw.line(screen, (17, 22, 28), (gx, 0), (gx, current_height))
-        for gy in range(0, current_height, 60):
-            pygame.draw.line(screen, (17, 22, 28), (0, gy), (current_width, gy))
-
-        for p in particles:
-            p.draw(screen)
-        for b in bullets:
-            b.draw(screen)
-        for e in enemies:
-            pygame.draw.circle(screen, e.color, (int(e.pos.x), int(e.pos.y)), e.size)
-            e.draw_health_bar(screen)
-        for orb in orbs:
-            orb.draw(screen)
-        for box in ammoboxes:
-            box.draw(screen)
-        for pu in powerups:
-            pu.draw(screen)
-        for mine in mines: # Draw mines
-            mine.draw(screen)
-
-        player.draw(screen, mouse_pos)
+        interpolate_positions(accumulator / SIM_DT, bullets, (player,))
+        enemy_pool.interpolate_positions(accumulator / SIM_DT)
+        renderer.begin(screen, arena_background())
+
+        renderer.mark_all(particles.draw(screen))
+        # One blits call per layer, from cached sprites
+        renderer.mark_all(draw_sprites(screen, bullets))
+        renderer.mark_all(draw_sprites(screen, enemies))
+        renderer.mark_all(draw_sprites(screen, map(HealthBar, enemies)))
+        renderer.mark_all(draw_sprites(screen, orbs))
+        renderer.mark_all(draw_sprites(screen, ammoboxes))
+        renderer.mark_all(draw_sprites(screen, powerups))
+        renderer.mark_all(draw_sprites(screen, mines))
+
+        renderer.mark(player.draw(screen, mouse_pos))
 
         # Draw rain on top of everything else
-        draw_rain(screen)
+        renderer.mark(draw_rain(screen))
 
         # HUD
-        draw_text(screen, f"HP: {int(player.hp)}", 20, 10, 10)
-        draw_text(screen, f"Score: {player.score}", 20, 10, 34)
-        draw_text(screen, f"Kills: {player.kills}", 20, 10, 58)
-        draw_text(screen, f"Weapon: {player.weapon.replace('_', ' ').title()}", 20, 10, 82) # Formatted weapon name
+        hud.begin(current_width, current_height)
+        hud.text("hp", f"HP: {int(player.hp)}", 20, 10, 10)
+        hud.text("score", f"Score: {player.score}", 20, 10, 34)
+        hud.text("kills", f"Kills: {player.kills}", 20, 10, 58)
+        hud.text("weapon", f"Weapon: {player.weapon.replace('_', ' ').title()}", 20, 10, 82) # Formatted weapon name
         ammo_text = "∞" if player.weapon in ("pistol", "sword") else str(int(player.ammo.get(player.weapon, 0)))
-        draw_text(screen, f"Ammo: {ammo_text}", 20, 10, 106)
-        draw_text(screen, f"Level: {player.level}", 20, 10, 130)
-        draw_text(screen, f"Combo: x{player.combo_multiplier:.1f} ({player.combo})", 20, 10, 154, color=YELLOW)
+        hud.text("ammo", f"Ammo: {ammo_text}", 20, 10, 106)
+        hud.text("level", f"Level: {player.level}", 20, 10, 130)
+        hud.text("combo", f"Combo: x{player.combo_multiplier:.1f} ({player.combo})", 20, 10, 154, color=YELLOW)
 
 
         # dash and damage HUD
-        dash_ready = (pygame.time.get_ticks() - player.last_dash) >= player.dash_cooldown
-        dash_cd_left = max(0, int((player.dash_cooldown - (pygame.time.get_ticks() - player.last_dash))/1000))
-        draw_text(screen, f"Dash: {'Ready' if dash_ready else f'{dash_cd_left}s'}", 16, 10, 178, color=CYAN)
+        dash_ready = (sim_clock.now - player.last_dash) >= player.dash_cooldown
+        dash_cd_left = max(0, int((player.dash_cooldown - (sim_clock.now - player.last_dash))/1000))
+        hud.text("dash", f"Dash: {'Ready' if dash_ready else f'{dash_cd_left}s'}", 16, 10, 178, color=CYAN)
         if player.damage_timer > 0:
-            draw_text(screen, f"DMG x{player.damage_mult:.1f} ({int(player.damage_timer/1000)}s)", 16, 10, 198, color=ORANGE)
+            hud.text("damage", f"DMG x{player.damage_mult:.1f} ({int(player.damage_timer/1000)}s)", 16, 10, 198, color=ORANGE)
 
         # shield skill HUD
         if player.shield_skill_active:
-            draw_text(screen, f"Shield Skill: {int(player.shield_skill_timer/1000)}s", 16, 10, 218, color=CYAN)
+            hud.text("shield", f"Shield Skill: {int(player.shield_skill_timer/1000)}s", 16, 10, 218, color=CYAN)
         else:
-            shield_ready = (pygame.time.get_ticks() - player.last_shield_skill) >= player.shield_skill_cooldown
-            shield_cd_left = max(0, int((player.shield_skill_cooldown - (pygame.time.get_ticks() - player.last_shield_skill))/1000))
-            draw_text(screen, f"Shield Skill: {'Ready' if shield_ready else f'{shield_cd_left}s'}", 16, 10, 218, color=CYAN)
+            shield_ready = (sim_clock.now - player.last_shield_skill) >= player.shield_skill_cooldown
+            shield_cd_left = max(0, int((player.shield_skill_cooldown - (sim_clock.now - player.last_shield_skill))/1000))
+            hud.text("shield", f"Shield Skill: {'Ready' if shield_ready else f'{shield_cd_left}s'}", 16, 10, 218, color=CYAN)
 
         # area damage weapon cooldown HUD
         if player.weapon == "area_damage":
-            now = pygame.time.get_ticks()
+            now = sim_clock.now
             area_ready = (now - player.area_damage_last_used) >= player.area_damage_cooldown
             area_cd_left = max(0, int((player.area_damage_cooldown - (now - player.area_damage_last_used))/1000))
-            draw_text(screen, f"Area Damage: {'Ready' if area_ready else f'{area_cd_left}s'}", 16, 10, 238, color=RED)
+            hud.text("area", f"Area Damage: {'Ready' if area_ready else f'{area_cd_left}s'}", 16, 10, 238, color=RED)
         
         # Weather HUD
         if is_raining:
-            draw_text(screen, "Weather: Rain (Speed -15%)", 16, current_width - 200, 10, color=LIGHT_BLUE) # REVISI: Teks debuff
+            hud.text("weather", "Weather: Rain (Speed -15%)", 16, current_width - 200, 10, color=LIGHT_BLUE) # REVISI: Teks debuff
         else:
-            draw_text(screen, "Weather: Clear", 16, current_width - 200, 10, color=WHITE)
+            hud.text("weather", "Weather: Clear", 16, current_width - 200, 10, color=WHITE)
 
         # Daily Mission HUD
         if current_user:
@@ -3181,14 +5088,15 @@ def game_loop():
             reward_text = f"Reward: {daily_mission['reward']} coins"
             status_text = "Completed!" if daily_mission["completed"] else "In Progress"
 
-            draw_text(screen, "Daily Mission:", 16, current_width - 200, current_height - 100, color=WHITE)
-            draw_text(screen, mission_text, 14, current_width - 200, current_height - 80, color=GRAY)
-            draw_text(screen, progress_text, 14, current_width - 200, current_height - 64, color=GRAY)
-            draw_text(screen, reward_text, 14, current_width - 200, current_height - 48, color=YELLOW)
-            draw_text(screen, status_text, 14, current_width - 200, current_height - 32, color=GREEN if daily_mission["completed"] else YELLOW)
+            hud.text("mission_title", "Daily Mission:", 16, current_width - 200, current_height - 100, color=WHITE)
+            hud.text("mission", mission_text, 14, current_width - 200, current_height - 80, color=GRAY)
+            hud.text("mission_progress", progress_text, 14, current_width - 200, current_height - 64, color=GRAY)
+            hud.text("mission_reward", reward_text, 14, current_width - 200, current_height - 48, color=YELLOW)
+            hud.text("mission_status", status_text, 14, current_width - 200, current_height - 32, color=GREEN if daily_mission["completed"] else YELLOW)
 
 
-        draw_text(screen, "Switch: 1..0 (0=10th) or Scroll  •  SHIFT = Dash  •  Q = Shield Skill  •  R = Restart (on Game Over)  •  ESC = Menu", 16, 10, current_height - 28, color=GRAY)
+        hud.text("help", "Switch: 1..0 (0=10th) or Scroll  •  SHIFT = Dash  •  Q = Shield Skill  •  R = Restart (on Game Over)  •  ESC = Menu", 16, 10, current_height - 28, color=GRAY)
+        hud.end(screen)
 
         if game_over:
             if win:
@@ -3209,24 +5117,187 @@ def game_loop():
             else:
                 draw_text(screen, "Press R to restart • ESC to menu • ENTER to submit score (if eligible)", 18, current_width // 2, current_height // 2 + 64, color=GRAY, center=True)
 
-        pygame.display.flip()
+        profile.maybe_flush() # e.g. daily mission rewards, written outside the collision code
+        renderer.present()
 
     return "menu"
 
+# ---------------- Benchmarks ----------------
+def benchmark_collisions(n_bullets=1000, n_enemies=1000, seed=1):
+    """Times first-hit bullet-vs-enemy detection with a full scan and with the spatial hash."""
+    rng = random.Random(seed)
+    pool = EnemyPool()
+    enemies = [Enemy(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT), pool=pool) for _ in range(n_enemies)]
+    bullets = [Bullet((rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)), Vector2(1, 0)) for _ in range(n_bullets)]
+
+    started = time.perf_counter()
+    scan_hits = []
+    for b in bullets:
+        scan_hits.append(next((i for i, e in enumerate(list(enemies)) if (b.pos - e.pos).length() < (b.radius + e.size)), None))
+    scan_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    grid = SpatialHash()
+    grid.rebuild(enemies)
+    index = {id(e): i for i, e in enumerate(enemies)}
+    grid_hits = []
+    for b in bullets:
+        hit = None
+        for e in grid.query(b.pos.x, b.pos.y, b.radius + grid.max_size):
+            if b.pos.distance_squared_to(e.pos) < (b.radius + e.size) ** 2:
+                hit = index[id(e)]
+                break
+        grid_hits.append(hit)
+    grid_ms = (time.perf_counter() - started) * 1000
+    print(f"Collisions {n_bullets} bullets x {n_enemies} enemies: scan {scan_ms:.1f} ms, "
+          f"spatial hash {grid_ms:.1f} ms, {sum(h is not None for h in grid_hits)} hits, "
+          f"{'same' if scan_hits == grid_hits else 'DIFFERENT'} results")
+
+
+def benchmark_blasts(n_enemies=1000, n_blasts=50, seed=1):
+    """Times area damage resolved blast by blast against the batched BlastQueue."""
+    rng = random.Random(seed)
+    spots = [(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)) for _ in range(n_enemies)]
+    centers = [(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)) for _ in range(n_blasts)]
+
+    pool = EnemyPool(n_enemies)
+    enemies = [Enemy(x, y, pool=pool) for x, y in spots]
+    started = time.perf_counter()
+    scan_kills = 0
+    for x, y in centers:
+        center = Vector2(x, y)
+        for e in list(enemies):
+            if (center - e.pos).length() < EXPLOSION_RADIUS:
+                e.hp -= EXPLOSION_DAMAGE
+                if e.hp <= 0:
+                    scan_kills += 1
+                    enemies.remove(e)
+    scan_ms = (time.perf_counter() - started) * 1000
+    scan_hp = [e.hp for e in enemies]
+
+    pool = EnemyPool(n_enemies)
+    enemies = EntityStore(Enemy(x, y, pool=pool) for x, y in spots)
+    started = time.perf_counter()
+    queue = BlastQueue()
+    for x, y in centers:
+        queue.add(x, y, EXPLOSION_RADIUS, EXPLOSION_DAMAGE)
+    kills = queue.resolve(enemies, None)
+    batch_ms = (time.perf_counter() - started) * 1000
+    same = len(kills) == scan_kills and [e.hp for e in enemies] == scan_hp
+    print(f"Area damage {n_blasts} blasts x {n_enemies} enemies: per-blast loops {scan_ms:.1f} ms, "
+          f"batched {batch_ms:.1f} ms, {len(kills)} kills, {'same' if same else 'DIFFERENT'} results")
+
+
+def benchmark_steering(n_enemies=1000, steps=120, seed=1):
+    """Times one second of enemy movement stepped object by object against the vectorized EnemyPool."""
+    rng = random.Random(seed)
+    kinds = [FastEnemy, ArmoredEnemy, FlyingEnemy, Enemy]
+    pool = EnemyPool()
+    enemies = [rng.choice(kinds)(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT), pool=pool)
+               for _ in range(n_enemies)]
+    target = Vector2(WIDTH / 2, HEIGHT / 2)
+
+    # The per-object update every enemy class used to run
+    state = [(Vector2(e.pos), e.speed, isinstance(e, FlyingEnemy)) for e in enemies]
+    started = time.perf_counter()
+    for step in range(steps):
+        t = (step + 1) * SIM_DT
+        for pos, speed, wavy in state:
+            dirv = Vector2(target) - pos
+            vel = dirv.normalize() * speed if dirv.length_squared() > 0 else Vector2(0, 0)
+            if wavy:
+                vel.y += math.sin(t * 0.02) * 50 * SIM_DT
+            pos += vel * SIM_DT
+    scan_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    for _ in range(steps):
+        pool.update(SIM_DT, target, enemies)
+    pool_ms = (time.perf_counter() - started) * 1000
+    same = all(pos.distance_to(e.pos) < 1e-6 for (pos, _, _), e in zip(state, enemies))
+    print(f"Steering {n_enemies} enemies x {steps} steps: per-object {scan_ms:.1f} ms, "
+          f"pooled {pool_ms:.1f} ms, {'same' if same else 'DIFFERENT'} results")
+
+
+def benchmark_removal(n_entities=1000, n_kills=500, seed=1):
+    """Times killing entities mid-loop with list.remove against EntityStore tombstones."""
+    rng = random.Random(seed)
+    doomed = set(rng.sample(range(n_entities), n_kills))
+    orbs = [HealthOrb(i, 0) for i in range(n_entities)]
+
+    items = list(orbs)
+    started = time.perf_counter()
+    for orb in list(items):
+        if orb.pos.x in doomed:
+            try: items.remove(orb)
+            except ValueError: pass
+    list_ms = (time.perf_counter() - started) * 1000
+
+    store = EntityStore(orbs)
+    handles = [orb.handle for orb in orbs]
+    started = time.perf_counter()
+    for orb in store:
+        if orb.pos.x in doomed:
+            store.kill(orb)
+    store.compact()
+    store_ms = (time.perf_counter() - started) * 1000
+    store.add(HealthOrb(-1, 0))  # reuses a freed slot; stale handles must not see it
+    same = (sorted(id(o) for o in items) == sorted(id(o) for o in store if o.pos.x >= 0)
+            and all((store.get(h) is None) == (i in doomed) for i, h in enumerate(handles)))
+    print(f"Removal {n_kills} of {n_entities} entities: list.remove {list_ms:.1f} ms, "
+          f"store {store_ms:.1f} ms, {'same' if same else 'DIFFERENT'} results")
+
+
+def run_benchmarks():
+    """Runs the simulation micro-benchmarks (python war_game.py --benchmark)."""
+    for n in (100, 300, 1000):
+        benchmark_collisions(n, n)
+    for n_enemies, n_blasts in ((300, 10), (1000, 50), (1000, 200)):
+        benchmark_blasts(n_enemies, n_blasts)
+    for n in (100, 1000):
+        benchmark_steering(n)
+    for n in (1000, 5000):
+        benchmark_removal(n, n // 2)
+
 # ---------------- Main Program ----------------
-state = "menu"
-while True:
-    if state == "menu":
-        state = main_menu()
-    elif state == "game":
-        state = game_loop()
-    elif state == "admin_panel": # New state for admin panel
-        state = admin_panel_screen()
-    elif state == "restart":
-        state = "game"
-    elif state == "quit":
-        break
-    else:
-        state = "menu"
+def main():
+    """Opens the window, warms up the database in the background and runs the screen state machine."""
+    if "--benchmark" in sys.argv[1:]:
+        run_benchmarks()
+        return
+    if "--cook-assets" in sys.argv[1:]:
+        cook_weapon_atlas()
+        print(f"Cooked {WEAPON_ATLAS_PATH} in {atlas_stats['decode_ms']:.1f} ms")
+        return
+    phase_timings.insert(0, ("import", (time.perf_counter() - STARTUP_STARTED) * 1000))
+    init_display()
+    persistence.submit(("warmup",), lambda _: warm_up_storage(), None)
+    state = "menu"
+    try:
+        while True:
+            if state == "menu":
+                state = main_menu()
+            elif state == "game":
+                state = game_loop()
+            elif state == "admin_panel": # New state for admin panel
+                state = admin_panel_screen()
+            elif state == "restart":
+                state = "game"
+            elif state == "quit":
+                break
+            else:
+                state = "menu"
+    finally:
+        profile.flush() # Checkpoint: anything still dirty when the game exits
+        persistence.stop() # Drain queued writes before closing connections
+        if storage: storage.close()
+        if renderer.dirty:
+            stats = renderer.snapshot()
+            print(f"Renderer: {stats['frames']} frames, {stats['partial']} partial updates, "
+                  f"{stats['flips']} full flips, avg dirty area {stats['avg_dirty_area']} px")
+
+    pygame.quit()
+
 
-pygame.quit()
\ No newline at end of file
+if __name__ == "__main__":
+    main()